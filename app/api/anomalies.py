@@ -0,0 +1,34 @@
+from typing import Optional
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse
+from models.schema import AnomalyReport, AnomalyScore
+from services import anomaly
+
+router = APIRouter(prefix="/anomalies")
+
+# Sources: orders (sale_price per product), inventory (quantity_change per
+# product and reason), transactions (total_amount per debit account).
+# A source's first request starts its fit in the background and answers 202
+
+def _warming_up(source: str):
+    return JSONResponse({"status": "warming_up", "detail": f"Fitting {source} history - retry shortly"},
+                        status_code=202, headers={"Retry-After": "5"})
+
+@router.get("/{source}", response_model=AnomalyReport, responses={202: {"description": "Fitting - retry shortly"}})
+def get_anomalies(
+    source: str,
+    key: Optional[int] = None,
+    reason: Optional[str] = None,
+    order_by: str = "score",
+    limit: int = Query(50, ge=1, le=1000),
+    refit: bool = False,
+):
+    """Flagged rows of a source, worst first - scores any rows added since the last call"""
+    result = anomaly.report(source, key=key, reason=reason, limit=limit, order_by=order_by, refit=refit)
+    return _warming_up(source) if result is None else result
+
+@router.get("/{source}/score", response_model=AnomalyScore, responses={202: {"description": "Fitting - retry shortly"}})
+def score_value(source: str, key: int, value: float, reason: Optional[str] = None):
+    """How unusual a value would be for a product / account, without recording it"""
+    result = anomaly.score(source, key, value, reason=reason)
+    return _warming_up(source) if result is None else result
@@ -1,20 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
 from sqlalchemy.orm import Session
-from common.db import SessionLocal, engine
-from models.db_models import Base, Customer, Order
-from models.schema import CustomerCreate, CustomerRead, CustomerWithOrders
-
-Base.metadata.create_all(bind=engine)  # temporary
+from common.async_routes import db_bound
+from common.cache import cached_read
+from common.db import get_db
+from common.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, PageParams, paginate
+from models.db_models import Customer, Order
+from models.schema import CustomerCreate, CustomerRead, CustomerWithOrders, Page
 
 router = APIRouter(prefix="/customers")
 
-def get_db():
-    db = SessionLocal()
-    try: 
-        yield db
-    finally: 
-        db.close()
-
 @router.post("/", response_model=CustomerRead)
 def create_customer(payload: CustomerCreate, db: Session = Depends(get_db)):
     if db.query(Customer).filter(Customer.email == payload.email).first():
@@ -27,23 +22,40 @@ def create_customer(payload: CustomerCreate, db: Session = Depends(get_db)):
 
 @router.get("/{id}", response_model=CustomerRead)
 def read_customer(id: int, db: Session = Depends(get_db)):
-    cust = db.query(Customer).get(id)
+    cust = cached_read(f"customer:{id}", CustomerRead, lambda: db.query(Customer).get(id))
     if not cust:
         raise HTTPException(404, "Not found")
     return cust
 
 @router.get("/{id}/with-orders", response_model=CustomerWithOrders)
-def read_customer_with_orders(id: int, db: Session = Depends(get_db)):
-    """Get customer with all their orders included"""
+@db_bound
+def read_customer_with_orders(
+    id: int,
+    orders_cursor: Optional[str] = None,
+    orders_limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    """Get customer with a page of their orders (newest first)"""
     cust = db.query(Customer).get(id)
     if not cust:
         raise HTTPException(404, "Customer not found")
-    return cust
 
-@router.get("/", response_model=list[CustomerRead])
-def list_customers(db: Session = Depends(get_db)):
-    """Get all customers"""
-    customers = db.query(Customer).all()
-    return customers
+    # Page the orders ourselves instead of lazy-loading the whole relationship
+    page = PageParams(cursor=orders_cursor, limit=orders_limit, include_total=False)
+    orders = paginate(
+        db.query(Order).filter(Order.customer_id == id), Order.id, page,
+        sort_column=Order.sold_at, descending=True
+    )
+    return {
+        **CustomerRead.model_validate(cust).model_dump(),
+        "orders": orders["items"],
+        "orders_next_cursor": orders["next_cursor"],
+    }
+
+@router.get("/", response_model=Page[CustomerRead])
+@db_bound
+def list_customers(page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Get customers, one page at a time"""
+    return paginate(db.query(Customer), Customer.id, page)
 
 # TODO: Uncomment when common/db.py, models/db_models.py, and models/schema.py are created 
\ No newline at end of file
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException
+from common.query_stats import registry
+
+# Dev only - app.main mounts this when ENABLE_DEBUG_ENDPOINTS is set
+router = APIRouter(prefix="/debug")
+
+@router.get("/queries")
+def get_query_stats(limit: int = 20, order_by: str = "total_ms"):
+    """Slowest normalized statements since startup, plus recent N+1 suspects"""
+    valid_orders = ["total_ms", "max_ms", "avg_ms", "calls"]
+    if order_by not in valid_orders:
+        raise HTTPException(400, f"order_by must be one of: {valid_orders}")
+    return {
+        "statements": registry.slowest(limit, order_by),
+        "n_plus_one": list(registry.n_plus_one),
+    }
+
+@router.delete("/queries")
+def reset_query_stats():
+    """Clear the collected statement stats"""
+    registry.reset()
+    return {"message": "Query stats reset"}
@@ -0,0 +1,25 @@
+from typing import List, Optional
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse
+from models.schema import PriceElasticity
+from services import causal
+
+router = APIRouter(prefix="/elasticity")
+
+# Cached per data version of orders and products, estimated by a Celery task - a cold cache
+# answers 202 while the first one runs; POST /internal/elasticity/refresh recomputes
+
+@router.get("/", response_model=PriceElasticity, responses={202: {"description": "Estimating - retry shortly"}})
+def get_price_elasticity(
+    product_id: Optional[List[int]] = Query(None),
+    band: Optional[int] = Query(None, ge=0, lt=causal.CAUSAL_PRICE_BANDS),
+    limit: int = Query(100, ge=1, le=1000),
+    refresh: bool = False,
+):
+    """Price elasticity of order volume per list-price band and product, most price-sensitive products first"""
+    entry = causal.elasticity(refresh=refresh)
+    if entry is None:
+        return JSONResponse({"cache": "pending", "detail": "Estimating price elasticity - retry shortly"},
+                            status_code=202, headers={"Retry-After": "30"})
+    matching, products = causal.select_products(entry, product_ids=product_id, band=band, limit=limit)
+    return {**entry, "matching": matching, "products": products}
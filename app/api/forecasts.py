@@ -0,0 +1,32 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from common.async_routes import db_bound
+from common.db import get_db
+from common.pagination import PageParams, paginate
+from models.db_models import DemandForecast
+from models.schema import ForecastRead, Page, ProductForecast
+from services import modeling
+
+router = APIRouter(prefix="/forecasts")
+
+# Fitted nightly by the refit_forecasts task, or POST /internal/forecasts/refit
+
+@router.get("/", response_model=Page[ForecastRead])
+@db_bound
+def list_forecasts(model: Optional[str] = None, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Fitted demand models by product id, optionally one model type"""
+    query = db.query(DemandForecast)
+    if model:
+        query = query.filter(DemandForecast.model == model)
+    return paginate(query, DemandForecast.product_id, page)
+
+@router.get("/{product_id}", response_model=ProductForecast)
+@db_bound
+def get_forecast(
+    product_id: int,
+    horizon: int = Query(28, ge=1, le=modeling.MAX_HORIZON),
+    db: Session = Depends(get_db),
+):
+    """Expected units per day for the days after the product's history"""
+    return modeling.product_forecast(db, product_id, horizon)
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from common.async_routes import db_bound
+from common.db import get_db
+from common.pagination import PageParams, paginate
+from models.db_models import IngestionJob
+from models.schema import IngestionJobCreate, IngestionJobRead, Page
+from services import ingestion
+
+router = APIRouter(prefix="/imports")
+
+@router.post("/", response_model=IngestionJobRead, status_code=202)
+def create_import(payload: IngestionJobCreate, db: Session = Depends(get_db)):
+    """Start a background import of products or customers from a CSV/NDJSON file"""
+    job = ingestion.create_job(db, payload.kind, payload.path, payload.format)
+    ingestion.start_job(db, job.id)
+    return ingestion.job_status(job)
+
+@router.get("/", response_model=Page[IngestionJobRead])
+@db_bound
+def list_imports(page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Get import jobs, newest first"""
+    result = paginate(db.query(IngestionJob), IngestionJob.id, page, descending=True)
+    result["items"] = [ingestion.job_status(job) for job in result["items"]]
+    return result
+
+@router.get("/{id}", response_model=IngestionJobRead)
+@db_bound
+def get_import(id: int, db: Session = Depends(get_db)):
+    """Get an import job's status, progress and throughput"""
+    job = db.query(IngestionJob).get(id)
+    if not job:
+        raise HTTPException(404, "Import job not found")
+    return ingestion.job_status(job)
+
+@router.post("/{id}/resume", response_model=IngestionJobRead, status_code=202)
+def resume_import(id: int, db: Session = Depends(get_db)):
+    """Continue a failed or interrupted import from its last checkpoint"""
+    job = db.query(IngestionJob).get(id)
+    if not job:
+        raise HTTPException(404, "Import job not found")
+    if job.status == "completed":
+        raise HTTPException(400, "Import job already completed")
+    if not ingestion.start_job(db, job.id):
+        raise HTTPException(409, "Import job is already running")
+    return ingestion.job_status(job)
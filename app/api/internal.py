@@ -0,0 +1,95 @@
+import hmac
+import os
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy.orm import Session
+from common import db as database
+from common.cache import cache
+from common.db import get_db
+from services import ledger, order_events, passwords, sales_rollups, simulation
+from tasks import tasks
+
+# Shared secret for /internal - app.main only mounts the router when it's set, and
+# every call must send it as X-Internal-Token. Several endpoints start expensive work.
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN", "")
+
+def require_internal_token(x_internal_token: str = Header(default="")):
+    if not INTERNAL_API_TOKEN or not hmac.compare_digest(x_internal_token.encode(), INTERNAL_API_TOKEN.encode()):
+        raise HTTPException(401, "Missing or wrong X-Internal-Token")
+
+router = APIRouter(prefix="/internal", dependencies=[Depends(require_internal_token)])
+
+@router.get("/db-pool")
+def get_pool_metrics():
+    """Connection pool usage - in use, waiters, checkout wait histogram"""
+    metrics = {
+        "sync": database.pool_stats.snapshot(database.engine.pool),
+        "session_slots": database.session_slots.snapshot(),
+    }
+    if database.async_engine is not None:
+        metrics["async"] = database.async_pool_stats.snapshot(database.async_engine.pool)
+    return metrics
+
+@router.get("/cache")
+def get_cache_metrics():
+    """Entity cache hit/miss/eviction counters for this worker"""
+    return cache.snapshot()
+
+@router.get("/password-hashing")
+def get_password_hashing_metrics():
+    """Password hash pool for this worker - in flight, queued, rejected, average wait and hash time"""
+    return passwords.pool.snapshot()
+
+@router.get("/order-events")
+def get_order_event_metrics():
+    """Write-behind queue depth, lag of the oldest queued event and consumer counters"""
+    return order_events.backlog()
+
+@router.post("/sales-rollups/backfill", status_code=202)
+def backfill_sales_rollups(start: Optional[datetime] = None, end: Optional[datetime] = None, rebuild: bool = False):
+    """Queue a backfill of sales_rollups over whole days (default: every order)"""
+    result = tasks.backfill_sales_rollups.apply_async(kwargs={
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "rebuild": rebuild,
+    })
+    return {"task_id": result.id}
+
+@router.get("/sales-rollups/check")
+def check_sales_rollups(start: Optional[datetime] = None, end: Optional[datetime] = None, db: Session = Depends(get_db)):
+    """Compare sales_rollups with the orders table over whole days (default: every order)"""
+    return sales_rollups.check(db, start, end)
+
+@router.post("/forecasts/refit", status_code=202)
+def refit_forecasts(full: bool = False):
+    """Queue a demand model refit - products with new sales, or every product with full"""
+    result = tasks.refit_forecasts.apply_async(kwargs={"full": full})
+    return {"task_id": result.id}
+
+@router.post("/simulations/stockouts", status_code=202)
+def simulate_stockouts(
+    horizon: int = Query(simulation.SIM_HORIZON_DAYS, ge=1, le=simulation.MAX_HORIZON_DAYS),
+    scenarios: int = Query(simulation.SIM_SCENARIOS, ge=1, le=simulation.MAX_SCENARIOS),
+    seed: Optional[int] = Query(None, ge=0),
+):
+    """Queue a stock-out simulation of the whole catalog - the previous one is served until it lands"""
+    result = tasks.simulate_stockouts.apply_async(kwargs={"horizon": horizon, "scenarios": scenarios, "seed": seed})
+    return {"task_id": result.id}
+
+@router.post("/elasticity/refresh", status_code=202)
+def refresh_price_elasticity():
+    """Queue a price elasticity estimate - the cached one is served until it lands"""
+    result = tasks.refresh_price_elasticity.apply_async()
+    return {"task_id": result.id}
+
+@router.post("/ledger/snapshot", status_code=202)
+def snapshot_account_balances(as_of: Optional[datetime] = None):
+    """Queue an end-of-day balance snapshot (default: yesterday)"""
+    result = tasks.snapshot_account_balances.apply_async(kwargs={"as_of": as_of.isoformat() if as_of else None})
+    return {"task_id": result.id}
+
+@router.get("/ledger/check")
+def check_ledger(db: Session = Depends(get_db)):
+    """Compare account balances and the latest snapshot with sums over every transaction line"""
+    return ledger.check(db)
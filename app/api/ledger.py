@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends
+from typing import Optional
+from sqlalchemy.orm import Session
+from common.async_routes import db_bound
+from common.db import get_db
+from models.db_models import TransactionLine
+from models.schema import AccountBalance, JournalEntryCreate, JournalEntryRead, TrialBalance
+from services import ledger
+from datetime import date
+
+router = APIRouter(prefix="/ledger")
+
+# Balances as of a day start from the latest daily snapshot (see tasks.snapshot_account_balances)
+
+@router.post("/entries", response_model=JournalEntryRead)
+def post_journal_entry(payload: JournalEntryCreate, created_by_user_id: int, db: Session = Depends(get_db)):
+    """Post a balanced set of debit/credit lines as one transaction, updating account balances atomically"""
+    transaction = ledger.post(db, payload, created_by_user_id)
+    lines = db.query(TransactionLine).filter(TransactionLine.transaction_id == transaction.id).order_by(TransactionLine.id).all()
+    return {**{column.name: getattr(transaction, column.name) for column in transaction.__table__.columns}, "lines": lines}
+
+@router.get("/trial-balance", response_model=TrialBalance)
+def get_trial_balance(as_of: Optional[date] = None, db: Session = Depends(get_db)):
+    """Debit and credit balance of every account - live, or at the end of as_of"""
+    return ledger.trial_balance(db, as_of)
+
+@router.get("/accounts/{id}/balance", response_model=AccountBalance)
+@db_bound
+def get_account_balance(id: int, as_of: Optional[date] = None, db: Session = Depends(get_db)):
+    """An account's balance - live, or at the end of as_of"""
+    return ledger.account_balance(db, id, as_of)
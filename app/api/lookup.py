@@ -0,0 +1,22 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from common.db import get_db
+from models.schema import TypeaheadResults
+from services import typeahead
+
+router = APIRouter(prefix="/lookup")
+
+# Served from an index each process keeps in memory (built at startup, kept current as rows change);
+# fuzzy matches come from the trigram indexes of migration 0010
+
+@router.get("/", response_model=TypeaheadResults)
+def lookup(
+    q: str = Query(..., min_length=1, max_length=200),
+    field: Optional[List[str]] = Query(None, description=f"any of {list(typeahead.FIELDS)} - all by default"),
+    k: int = Query(10, ge=1, le=typeahead.MAX_K),
+    fuzzy: bool = True,
+    db: Session = Depends(get_db),
+):
+    """As-you-type lookup of customers by name or email, users by username and products by SKU, best k first"""
+    return typeahead.lookup(db, q, fields=field, k=k, fuzzy=fuzzy)
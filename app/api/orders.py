@@ -1,100 +1,75 @@
 from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
 from sqlalchemy.orm import Session
-from common.db import SessionLocal
-from models.db_models import Order, Customer, Product, Inventory, InventoryHistory
-from models.schema import OrderCreate, OrderRead
+from common.async_routes import db_bound
+from common.db import get_db
+from common.export import export_response
+from common.pagination import PageParams, paginate
+from models.db_models import Order, Customer
+from models.schema import OrderCreate, OrderRead, OrderBatchResult, Page
+from services.orders import MAX_BATCH_SIZE, place_order, place_orders_batch
+from services.sales_rollups import change_status
 
 router = APIRouter(prefix="/orders")
 
-def get_db():
-    db = SessionLocal()
-    try: 
-        yield db
-    finally: 
-        db.close()
-
 @router.post("/", response_model=OrderRead)
 def create_order(payload: OrderCreate, db: Session = Depends(get_db)):
     """Create a new order and update inventory"""
-    # Verify customer exists
-    customer = db.query(Customer).get(payload.customer_id)
-    if not customer:
-        raise HTTPException(404, "Customer not found")
-    
-    # Verify product exists
-    product = db.query(Product).get(payload.product_id)
-    if not product:
-        raise HTTPException(404, "Product not found")
-    
-    # Check inventory
-    inventory = db.query(Inventory).filter(Inventory.product_id == payload.product_id).first()
-    if not inventory or inventory.quantity < 1:
-        raise HTTPException(400, "Product out of stock")
-    
-    # Use product price if no sale price provided
-    sale_price = payload.sale_price if payload.sale_price else product.price
-    
-    # Create order
-    new_order = Order(
-        customer_id=payload.customer_id,
-        product_id=payload.product_id,
-        product_name=product.name,
-        sale_price=sale_price,
-        status="pending"
-    )
-    db.add(new_order)
-    
-    # Update inventory (reduce by 1)
-    old_quantity = inventory.quantity
-    inventory.quantity -= 1
-    
-    # Log inventory change
-    history = InventoryHistory(
-        product_id=payload.product_id,
-        old_quantity=old_quantity,
-        new_quantity=inventory.quantity,
-        quantity_change=-1,
-        change_reason="sale",
-        changed_by="order_system",
-        notes=f"Order #{new_order.id} created"
-    )
-    db.add(history)
-    
-    # Update customer order count
-    customer.order_count += 1
-    
-    db.commit()
-    db.refresh(new_order)
-    
-    return new_order
+    # Stock check, decrement, history row and customer count happen atomically
+    return place_order(db, payload.customer_id, payload.product_id, payload.sale_price)
+
+@router.post("/batch", response_model=list[OrderBatchResult])
+def create_orders_batch(payload: list[OrderCreate], db: Session = Depends(get_db)):
+    """Create many orders in one transaction - failed items are reported, not fatal"""
+    if len(payload) > MAX_BATCH_SIZE:
+        raise HTTPException(400, f"Batch too large - max {MAX_BATCH_SIZE} orders")
+    if not payload:
+        return []
+    return place_orders_batch(db, payload)
 
-@router.get("/", response_model=list[OrderRead])
-def list_orders(db: Session = Depends(get_db)):
-    """Get all orders"""
-    orders = db.query(Order).all()
-    return orders
+@router.get("/", response_model=Page[OrderRead])
+@db_bound
+def list_orders(page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Get orders, newest first"""
+    return paginate(db.query(Order), Order.id, page, sort_column=Order.sold_at, descending=True)
 
-@router.get("/by-status/{status}", response_model=list[OrderRead])
-def get_orders_by_status(status: str, db: Session = Depends(get_db)):
-    """Get all orders with a specific status"""
+@router.get("/by-status/{status}", response_model=Page[OrderRead])
+@db_bound
+def get_orders_by_status(status: str, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Get orders with a specific status, newest first"""
     valid_statuses = ["pending", "completed", "cancelled"]
     if status not in valid_statuses:
         raise HTTPException(400, f"Status must be one of: {valid_statuses}")
     
-    orders = db.query(Order).filter(Order.status == status).all()
-    return orders
+    query = db.query(Order).filter(Order.status == status)
+    return paginate(query, Order.id, page, sort_column=Order.sold_at, descending=True)
 
-@router.get("/by-customer/{customer_id}", response_model=list[OrderRead])
-def get_orders_by_customer(customer_id: int, db: Session = Depends(get_db)):
-    """Get all orders for a specific customer"""
+@router.get("/by-customer/{customer_id}", response_model=Page[OrderRead])
+@db_bound
+def get_orders_by_customer(customer_id: int, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Get orders for a specific customer, newest first"""
     customer = db.query(Customer).get(customer_id)
     if not customer:
         raise HTTPException(404, "Customer not found")
     
-    orders = db.query(Order).filter(Order.customer_id == customer_id).all()
-    return orders
+    query = db.query(Order).filter(Order.customer_id == customer_id)
+    return paginate(query, Order.id, page, sort_column=Order.sold_at, descending=True)
+
+@router.get("/export")
+def export_orders(format: str = "ndjson", status: Optional[str] = None):
+    """Stream every order (optionally one status) as NDJSON or CSV"""
+    def build_query(db):
+        query = db.query(Order)
+        if status:
+            query = query.filter(Order.status == status)
+        return query.order_by(Order.id)
+
+    columns = [Order.id, Order.customer_id, Order.product_id, Order.product_name,
+               Order.sale_price, Order.status, Order.sold_at]
+    return export_response(build_query, columns, format, "orders")
 
 @router.get("/{id}", response_model=OrderRead)
+@db_bound
 def get_order(id: int, db: Session = Depends(get_db)):
     """Get a specific order"""
     order = db.query(Order).get(id)
@@ -105,15 +80,13 @@ def get_order(id: int, db: Session = Depends(get_db)):
 @router.put("/{id}/status")
 def update_order_status(id: int, status: str, db: Session = Depends(get_db)):
     """Update order status (pending, completed, cancelled)"""
-    order = db.query(Order).get(id)
-    if not order:
-        raise HTTPException(404, "Order not found")
-    
     valid_statuses = ["pending", "completed", "cancelled"]
     if status not in valid_statuses:
         raise HTTPException(400, f"Status must be one of: {valid_statuses}")
     
-    order.status = status
+    # Moves the order's sales rollup contribution to the new status in the same transaction
+    if change_status(db, id, status) is None:
+        raise HTTPException(404, "Order not found")
     db.commit()
     
-    return {"message": f"Order {id} status updated to {status}"} 
\ No newline at end of file
+    return {"message": f"Order {id} status updated to {status}"}
\ No newline at end of file
@@ -1,18 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from common.db import SessionLocal
+from common.async_routes import db_bound
+from common.cache import cached_read
+from common.db import get_db
+from common.export import export_response
+from common.pagination import PageParams, paginate
 from models.db_models import Product, Inventory, InventoryHistory, Order
-from models.schema import ProductCreate, ProductRead, InventoryRead, InventoryUpdate, OrderRead
+from models.schema import ProductCreate, ProductRead, ProductSearchHit, InventoryRead, InventoryUpdate, OrderRead, Page
+from services import search
 
 router = APIRouter(prefix="/products")
 
-def get_db():
-    db = SessionLocal()
-    try: 
-        yield db
-    finally: 
-        db.close()
-
 @router.post("/", response_model=ProductRead)
 def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
     """Create a new product and set initial inventory"""
@@ -55,38 +54,78 @@ def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
     
     return new_product
 
-@router.get("/", response_model=list[ProductRead])
-def list_products(db: Session = Depends(get_db)):
-    """Get all products"""
-    products = db.query(Product).all()
-    return products
+@router.get("/", response_model=Page[ProductRead])
+@db_bound
+def list_products(page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Get products, one page at a time"""
+    return paginate(db.query(Product), Product.id, page)
+
+@router.get("/search", response_model=Page[ProductSearchHit])
+@db_bound
+def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    order: str = "rank",
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db),
+):
+    """Products with every word of q in name/description (prefixes match), best match or newest first"""
+    filters = []
+    if min_price is not None:
+        filters.append(Product.price >= min_price)
+    if max_price is not None:
+        filters.append(Product.price <= max_price)
+    return search.search(db, "products", q, page, order=order, filters=filters)
 
 @router.get("/{id}", response_model=ProductRead)
 def get_product(id: int, db: Session = Depends(get_db)):
     """Get a specific product"""
-    product = db.query(Product).get(id)
+    product = cached_read(f"product:{id}", ProductRead, lambda: db.query(Product).get(id))
     if not product:
         raise HTTPException(404, "Product not found")
     return product
 
-@router.get("/{id}/orders", response_model=list[OrderRead])
-def get_product_orders(id: int, db: Session = Depends(get_db)):
-    """Get all orders for a specific product"""
+@router.get("/{id}/orders", response_model=Page[OrderRead])
+@db_bound
+def get_product_orders(id: int, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Get orders for a specific product, newest first"""
     product = db.query(Product).get(id)
     if not product:
         raise HTTPException(404, "Product not found")
     
-    orders = db.query(Order).filter(Order.product_id == id).all()
-    return orders
+    query = db.query(Order).filter(Order.product_id == id)
+    return paginate(query, Order.id, page, sort_column=Order.sold_at, descending=True)
 
 @router.get("/{id}/inventory", response_model=InventoryRead)
 def get_product_inventory(id: int, db: Session = Depends(get_db)):
     """Get current inventory for a product"""
-    inventory = db.query(Inventory).filter(Inventory.product_id == id).first()
+    inventory = cached_read(
+        f"inventory:{id}", InventoryRead,
+        lambda: db.query(Inventory).filter(Inventory.product_id == id).first()
+    )
     if not inventory:
         raise HTTPException(404, "Inventory record not found")
     return inventory
 
+@router.get("/{id}/inventory/history/export")
+def export_inventory_history(id: int, format: str = "ndjson", db: Session = Depends(get_db)):
+    """Stream the full inventory history of a product as NDJSON or CSV"""
+    product = db.query(Product).get(id)
+    if not product:
+        raise HTTPException(404, "Product not found")
+
+    def build_query(export_db):
+        return export_db.query(InventoryHistory).filter(
+            InventoryHistory.product_id == id
+        ).order_by(InventoryHistory.changed_at, InventoryHistory.id)
+
+    columns = [InventoryHistory.id, InventoryHistory.product_id, InventoryHistory.old_quantity,
+               InventoryHistory.new_quantity, InventoryHistory.quantity_change,
+               InventoryHistory.change_reason, InventoryHistory.location,
+               InventoryHistory.changed_by, InventoryHistory.changed_at, InventoryHistory.notes]
+    return export_response(build_query, columns, format, f"product_{id}_inventory_history")
+
 @router.put("/{id}/inventory", response_model=InventoryRead)
 def update_inventory(id: int, payload: InventoryUpdate, db: Session = Depends(get_db)):
     """Update product inventory and log the change"""
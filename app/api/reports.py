@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.api.internal import require_internal_token
+from common.async_routes import db_bound
+from common.db import get_db
+from common.export import EXPORT_FORMATS, write_rows
+from common.pagination import PageParams, paginate
+from models.db_models import Report
+from models.schema import Page, ReportCreate, ReportRead, ReportStats, SalesReport
+from services import reports
+from services.sales_rollups import GRAINS, sales_report
+
+router = APIRouter(prefix="/reports")
+
+# Longest window per grain, so one response stays a sane size
+MAX_BUCKETS = {"hour": 24 * 31, "day": 366 * 5}
+
+@router.get("/sales", response_model=SalesReport)
+def get_sales_report(
+    grain: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    by: str = "all",
+    id: Optional[int] = None,
+    status: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """Order count, revenue and average price per hour/day - overall, by status, or per product/customer"""
+    if grain not in GRAINS:
+        raise HTTPException(400, f"Grain must be one of: {list(GRAINS)}")
+    if by not in ("all", "status", "product", "customer"):
+        raise HTTPException(400, "by must be one of: ['all', 'status', 'product', 'customer']")
+    if id is not None and by not in ("product", "customer"):
+        raise HTTPException(400, "id needs by=product or by=customer")
+
+    # Rollups are bucketed in naive UTC, like orders.sold_at
+    start, end = _naive_utc(start), _naive_utc(end)
+    step = timedelta(hours=1) if grain == "hour" else timedelta(days=1)
+    end = end or datetime.utcnow()
+    start = start or end - step * (24 if grain == "hour" else 30)
+    if start >= end:
+        raise HTTPException(400, "start must be before end")
+    if (end - start) / step > MAX_BUCKETS[grain]:
+        raise HTTPException(400, f"Window too long - max {MAX_BUCKETS[grain]} {grain} buckets")
+    return sales_report(db, grain, start, end, by=by, dimension_id=id, status=status, limit=limit)
+
+
+@router.get("/stats", response_model=list[ReportStats])
+def get_report_stats(
+    order_by: str = "total_ms",
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    """Runtime, row count and cache statistics per saved report - most expensive first"""
+    allowed = ["total_ms", "avg_ms", "max_ms", "runs", "total_rows", "max_rows", "errors", "timeouts"]
+    if order_by not in allowed:
+        raise HTTPException(400, f"order_by must be one of: {allowed}")
+    return reports.report_stats(db, order_by, limit)
+
+# Saving a report is an operator action - same X-Internal-Token as /internal
+@router.post("/", response_model=ReportRead, dependencies=[Depends(require_internal_token)])
+def create_report(payload: ReportCreate, db: Session = Depends(get_db)):
+    """Save a report - a single read-only SELECT over REPORT_TABLES with :name parameters"""
+    return reports.describe(reports.create_report(db, payload))
+
+@router.get("/", response_model=Page[ReportRead])
+@db_bound
+def list_reports(page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Get saved reports"""
+    result = paginate(db.query(Report), Report.id, page)
+    result["items"] = [reports.describe(report) for report in result["items"]]
+    return result
+
+@router.get("/{id}", response_model=ReportRead)
+@db_bound
+def get_report(id: int, db: Session = Depends(get_db)):
+    """Get a saved report and the parameters it takes"""
+    return reports.describe(reports.load_report(db, id))
+
+@router.get("/{id}/run")
+def run_report(id: int, request: Request, format: str = "ndjson", refresh: bool = False):
+    """
+    Run a saved report and stream its rows as NDJSON or CSV. Report parameters
+    go in the query string (?status=completed). Served from the result cache
+    when possible - see the X-Report-Cache header.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(400, f"Format must be one of: {list(EXPORT_FORMATS)}")
+    params = {key: value for key, value in request.query_params.items() if key not in reports.RESERVED_PARAMS}
+    result = reports.run(id, params, refresh=refresh)
+    headers = {"X-Report-Cache": result["cache"]}
+    if result["computed_at"]:
+        headers["X-Report-Computed-At"] = result["computed_at"]
+    return StreamingResponse(
+        write_rows(result["columns"], result["batches"], format),
+        media_type=EXPORT_FORMATS[format],
+        headers=headers,
+    )
+
+
+def _naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
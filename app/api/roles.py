@@ -1,18 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from sqlalchemy import exists
 from sqlalchemy.orm import Session
-from common.db import SessionLocal
-from models.db_models import Role, User
-from models.schema import RoleCreate, RoleRead, RoleWithUsers
+from common.async_routes import db_bound
+from common.cache import cached_read
+from common.db import get_db
+from common.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, PageParams, paginate
+from models.db_models import Role, User, UserRole
+from models.schema import RoleCreate, RoleRead, RoleWithUsers, Page
 
 router = APIRouter(prefix="/roles")
 
-def get_db():
-    db = SessionLocal()
-    try: 
-        yield db
-    finally: 
-        db.close()
-
 @router.post("/", response_model=RoleRead)
 def create_role(payload: RoleCreate, db: Session = Depends(get_db)):
     """Create a new role"""
@@ -30,13 +28,14 @@ def create_role(payload: RoleCreate, db: Session = Depends(get_db)):
     
     return new_role
 
-@router.get("/", response_model=list[RoleRead])
-def list_roles(db: Session = Depends(get_db)):
-    """Get all roles"""
-    roles = db.query(Role).all()
-    return roles
+@router.get("/", response_model=Page[RoleRead])
+def list_roles(page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Get roles, one page at a time"""
+    key = f"roles:list:{page.cursor}:{page.limit}:{page.include_total}"
+    return cached_read(key, Page[RoleRead], lambda: paginate(db.query(Role), Role.id, page))
 
 @router.get("/{id}", response_model=RoleRead)
+@db_bound
 def get_role(id: int, db: Session = Depends(get_db)):
     """Get a specific role"""
     role = db.query(Role).get(id)
@@ -45,12 +44,29 @@ def get_role(id: int, db: Session = Depends(get_db)):
     return role
 
 @router.get("/{id}/with-users", response_model=RoleWithUsers)
-def get_role_with_users(id: int, db: Session = Depends(get_db)):
-    """Get role with all users who have this role"""
+@db_bound
+def get_role_with_users(
+    id: int,
+    users_cursor: Optional[str] = None,
+    users_limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    """Get role with a page of the users who have this role"""
     role = db.query(Role).get(id)
     if not role:
         raise HTTPException(404, "Role not found")
-    return role
+
+    # Page through the join table instead of loading role.users in full
+    page = PageParams(cursor=users_cursor, limit=users_limit, include_total=False)
+    users = paginate(
+        db.query(User).join(UserRole, UserRole.user_id == User.id).filter(UserRole.role_id == id),
+        User.id, page
+    )
+    return {
+        **RoleRead.model_validate(role).model_dump(),
+        "users": users["items"],
+        "users_next_cursor": users["next_cursor"],
+    }
 
 @router.put("/{id}", response_model=RoleRead)
 def update_role(id: int, payload: RoleCreate, db: Session = Depends(get_db)):
@@ -78,9 +94,9 @@ def delete_role(id: int, db: Session = Depends(get_db)):
     if not role:
         raise HTTPException(404, "Role not found")
     
-    # Check if any users have this role
-    if role.users:
-        raise HTTPException(400, f"Cannot delete role '{role.name}' - {len(role.users)} users still have this role")
+    # Check if any users have this role (EXISTS - don't load them all)
+    if db.query(exists().where(UserRole.role_id == id)).scalar():
+        raise HTTPException(400, f"Cannot delete role '{role.name}' - users still have this role")
     
     db.delete(role)
     db.commit()
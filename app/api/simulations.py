@@ -0,0 +1,29 @@
+from typing import List, Optional
+from fastapi import APIRouter, Query
+from models.schema import StockoutSimulation
+from services import simulation
+
+router = APIRouter(prefix="/simulations")
+
+@router.get("/stockouts", response_model=StockoutSimulation)
+def simulate_stockouts(
+    product_id: List[int] = Query(...),
+    horizon: int = Query(simulation.SIM_HORIZON_DAYS, ge=1, le=simulation.MAX_HORIZON_DAYS),
+    scenarios: int = Query(simulation.SIM_SCENARIOS, ge=1, le=simulation.MAX_SCENARIOS),
+    seed: Optional[int] = Query(None, ge=0),
+    min_probability: float = Query(0.0, ge=0, le=1),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Monte-Carlo stock-out risk of the given products, riskiest first"""
+    return simulation.simulate_products(
+        product_ids=product_id, horizon=horizon, scenarios=scenarios, seed=seed,
+        min_probability=min_probability, limit=limit,
+    )
+
+@router.get("/stockouts/catalog", response_model=StockoutSimulation)
+def catalog_stockouts(
+    min_probability: float = Query(0.0, ge=0, le=1),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """The last whole-catalog run (nightly, or POST /internal/simulations/stockouts), riskiest first"""
+    return simulation.catalog_risk(min_probability=min_probability, limit=limit)
@@ -1,18 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from common.db import SessionLocal
+from common.async_routes import db_bound
+from common.db import get_db
+from common.pagination import PageParams, paginate
 from models.db_models import Ticket, Customer, Employee
-from models.schema import TicketCreate, TicketRead
+from models.schema import TicketCreate, TicketRead, TicketSearchHit, Page
+from services import search
 from datetime import datetime
 
 router = APIRouter(prefix="/tickets")
 
-def get_db():
-    db = SessionLocal()
-    try: 
-        yield db
-    finally: 
-        db.close()
+TICKET_STATUSES = ["open", "in_progress", "resolved", "closed"]
+TICKET_PRIORITIES = ["low", "medium", "high", "urgent"]
 
 @router.post("/", response_model=TicketRead)
 def create_ticket(payload: TicketCreate, db: Session = Depends(get_db)):
@@ -47,13 +47,39 @@ def create_ticket(payload: TicketCreate, db: Session = Depends(get_db)):
     
     return new_ticket
 
-@router.get("/", response_model=list[TicketRead])
-def list_tickets(db: Session = Depends(get_db)):
-    """Get all tickets"""
-    tickets = db.query(Ticket).all()
-    return tickets
+@router.get("/", response_model=Page[TicketRead])
+@db_bound
+def list_tickets(page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Get tickets, newest first"""
+    return paginate(db.query(Ticket), Ticket.id, page, sort_column=Ticket.created_at, descending=True)
+
+@router.get("/search", response_model=Page[TicketSearchHit])
+@db_bound
+def search_tickets(
+    q: str = Query(..., min_length=1, max_length=200),
+    status: Optional[List[str]] = Query(None),
+    priority: Optional[List[str]] = Query(None),
+    customer_id: Optional[int] = None,
+    order: str = "rank",
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db),
+):
+    """Tickets with every word of q in subject/description (prefixes match), best match or newest first"""
+    filters = []
+    if status:
+        if set(status) - set(TICKET_STATUSES):
+            raise HTTPException(400, f"Status must be one of: {TICKET_STATUSES}")
+        filters.append(Ticket.status.in_(status))
+    if priority:
+        if set(priority) - set(TICKET_PRIORITIES):
+            raise HTTPException(400, f"Priority must be one of: {TICKET_PRIORITIES}")
+        filters.append(Ticket.priority.in_(priority))
+    if customer_id is not None:
+        filters.append(Ticket.customer_id == customer_id)
+    return search.search(db, "tickets", q, page, order=order, filters=filters)
 
 @router.get("/{id}", response_model=TicketRead)
+@db_bound
 def get_ticket(id: int, db: Session = Depends(get_db)):
     """Get a specific ticket"""
     ticket = db.query(Ticket).get(id)
@@ -61,35 +87,36 @@ def get_ticket(id: int, db: Session = Depends(get_db)):
         raise HTTPException(404, "Ticket not found")
     return ticket
 
-@router.get("/by-customer/{customer_id}", response_model=list[TicketRead])
-def get_tickets_by_customer(customer_id: int, db: Session = Depends(get_db)):
-    """Get all tickets for a specific customer"""
+@router.get("/by-customer/{customer_id}", response_model=Page[TicketRead])
+@db_bound
+def get_tickets_by_customer(customer_id: int, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Get tickets for a specific customer, newest first"""
     customer = db.query(Customer).get(customer_id)
     if not customer:
         raise HTTPException(404, "Customer not found")
     
-    tickets = db.query(Ticket).filter(Ticket.customer_id == customer_id).all()
-    return tickets
+    query = db.query(Ticket).filter(Ticket.customer_id == customer_id)
+    return paginate(query, Ticket.id, page, sort_column=Ticket.created_at, descending=True)
 
-@router.get("/by-status/{status}", response_model=list[TicketRead])
-def get_tickets_by_status(status: str, db: Session = Depends(get_db)):
-    """Get all tickets with a specific status"""
-    valid_statuses = ["open", "in_progress", "resolved", "closed"]
-    if status not in valid_statuses:
-        raise HTTPException(400, f"Status must be one of: {valid_statuses}")
-    
-    tickets = db.query(Ticket).filter(Ticket.status == status).all()
-    return tickets
+@router.get("/by-status/{status}", response_model=Page[TicketRead])
+@db_bound
+def get_tickets_by_status(status: str, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Get tickets with a specific status, newest first"""
+    if status not in TICKET_STATUSES:
+        raise HTTPException(400, f"Status must be one of: {TICKET_STATUSES}")
+    
+    query = db.query(Ticket).filter(Ticket.status == status)
+    return paginate(query, Ticket.id, page, sort_column=Ticket.created_at, descending=True)
 
-@router.get("/by-priority/{priority}", response_model=list[TicketRead])
-def get_tickets_by_priority(priority: str, db: Session = Depends(get_db)):
-    """Get all tickets with a specific priority"""
-    valid_priorities = ["low", "medium", "high", "urgent"]
-    if priority not in valid_priorities:
-        raise HTTPException(400, f"Priority must be one of: {valid_priorities}")
-    
-    tickets = db.query(Ticket).filter(Ticket.priority == priority).all()
-    return tickets
+@router.get("/by-priority/{priority}", response_model=Page[TicketRead])
+@db_bound
+def get_tickets_by_priority(priority: str, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Get tickets with a specific priority, newest first"""
+    if priority not in TICKET_PRIORITIES:
+        raise HTTPException(400, f"Priority must be one of: {TICKET_PRIORITIES}")
+    
+    query = db.query(Ticket).filter(Ticket.priority == priority)
+    return paginate(query, Ticket.id, page, sort_column=Ticket.created_at, descending=True)
 
 @router.put("/{id}/status")
 def update_ticket_status(id: int, status: str, db: Session = Depends(get_db)):
@@ -98,9 +125,8 @@ def update_ticket_status(id: int, status: str, db: Session = Depends(get_db)):
     if not ticket:
         raise HTTPException(404, "Ticket not found")
     
-    valid_statuses = ["open", "in_progress", "resolved", "closed"]
-    if status not in valid_statuses:
-        raise HTTPException(400, f"Status must be one of: {valid_statuses}")
+    if status not in TICKET_STATUSES:
+        raise HTTPException(400, f"Status must be one of: {TICKET_STATUSES}")
     
     ticket.status = status
     
@@ -1,18 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
 from sqlalchemy.orm import Session
-from common.db import SessionLocal
+from common.async_routes import db_bound
+from common.db import get_db
+from common.export import export_response
+from common.pagination import PageParams, paginate
 from models.db_models import Transaction, User
-from models.schema import TransactionCreate, TransactionRead
+from models.schema import TransactionCreate, TransactionRead, TransactionTotals, Page
+from services import ledger, transaction_totals
 from datetime import datetime
 
 router = APIRouter(prefix="/transactions")
 
-def get_db():
-    db = SessionLocal()
-    try: 
-        yield db
-    finally: 
-        db.close()
+def parse_date(value: str):
+    """Parse a YYYY-MM-DD query param"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(400, "Invalid date format. Use YYYY-MM-DD")
 
 @router.post("/", response_model=TransactionRead)
 def create_transaction(payload: TransactionCreate, created_by_user_id: int, db: Session = Depends(get_db)):
@@ -39,13 +44,37 @@ def create_transaction(payload: TransactionCreate, created_by_user_id: int, db:
     
     return new_transaction
 
-@router.get("/", response_model=list[TransactionRead])
-def list_transactions(db: Session = Depends(get_db)):
-    """Get all transactions"""
-    transactions = db.query(Transaction).all()
-    return transactions
+@router.get("/", response_model=Page[TransactionRead])
+@db_bound
+def list_transactions(page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Get transactions, one page at a time"""
+    return paginate(db.query(Transaction), Transaction.id, page)
+
+@router.get("/export")
+def export_transactions(
+    format: str = "ndjson",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+):
+    """Stream transactions as NDJSON or CSV, optionally within a date range (YYYY-MM-DD)"""
+    start = parse_date(start_date) if start_date else None
+    end = parse_date(end_date) if end_date else None
+
+    def build_query(db):
+        query = db.query(Transaction)
+        if start:
+            query = query.filter(Transaction.date >= start)
+        if end:
+            query = query.filter(Transaction.date <= end)
+        return query.order_by(Transaction.id)
+
+    columns = [Transaction.id, Transaction.transaction_number, Transaction.date,
+               Transaction.description, Transaction.total_amount, Transaction.created_by,
+               Transaction.updated_at]
+    return export_response(build_query, columns, format, "transactions")
 
 @router.get("/{id}", response_model=TransactionRead)
+@db_bound
 def get_transaction(id: int, db: Session = Depends(get_db)):
     """Get a specific transaction"""
     transaction = db.query(Transaction).get(id)
@@ -53,35 +82,47 @@ def get_transaction(id: int, db: Session = Depends(get_db)):
         raise HTTPException(404, "Transaction not found")
     return transaction
 
-@router.get("/by-user/{user_id}", response_model=list[TransactionRead])
-def get_transactions_by_user(user_id: int, db: Session = Depends(get_db)):
-    """Get all transactions created by a specific user"""
+@router.get("/by-user/{user_id}", response_model=Page[TransactionRead])
+@db_bound
+def get_transactions_by_user(user_id: int, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Get transactions created by a specific user"""
     user = db.query(User).get(user_id)
     if not user:
         raise HTTPException(404, "User not found")
     
-    transactions = db.query(Transaction).filter(Transaction.created_by == user_id).all()
-    return transactions
+    query = db.query(Transaction).filter(Transaction.created_by == user_id)
+    return paginate(query, Transaction.id, page)
 
-@router.get("/by-date-range/")
+@router.get("/by-date-range/", response_model=Page[TransactionRead])
+@db_bound
 def get_transactions_by_date_range(
     start_date: str, 
     end_date: str, 
+    page: PageParams = Depends(),
     db: Session = Depends(get_db)
 ):
     """Get transactions within a date range (YYYY-MM-DD format)"""
-    try:
-        start = datetime.strptime(start_date, "%Y-%m-%d").date()
-        end = datetime.strptime(end_date, "%Y-%m-%d").date()
-    except ValueError:
-        raise HTTPException(400, "Invalid date format. Use YYYY-MM-DD")
+    start = parse_date(start_date)
+    end = parse_date(end_date)
     
-    transactions = db.query(Transaction).filter(
+    query = db.query(Transaction).filter(
         Transaction.date >= start,
         Transaction.date <= end
-    ).all()
+    )
     
-    return transactions
+    return paginate(query, Transaction.id, page, sort_column=Transaction.date)
+
+@router.get("/by-date-range/totals", response_model=TransactionTotals)
+def get_transaction_totals_by_date_range(
+    start_date: str,
+    end_date: str,
+    grain: str = "month",
+    by: str = "all",
+    created_by: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Transaction count and amount per day/week/month (YYYY-MM-DD range, inclusive) - overall or per user"""
+    return transaction_totals.totals(db, parse_date(start_date), parse_date(end_date), grain, by, created_by)
 
 @router.put("/{id}", response_model=TransactionRead)
 def update_transaction(id: int, payload: TransactionCreate, db: Session = Depends(get_db)):
@@ -94,9 +135,14 @@ def update_transaction(id: int, payload: TransactionCreate, db: Session = Depend
     if payload.transaction_number != transaction.transaction_number:
         if db.query(Transaction).filter(Transaction.transaction_number == payload.transaction_number).first():
             raise HTTPException(400, "Transaction number already exists")
+
+    # A posted transaction's amount is the sum of its lines - correct it with another entry
+    posted = ledger.lines_total(db, id)
+    if posted is not None and ledger.cents(payload.total_amount) != ledger.cents(posted):
+        raise HTTPException(400, "Can't change the amount of a posted transaction")
     
     transaction.transaction_number = payload.transaction_number
-    transaction.date = payload.date
+    ledger.redate(db, transaction, payload.date.date())
     transaction.description = payload.description
     transaction.total_amount = payload.total_amount
     
@@ -112,6 +158,8 @@ def delete_transaction(id: int, db: Session = Depends(get_db)):
     if not transaction:
         raise HTTPException(404, "Transaction not found")
     
+    # Lines go too, and come back out of the account balances
+    ledger.unpost(db, transaction)
     db.delete(transaction)
     db.commit()
     
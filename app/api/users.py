@@ -1,25 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import Optional
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import case, exists, update
 from sqlalchemy.orm import Session
-from common.db import SessionLocal
-from models.db_models import User, Role
-from models.schema import UserCreate, UserRead, UserWithRoles
-import hashlib
+from common.async_routes import db_bound
+from common.db import SessionLocal, get_db
+from common.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, PageParams, paginate
+from models.db_models import User, Role, UserRole
+from models.schema import UserCreate, UserLogin, UserRead, UserWithRoles, Page
+from services import passwords
 
 router = APIRouter(prefix="/users")
 
-def get_db():
-    db = SessionLocal()
-    try: 
-        yield db
-    finally: 
-        db.close()
-
-def hash_password(password: str) -> str:
-    """Simple password hashing (in production, use bcrypt or similar)"""
-    return hashlib.sha256(password.encode()).hexdigest()
+async def hashed_password(payload: UserCreate) -> str:
+    """Hashed on the password pool before the handler (and its DB session) starts"""
+    return await passwords.hash_password(payload.password)
 
 @router.post("/", response_model=UserRead)
-def create_user(payload: UserCreate, db: Session = Depends(get_db)):
+def create_user(payload: UserCreate, password_hash: str = Depends(hashed_password), db: Session = Depends(get_db)):
     """Create a new user"""
     # Check if username already exists
     if db.query(User).filter(User.username == payload.username).first():
@@ -32,7 +31,7 @@ def create_user(payload: UserCreate, db: Session = Depends(get_db)):
     new_user = User(
         username=payload.username,
         email=payload.email,
-        password_hash=hash_password(payload.password),
+        password_hash=password_hash,
         first_name=payload.first_name,
         last_name=payload.last_name,
         title=payload.title,
@@ -44,13 +43,46 @@ def create_user(payload: UserCreate, db: Session = Depends(get_db)):
     
     return new_user
 
-@router.get("/", response_model=list[UserRead])
-def list_users(db: Session = Depends(get_db)):
-    """Get all users"""
-    users = db.query(User).all()
-    return users
+def _credentials(username: str):
+    """(UserRead, password hash) or None"""
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.username == username).first()
+        return user and (UserRead.model_validate(user), user.password_hash)
+
+def _record_login(user_id: int, stored: str, new_hash: str = None):
+    """Stamp last_login, and swap in the upgraded hash unless the password changed meanwhile"""
+    values = {"last_login": datetime.utcnow()}
+    if new_hash:
+        values["password_hash"] = case((User.password_hash == stored, new_hash), else_=User.password_hash)
+    with SessionLocal() as db:
+        db.execute(update(User).where(User.id == user_id).values(**values))
+        db.commit()
+
+# async and no db parameter: the KDF is awaited on the password pool, and the
+# two short DB calls run in the threadpool with their own sessions
+@router.post("/login", response_model=UserRead)
+async def login(payload: UserLogin):
+    """Check a username and password. Legacy SHA-256 hashes are upgraded on success."""
+    # Shed load before the DB read, not after
+    passwords.pool.check_capacity()
+    found = await anyio.to_thread.run_sync(_credentials, payload.username)
+    user, stored = found or (None, None)
+    matches, new_hash = await passwords.verify_password(payload.password, stored)
+    if not matches:
+        raise HTTPException(401, "Invalid username or password")
+    if not user.is_active:
+        raise HTTPException(403, "User is inactive")
+    await anyio.to_thread.run_sync(_record_login, user.id, stored, new_hash)
+    return user
+
+@router.get("/", response_model=Page[UserRead])
+@db_bound
+def list_users(page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Get users, one page at a time"""
+    return paginate(db.query(User), User.id, page)
 
 @router.get("/{id}", response_model=UserRead)
+@db_bound
 def get_user(id: int, db: Session = Depends(get_db)):
     """Get a specific user"""
     user = db.query(User).get(id)
@@ -59,12 +91,29 @@ def get_user(id: int, db: Session = Depends(get_db)):
     return user
 
 @router.get("/{id}/with-roles", response_model=UserWithRoles)
-def get_user_with_roles(id: int, db: Session = Depends(get_db)):
-    """Get user with all their roles"""
+@db_bound
+def get_user_with_roles(
+    id: int,
+    roles_cursor: Optional[str] = None,
+    roles_limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    """Get user with a page of their roles"""
     user = db.query(User).get(id)
     if not user:
         raise HTTPException(404, "User not found")
-    return user
+
+    # Page through the join table instead of loading user.roles in full
+    page = PageParams(cursor=roles_cursor, limit=roles_limit, include_total=False)
+    roles = paginate(
+        db.query(Role).join(UserRole, UserRole.role_id == Role.id).filter(UserRole.user_id == id),
+        Role.id, page
+    )
+    return {
+        **UserRead.model_validate(user).model_dump(),
+        "roles": roles["items"],
+        "roles_next_cursor": roles["next_cursor"],
+    }
 
 @router.post("/{user_id}/roles/{role_id}")
 def assign_role_to_user(user_id: int, role_id: int, db: Session = Depends(get_db)):
@@ -77,14 +126,15 @@ def assign_role_to_user(user_id: int, role_id: int, db: Session = Depends(get_db
     if not role:
         raise HTTPException(404, "Role not found")
     
-    # Check if user already has this role
-    if role in user.roles:
+    # Check if user already has this role (EXISTS - don't load user.roles)
+    if db.query(exists().where(UserRole.user_id == user_id, UserRole.role_id == role_id)).scalar():
         raise HTTPException(400, f"User already has role '{role.name}'")
     
-    user.roles.append(role)
+    message = f"Role '{role.name}' assigned to user '{user.username}'"
+    db.add(UserRole(user_id=user_id, role_id=role_id))
     db.commit()
     
-    return {"message": f"Role '{role.name}' assigned to user '{user.username}'"}
+    return {"message": message}
 
 @router.delete("/{user_id}/roles/{role_id}")
 def remove_role_from_user(user_id: int, role_id: int, db: Session = Depends(get_db)):
@@ -97,14 +147,17 @@ def remove_role_from_user(user_id: int, role_id: int, db: Session = Depends(get_
     if not role:
         raise HTTPException(404, "Role not found")
     
-    # Check if user has this role
-    if role not in user.roles:
+    # Remove the link row directly - rowcount tells us if it was there
+    removed = db.query(UserRole).filter(
+        UserRole.user_id == user_id, UserRole.role_id == role_id
+    ).delete(synchronize_session=False)
+    if not removed:
         raise HTTPException(400, f"User does not have role '{role.name}'")
     
-    user.roles.remove(role)
+    message = f"Role '{role.name}' removed from user '{user.username}'"
     db.commit()
     
-    return {"message": f"Role '{role.name}' removed from user '{user.username}'"}
+    return {"message": message}
 
 @router.put("/{id}/activate")
 def activate_user(id: int, db: Session = Depends(get_db)):
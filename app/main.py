@@ -7,17 +7,56 @@ from app.api.roles import router as roles_router
 from app.api.users import router as users_router
 from app.api.transactions import router as transactions_router
 from app.api.tickets import router as tickets_router
+from app.api.imports import router as imports_router
+from app.api.reports import router as reports_router
+from app.api.anomalies import router as anomalies_router
+from app.api.forecasts import router as forecasts_router
+from app.api.simulations import router as simulations_router
+from app.api.elasticity import router as elasticity_router
+from app.api.lookup import router as lookup_router
+from app.api.ledger import router as ledger_router
+from app.api.internal import INTERNAL_API_TOKEN, router as internal_router
+from app.api.debug import router as debug_router
+from common.async_routes import as_async_router
+from common.db import DB_MODE
+from common.query_stats import ENABLE_DEBUG_ENDPOINTS, QueryStatsMiddleware
+from services import typeahead
 
 
 app = FastAPI(title="Monolith Backend API", version="1.0.0")
-app.include_router(health_router)
-app.include_router(customer_router)
-app.include_router(products_router)
-app.include_router(orders_router)
-app.include_router(roles_router)
-app.include_router(users_router)
-app.include_router(transactions_router)
-app.include_router(tickets_router)
+app.add_middleware(QueryStatsMiddleware)
+
+routers = [
+    health_router,
+    customer_router,
+    products_router,
+    orders_router,
+    roles_router,
+    users_router,
+    transactions_router,
+    tickets_router,
+    imports_router,
+    reports_router,
+    anomalies_router,
+    forecasts_router,
+    simulations_router,
+    elasticity_router,
+    lookup_router,
+    ledger_router,
+]
+if INTERNAL_API_TOKEN:
+    routers.append(internal_router)
+if ENABLE_DEBUG_ENDPOINTS:
+    routers.append(debug_router)
+for router in routers:
+    # DB_MODE=async serves the same handlers on the event loop with an async driver
+    app.include_router(as_async_router(router) if DB_MODE == "async" else router)
+
+@app.on_event("startup")
+def warm_typeahead():
+    # In the background - /lookup reads the database until the index is built
+    if typeahead.TYPEAHEAD_WARM:
+        typeahead.schedule_sync()
 
 @app.get("/") 
 def read_root():
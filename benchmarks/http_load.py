@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test: throughput and p50/p95/p99 latency per route.
+
+Runs app.main:app in-process (httpx ASGITransport - no sockets, so the
+numbers are the app + database, not the network), seeds realistic volumes
+with data.seed, then drives a weighted mix of reads and writes across every router for a
+fixed duration. Writes a JSON report; with --baseline it compares against a
+previous report and exits non-zero if any route regressed.
+
+With no DATABASE_URL it uses a SQLite file as the database stand-in:
+
+    python benchmarks/http_load.py --scale 0.1 --duration 30 --output run.json
+    python benchmarks/http_load.py --scale 0.1 --duration 30 --baseline run.json
+
+--scale 1 is 100k customers / 1M orders. An already-seeded database is reused.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/http_load.db")
+os.environ.setdefault("REDIS_URL", "memory://")
+
+import httpx
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import func, select
+
+from app.main import app
+from common.db import DATABASE_URL, DB_MODE, engine
+from data.seed.loader import seed_database
+from data.seed.tables import SPAN_DAYS, START
+from models.db_models import Customer, Employee, Order, Product, Role, Ticket, User
+
+TICKET_STATUSES = ["open", "in_progress", "resolved", "closed"]
+PRIORITIES = ["low", "medium", "high", "urgent"]
+
+
+def _id_range(model):
+    with engine.connect() as conn:
+        return tuple(conn.execute(select(func.min(model.id), func.max(model.id))).one())
+
+
+# Workload
+
+class Workload:
+    """Weighted request mix - each op returns (route label, method, url, json body)"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.customers = _id_range(Customer)
+        self.products = _id_range(Product)
+        self.orders = _id_range(Order)
+        self.users = _id_range(User)
+        self.roles = _id_range(Role)
+        self.tickets = list(range(*_id_range(Ticket)))[-1000:]
+        self.new_tickets = []  # only these get deleted - seeded tickets have comments
+        self.employees = _id_range(Employee)
+        self.tag = uuid.uuid4().hex[:8]
+        self.counter = 0
+        self.ops = [
+            # (weight, op)
+            (8, self.get_customer),
+            (3, self.list_customers),
+            (3, self.customer_with_orders),
+            (1, self.create_customer),
+            (8, self.get_product),
+            (8, self.get_inventory),
+            (3, self.product_orders),
+            (2, self.update_inventory),
+            (10, self.place_order),
+            (1, self.place_order_batch),
+            (5, self.list_orders),
+            (4, self.orders_by_status),
+            (4, self.orders_by_customer),
+            (5, self.get_order),
+            (2, self.update_order_status),
+            (2, self.get_user),
+            (2, self.user_with_roles),
+            (1, self.assign_role),
+            (2, self.list_roles),
+            (1, self.role_with_users),
+            (1, self.create_transaction),
+            (2, self.transactions_by_user),
+            (2, self.transactions_by_date),
+            (2, self.create_ticket),
+            (2, self.update_ticket_status),
+            (1, self.assign_ticket),
+            (3, self.tickets_by_status),
+            (2, self.tickets_by_priority),
+            (2, self.tickets_by_customer),
+            (1, self.delete_ticket),
+            (1, self.health),
+        ]
+        self.weights = [weight for weight, _ in self.ops]
+
+    def next(self):
+        return self.rng.choices(self.ops, self.weights)[0][1]()
+
+    def _id(self, bounds):
+        return self.rng.randint(*bounds)
+
+    def _unique(self):
+        self.counter += 1
+        return f"{self.tag}-{self.counter}"
+
+    # customers
+    def get_customer(self):
+        return "GET /customers/{id}", "GET", f"/customers/{self._id(self.customers)}", None
+
+    def list_customers(self):
+        return "GET /customers/", "GET", "/customers/?limit=50", None
+
+    def customer_with_orders(self):
+        return ("GET /customers/{id}/with-orders", "GET",
+                f"/customers/{self._id(self.customers)}/with-orders?orders_limit=20", None)
+
+    def create_customer(self):
+        return "POST /customers/", "POST", "/customers/", {
+            "name": "Load Test", "email": f"load-{self._unique()}@example.com"}
+
+    # products / inventory
+    def get_product(self):
+        return "GET /products/{id}", "GET", f"/products/{self._id(self.products)}", None
+
+    def get_inventory(self):
+        return "GET /products/{id}/inventory", "GET", f"/products/{self._id(self.products)}/inventory", None
+
+    def product_orders(self):
+        return "GET /products/{id}/orders", "GET", f"/products/{self._id(self.products)}/orders?limit=20", None
+
+    def update_inventory(self):
+        return "PUT /products/{id}/inventory", "PUT", f"/products/{self._id(self.products)}/inventory", {
+            "quantity": 1_000_000, "change_reason": "restock"}
+
+    # orders
+    def place_order(self):
+        return "POST /orders/", "POST", "/orders/", {
+            "customer_id": self._id(self.customers), "product_id": self._id(self.products)}
+
+    def place_order_batch(self):
+        return "POST /orders/batch", "POST", "/orders/batch", [
+            {"customer_id": self._id(self.customers), "product_id": self._id(self.products)} for _ in range(20)]
+
+    def list_orders(self):
+        return "GET /orders/", "GET", "/orders/?limit=20", None
+
+    def orders_by_status(self):
+        status = self.rng.choice(["pending", "completed", "cancelled"])
+        return "GET /orders/by-status/{status}", "GET", f"/orders/by-status/{status}?limit=20", None
+
+    def orders_by_customer(self):
+        return ("GET /orders/by-customer/{id}", "GET",
+                f"/orders/by-customer/{self._id(self.customers)}?limit=20", None)
+
+    def get_order(self):
+        return "GET /orders/{id}", "GET", f"/orders/{self._id(self.orders)}", None
+
+    def update_order_status(self):
+        status = self.rng.choice(["completed", "cancelled"])
+        return ("PUT /orders/{id}/status", "PUT",
+                f"/orders/{self._id(self.orders)}/status?status={status}", None)
+
+    # users / roles
+    def get_user(self):
+        return "GET /users/{id}", "GET", f"/users/{self._id(self.users)}", None
+
+    def user_with_roles(self):
+        return "GET /users/{id}/with-roles", "GET", f"/users/{self._id(self.users)}/with-roles", None
+
+    def assign_role(self):
+        # Every seeded user already has two roles - half of these are 400s, like real traffic
+        return ("POST /users/{id}/roles/{role_id}", "POST",
+                f"/users/{self._id(self.users)}/roles/{self._id(self.roles)}", None)
+
+    def list_roles(self):
+        return "GET /roles/", "GET", "/roles/?limit=20", None
+
+    def role_with_users(self):
+        return "GET /roles/{id}/with-users", "GET", f"/roles/{self._id(self.roles)}/with-users?users_limit=20", None
+
+    # transactions
+    def create_transaction(self):
+        return ("POST /transactions/", "POST", f"/transactions/?created_by_user_id={self._id(self.users)}", {
+            "transaction_number": f"TX-{self._unique()}", "date": "2025-06-01T00:00:00",
+            "description": "Load test", "total_amount": 125.5})
+
+    def transactions_by_user(self):
+        return "GET /transactions/by-user/{id}", "GET", f"/transactions/by-user/{self._id(self.users)}?limit=20", None
+
+    def transactions_by_date(self):
+        start = START.date() + datetime.timedelta(days=self.rng.randrange(SPAN_DAYS - 7))
+        end = start + datetime.timedelta(days=7)
+        return ("GET /transactions/by-date-range/", "GET",
+                f"/transactions/by-date-range/?start_date={start}&end_date={end}&limit=20", None)
+
+    # tickets - created, worked on and deleted during the run
+    def create_ticket(self):
+        return "POST /tickets/", "POST", "/tickets/", {
+            "ticket_number": f"TK-{self._unique()}", "customer_id": self._id(self.customers),
+            "subject": "Load test", "description": "Generated", "priority": self.rng.choice(PRIORITIES)}
+
+    def update_ticket_status(self):
+        status = self.rng.choice(TICKET_STATUSES)
+        return ("PUT /tickets/{id}/status", "PUT",
+                f"/tickets/{self.rng.choice(self.tickets)}/status?status={status}", None)
+
+    def assign_ticket(self):
+        return ("PUT /tickets/{id}/assign/{employee_id}", "PUT",
+                f"/tickets/{self.rng.choice(self.tickets)}/assign/{self._id(self.employees)}", None)
+
+    def tickets_by_status(self):
+        status = self.rng.choice(TICKET_STATUSES)
+        return "GET /tickets/by-status/{status}", "GET", f"/tickets/by-status/{status}?limit=20", None
+
+    def tickets_by_priority(self):
+        priority = self.rng.choice(PRIORITIES)
+        return "GET /tickets/by-priority/{priority}", "GET", f"/tickets/by-priority/{priority}?limit=20", None
+
+    def tickets_by_customer(self):
+        return ("GET /tickets/by-customer/{id}", "GET",
+                f"/tickets/by-customer/{self._id(self.customers)}?limit=20", None)
+
+    def delete_ticket(self):
+        ticket_id = self.new_tickets.pop(self.rng.randrange(len(self.new_tickets))) if self.new_tickets else 0
+        return "DELETE /tickets/{id}", "DELETE", f"/tickets/{ticket_id}", None
+
+    def health(self):
+        return "GET /health", "GET", "/health", None
+
+    def record(self, label, response):
+        """Feed created ids back into the pools"""
+        if label == "POST /tickets/" and response.status_code == 200:
+            self.new_tickets.append(response.json()["id"])
+
+
+# Runner
+
+async def run(workload, concurrency, duration, warmup):
+    samples = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    transport = httpx.ASGITransport(app=app)
+    measure_from = time.perf_counter() + warmup
+    stop_at = measure_from + duration
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def worker():
+            while True:
+                label, method, url, body = workload.next()
+                started = time.perf_counter()
+                if started >= stop_at:
+                    return
+                try:
+                    response = await client.request(method, url, json=body)
+                    status = response.status_code
+                    workload.record(label, response)
+                except Exception:
+                    status = "exception"
+                if started >= measure_from:
+                    samples[label].append(time.perf_counter() - started)
+                    statuses[label][status] += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, statuses
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(samples, statuses, duration):
+    routes = {}
+    for label in sorted(samples):
+        ordered = sorted(samples[label])
+        codes = statuses[label]
+        routes[label] = {
+            "requests": len(ordered),
+            "throughput_rps": round(len(ordered) / duration, 2),
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2),
+            "mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+            "errors": sum(n for code, n in codes.items() if code == "exception" or code >= 500),
+            "status_codes": {str(code): n for code, n in sorted(codes.items(), key=str)},
+        }
+    everything = sorted(latency for values in samples.values() for latency in values)
+    total = {
+        "requests": len(everything),
+        "throughput_rps": round(len(everything) / duration, 2),
+        "p50_ms": round(percentile(everything, 0.50) * 1000, 2) if everything else None,
+        "p95_ms": round(percentile(everything, 0.95) * 1000, 2) if everything else None,
+        "p99_ms": round(percentile(everything, 0.99) * 1000, 2) if everything else None,
+        "errors": sum(route["errors"] for route in routes.values()),
+    }
+    return routes, total
+
+
+def compare(report, baseline, tolerance):
+    """Routes whose p95 grew, or throughput dropped, by more than tolerance"""
+    regressions = []
+    for label, route in report["routes"].items():
+        before = baseline["routes"].get(label)
+        if before is None:
+            continue
+        if route["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {before['p95_ms']}ms -> {route['p95_ms']}ms")
+        if route["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{label}: {before['throughput_rps']} -> {route['throughput_rps']} req/s")
+        if route["errors"] > before["errors"]:
+            regressions.append(f"{label}: errors {before['errors']} -> {route['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for VOLUMES")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=60, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds run before measuring")
+    parser.add_argument("--seed", type=int, default=42, help="RNG seed for data and request mix")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args()
+
+    # Per-request N+1 warnings would drown the report - /debug/queries has them
+    logging.getLogger("common.query_stats").setLevel(logging.ERROR)
+    rng = random.Random(args.seed)
+    command.upgrade(Config(os.path.join(ROOT, "alembic.ini")), "head")
+    with engine.connect() as conn:
+        seeded = conn.execute(select(func.count()).select_from(Customer)).scalar() > 0
+    if seeded:
+        print("database already seeded - reusing it", file=sys.stderr)
+    else:
+        seed_database(DATABASE_URL, scale=args.scale, seed=args.seed, log=lambda line: print(line, file=sys.stderr))
+
+    samples, statuses = asyncio.run(run(Workload(rng), args.concurrency, args.duration, args.warmup))
+    routes, total = summarize(samples, statuses, args.duration)
+    report = {
+        "meta": {
+            "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "database": engine.dialect.name,
+            "db_mode": DB_MODE,
+            "scale": args.scale,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "total": total,
+        "routes": routes,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+    failed = total["errors"] > 0
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(report, json.load(fh), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
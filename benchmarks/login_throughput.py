@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Login throughput and latency at different password hash pool sizes.
+
+Runs app.main:app in-process (httpx ASGITransport), creates --users users
+with current scrypt hashes, then for each pool size drives POST /users/login
+from --concurrency clients for --duration seconds. Alongside, a probe
+requests GET /health every 10 ms - its latency shows whether hashing
+is holding up everything else. Prints logins/s, login p50/p99, 503s (pool at
+capacity) and probe p99 per pool size.
+
+Throughput stops growing at the number of cores (scrypt runs outside the
+GIL, so threads do scale until then):
+
+    export DATABASE_URL=sqlite:////tmp/login_throughput.db
+    alembic upgrade head
+    python benchmarks/login_throughput.py --pool-sizes 1 2 4 8 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("REDIS_URL", "memory://")
+os.environ.setdefault("TYPEAHEAD_WARM", "0")
+
+import httpx
+
+from app.main import app
+from common.db import SessionLocal
+from models.db_models import User
+from services import passwords
+
+PASSWORD = "correct horse battery staple"
+
+
+def seed(count: int) -> list:
+    """Usernames sharing one current-format hash - logins verify, no rehash"""
+    tag = uuid.uuid4().hex[:8]
+    stored = passwords._encode(PASSWORD)
+    names = [f"login-{tag}-{i}" for i in range(count)]
+    db = SessionLocal()
+    try:
+        db.add_all(User(username=name, email=f"{name}@example.com", password_hash=stored, title="Staff", is_active=True)
+                   for name in names)
+        db.commit()
+    finally:
+        db.close()
+    return names
+
+
+def percentiles(values) -> tuple:
+    if not values:
+        return float("nan"), float("nan")
+    p50, p99 = np.percentile(values, [50, 99]) * 1000
+    return p50, p99
+
+
+async def run(client, names: list, concurrency: int, duration: float) -> dict:
+    stop = time.perf_counter() + duration
+    logins, rejected, probes = [], 0, []
+    rng = random.Random(0)
+
+    async def login_client():
+        nonlocal rejected
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            response = await client.post("/users/login", json={"username": rng.choice(names), "password": PASSWORD})
+            if response.status_code == 503:
+                rejected += 1
+                await asyncio.sleep(float(response.headers["Retry-After"]))
+                continue
+            assert response.status_code == 200, response.text
+            logins.append(time.perf_counter() - started)
+
+    async def probe():
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            await client.get("/health")
+            probes.append(time.perf_counter() - started)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(probe(), *(login_client() for _ in range(concurrency)))
+    return {"logins": logins, "rejected": rejected, "probes": probes}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--queue", type=int, default=None, help="queue per pool (default: 4x the pool size)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    names = seed(args.users)
+    print(f"{os.cpu_count()} cores, scrypt n={passwords.PASSWORD_SCRYPT_N} r={passwords.PASSWORD_SCRYPT_R} "
+          f"p={passwords.PASSWORD_SCRYPT_P}, {args.concurrency} clients, {args.duration:.0f}s per pool size")
+    print(f"{'pool':>4} {'queue':>5} {'logins/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'503s':>6} {'probe p99 ms':>13}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for size in args.pool_sizes:
+            queue = args.queue if args.queue is not None else 4 * size
+            passwords.pool = passwords.HashPool(size, queue)
+            result = await run(client, names, args.concurrency, args.duration)
+            passwords.pool.executor.shutdown()
+            p50, p99 = percentiles(result["logins"])
+            _, probe_p99 = percentiles(result["probes"])
+            print(f"{size:>4} {queue:>5} {len(result['logins']) / args.duration:>9.1f} {p50:>8.1f} {p99:>8.1f} "
+                  f"{result['rejected']:>6} {probe_p99:>13.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
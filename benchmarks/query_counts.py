@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Check how many SQL statements the nested-resource endpoints run.
+
+Seeds a customer with many orders and a role with many users, then calls
+each endpoint in-process and compares the X-DB-Queries header to a fixed
+budget. The counts must not grow with the size of the nested collection.
+Exits non-zero on any regression.
+
+    export DATABASE_URL=sqlite:////tmp/query_counts.db
+    alembic upgrade head
+    python benchmarks/query_counts.py
+"""
+import os
+import sys
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from app.main import app
+from common.db import SessionLocal
+from models.db_models import Customer, Order, Product, Role, User, UserRole
+
+SEED_ROWS = 300
+
+
+def seed():
+    tag = uuid.uuid4().hex[:8]
+    db = SessionLocal()
+    try:
+        customer = Customer(name="Big Spender", email=f"big-{tag}@example.com", order_count=SEED_ROWS)
+        product = Product(name="Widget", sku=f"QC-{tag}", price=5.0, quantity=0)
+        role = Role(name=f"employee-{tag}", permissions={})
+        empty_role = Role(name=f"unused-{tag}", permissions={})
+        db.add_all([customer, product, role, empty_role])
+        db.flush()
+        db.add_all(
+            Order(customer_id=customer.id, product_id=product.id, product_name="Widget",
+                  sale_price=5.0, status="pending")
+            for _ in range(SEED_ROWS)
+        )
+        users = [
+            User(username=f"qc-{tag}-{i}", email=f"qc-{tag}-{i}@example.com", password_hash="x", title="Staff")
+            for i in range(SEED_ROWS)
+        ]
+        db.add_all(users)
+        db.flush()
+        db.add_all(UserRole(user_id=user.id, role_id=role.id) for user in users)
+        db.commit()
+        return customer.id, role.id, empty_role.id, users[0].id
+    finally:
+        db.close()
+
+
+def main():
+    customer_id, role_id, empty_role_id, user_id = seed()
+    with TestClient(app) as client:
+        failures = run_checks(client, customer_id, role_id, empty_role_id, user_id)
+    sys.exit(1 if failures else 0)
+
+
+def run_checks(client, customer_id, role_id, empty_role_id, user_id):
+
+    # (method, path, max statements, expected status)
+    checks = [
+        ("GET", f"/customers/{customer_id}/with-orders?orders_limit=20", 2, 200),
+        ("GET", f"/roles/{role_id}/with-users?users_limit=20", 2, 200),
+        ("GET", f"/users/{user_id}/with-roles?roles_limit=20", 2, 200),
+        ("DELETE", f"/roles/{role_id}", 2, 400),
+        ("DELETE", f"/users/{user_id}/roles/{empty_role_id}", 3, 400),
+        ("POST", f"/users/{user_id}/roles/{empty_role_id}", 4, 200),
+        ("DELETE", f"/users/{user_id}/roles/{empty_role_id}", 3, 200),
+        ("DELETE", f"/roles/{empty_role_id}", 4, 200),
+    ]
+
+    failures = 0
+    for method, path, budget, status in checks:
+        response = client.request(method, path)
+        queries = int(response.headers["x-db-queries"])
+        ok = queries <= budget and response.status_code == status
+        failures += not ok
+        print(f"{'ok' if ok else 'FAIL':>4}  {method:<6} {path:<50} "
+              f"status={response.status_code} queries={queries} (budget {budget})")
+    return failures
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# common/async_routes.py
+import functools
+import inspect
+
+from fastapi import APIRouter, Depends
+from fastapi.routing import APIRoute
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from common.db import get_async_db
+
+
+def db_bound(endpoint):
+    """
+    Mark a route that only waits on the database - reads with no commit (commits
+    bump data versions and drop cache keys in Redis), no Redis, Celery or cache
+    calls and no heavy Python work. In DB_MODE=async only these are served on
+    the event loop; any other blocking call there would stall every request.
+    Put it under the @router decorator.
+    """
+    endpoint.db_bound = True
+    return endpoint
+
+
+def _async_endpoint(endpoint, response_model):
+    """
+    Turn a sync @db_bound `def endpoint(..., db: Session)` into an `async def`
+    that gets an AsyncSession and runs the original body through
+    AsyncSession.run_sync. run_sync executes the ORM code in a greenlet on the
+    event loop, so DB I/O goes through the async driver instead of blocking a
+    threadpool slot - and everything else the handler does blocks the loop.
+    Unmarked routes are passed through and run in Starlette's threadpool on a
+    sync Session, like in sync mode.
+    """
+    if not getattr(endpoint, "db_bound", False):
+        return endpoint
+    signature = inspect.signature(endpoint)
+    db_param = next(
+        (name for name, param in signature.parameters.items() if param.annotation is Session),
+        None,
+    )
+    if db_param is None:
+        # No DB access (or it manages its own session, like the export routes)
+        return endpoint
+
+    adapter = TypeAdapter(response_model) if response_model else None
+
+    def call(session, kwargs):
+        result = endpoint(**kwargs, **{db_param: session})
+        if adapter is not None:
+            # Serialize here - lazy relationship loads need the greenlet context
+            result = adapter.validate_python(result, from_attributes=True)
+        return result
+
+    @functools.wraps(endpoint)
+    async def wrapper(**kwargs):
+        db = kwargs.pop(db_param)
+        return await db.run_sync(call, kwargs)
+
+    wrapper.__signature__ = signature.replace(parameters=[
+        param.replace(default=Depends(get_async_db)) if name == db_param else param
+        for name, param in signature.parameters.items()
+    ])
+    return wrapper
+
+
+def as_async_router(router: APIRouter) -> APIRouter:
+    """Async twin of a sync router - same paths, models and handler logic"""
+    async_router = APIRouter()
+    for route in router.routes:
+        if not isinstance(route, APIRoute):
+            async_router.routes.append(route)
+            continue
+        async_router.add_api_route(
+            route.path,
+            _async_endpoint(route.endpoint, route.response_model),
+            methods=list(route.methods),
+            response_model=route.response_model,
+            status_code=route.status_code,
+            name=route.name,
+            dependencies=route.dependencies,  # the router's too, e.g. /internal's token check
+        )
+    return async_router
@@ -0,0 +1,519 @@
+# common/cache.py
+import asyncio
+import fnmatch
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from itertools import chain
+
+import redis
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from models.db_models import Base, Customer, Inventory, Product, Role
+
+# "redis://..." for the real thing, "memory://" for the in-process stand-in
+# (tests / local runs), empty to run with the local tier only
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+CACHE_TTL = int(os.getenv("CACHE_TTL", "300"))  # seconds, Redis tier
+# The local tier is per worker process and only sees its own invalidations,
+# so keep its TTL short - it bounds how stale another worker can be
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", "2"))
+LOCAL_CACHE_SIZE = int(os.getenv("LOCAL_CACHE_SIZE", "10000"))
+# How long a key's generation is kept after its last invalidation. It only
+# has to outlive a load that is in flight, so anything well above CACHE_TTL is safe
+CACHE_GENERATION_TTL = int(os.getenv("CACHE_GENERATION_TTL", str(2 * CACHE_TTL)))
+
+
+class InMemoryRedis:
+    """The few Redis commands the cache, event buffer and report runner use, in a dict - stand-in for tests"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+
+    def get(self, key):
+        with self.lock:
+            item = self._live(key)
+            return item[0] if item else None
+
+    def _live(self, key):
+        item = self.data.get(key)
+        if item is not None and item[1] is not None and item[1] < time.monotonic():
+            del self.data[key]
+            return None
+        return item
+
+    def set(self, key, value, ex=None, nx=False):
+        # Check and write under one lock - callers use nx=True as a mutex
+        with self.lock:
+            if nx and self._live(key) is not None:
+                return None
+            self.data[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def mget(self, keys):
+        with self.lock:
+            items = [self._live(key) for key in keys]
+        return [item[0] if item else None for item in items]
+
+    def incr(self, key, amount=1):
+        with self.lock:
+            item = self._live(key)
+            value = int(item[0]) + amount if item else amount
+            self.data[key] = (value, item[1] if item else None)
+            return value
+
+    def expire(self, key, seconds):
+        with self.lock:
+            item = self._live(key)
+            if item is None:
+                return False
+            self.data[key] = (item[0], time.monotonic() + seconds)
+            return True
+
+    def delete(self, *keys):
+        with self.lock:
+            return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def scan_iter(self, match="*"):
+        with self.lock:
+            keys = list(self.data)
+        return [key for key in keys if fnmatch.fnmatchcase(key, match)]
+
+    # Lists and hashes - used by the order event buffer (services/order_events.py) and reports
+
+    def _list(self, key):
+        return self.data.setdefault(key, ([], None))[0]
+
+    def rpush(self, key, *values):
+        with self.lock:
+            items = self._list(key)
+            items.extend(values)
+            return len(items)
+
+    def lrange(self, key, start, stop):
+        with self.lock:
+            items = self._list(key)
+            return list(items[start:None if stop == -1 else stop + 1])
+
+    def ltrim(self, key, start, stop):
+        with self.lock:
+            items = self._list(key)
+            items[:] = items[start:None if stop == -1 else stop + 1]
+        return True
+
+    def llen(self, key):
+        with self.lock:
+            return len(self._list(key))
+
+    def lindex(self, key, index):
+        with self.lock:
+            items = self._list(key)
+            return items[index] if -len(items) <= index < len(items) else None
+
+    def hincrby(self, key, field, amount=1):
+        with self.lock:
+            fields = self.data.setdefault(key, ({}, None))[0]
+            fields[field] = int(fields.get(field, 0)) + amount
+            return fields[field]
+
+    def hmget(self, key, fields):
+        with self.lock:
+            item = self.data.get(key)
+            values = item[0] if item else {}
+            return [values.get(field) for field in fields]
+
+    def hset(self, key, mapping):
+        with self.lock:
+            self.data.setdefault(key, ({}, None))[0].update(mapping)
+        return len(mapping)
+
+    def hgetall(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            return dict(item[0]) if item else {}
+
+
+class LocalLRU:
+    """Bounded LRU with a per-entry TTL"""
+
+    def __init__(self, capacity: int, ttl: float):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                self.expirations += 1
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self.lock:
+            for key in [key for key in self.entries if key.startswith(prefix)]:
+                del self.entries[key]
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+# One string per generation with its own TTL, so keys that stop being
+# invalidated age out instead of piling up in a single hash
+GENERATION_KEY = "cache_generation:{field}"
+
+
+def _generation_fields(key: str) -> list:
+    """The key itself and every 'prefix:*' an invalidation could name it by"""
+    parts = key.split(":")
+    return [key] + [":".join(parts[:i]) + ":*" for i in range(1, len(parts))]
+
+
+class TwoTierCache:
+    """
+    Read-through cache: local LRU -> Redis -> loader (the DB query).
+    Concurrent misses on one key in this process share a single loader call.
+    Values must be JSON-serializable (cache the response dict, not ORM objects).
+
+    A loader can read the row just before a write commits and finish after
+    the commit's invalidate. So each key (and each 'prefix:*') has a
+    generation, which invalidate bumps before it deletes. A loaded value is
+    only kept if the generation read before the loader ran is unchanged
+    after it's stored. Prefix invalidations must end in ':*'. Generations
+    are forgotten generation_ttl after their last bump.
+    """
+
+    def __init__(self, client, local: LocalLRU, ttl: int, generation_ttl: int):
+        self.client = client
+        self.local = local
+        self.ttl = ttl
+        self.generation_ttl = generation_ttl
+        self.lock = threading.Lock()
+        self.inflight = {}
+        # this process's invalidations: field -> (generation, bumped_at), oldest bump first
+        self.local_generations = OrderedDict()
+        self.stats = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "invalidations": 0,
+            "stale_loads": 0,
+            "redis_errors": 0,
+        }
+
+    def _count(self, name, n=1):
+        with self.lock:
+            self.stats[name] += n
+
+    def _redis_get(self, key):
+        if self.client is None:
+            return None
+        try:
+            raw = self.client.get(key)
+        except redis.RedisError:
+            self._count("redis_errors")
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def _redis_set(self, key, value):
+        if self.client is None:
+            return
+        try:
+            self.client.set(key, json.dumps(value), ex=self.ttl)
+        except redis.RedisError:
+            self._count("redis_errors")
+
+    def _local_generation(self, key: str) -> tuple:
+        with self.lock:
+            return tuple(self.local_generations.get(field, (0,))[0] for field in _generation_fields(key))
+
+    def _redis_generation(self, key: str):
+        """None without Redis or if it can't be reached - then nothing is written to it"""
+        if self.client is None:
+            return None
+        try:
+            fields = _generation_fields(key)
+            return tuple(self.client.mget([GENERATION_KEY.format(field=field) for field in fields]))
+        except redis.RedisError:
+            self._count("redis_errors")
+            return None
+
+    def _local_set(self, key, value, generation: tuple):
+        self.local.set(key, value)
+        if self._local_generation(key) != generation:
+            self.local.delete(key)
+
+    def get_or_load(self, key: str, loader):
+        value = self.local.get(key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+
+        generation = self._local_generation(key)
+        value = self._redis_get(key)
+        if value is not None:
+            self._count("redis_hits")
+            self._local_set(key, value, generation)
+            return value
+
+        # Nothing that reads through the cache is @db_bound, so this runs in a
+        # thread in both DB modes. If it is ever called on the event loop,
+        # blocking on another request's flight would stall the loop, so just load
+        if _on_event_loop():
+            return self._load(key, loader)
+
+        with self.lock:
+            flight = self.inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.inflight[key] = _Flight()
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._load(key, loader)
+            return flight.value
+        except Exception as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            flight.done.set()
+
+    def _load(self, key, loader):
+        self._count("misses")
+        local_generation, redis_generation = self._local_generation(key), self._redis_generation(key)
+        value = loader()
+        if value is None:
+            return value
+        # Set, then re-check: an invalidate either shows up in the check or deletes what was set
+        def unchanged():
+            return (self._local_generation(key) == local_generation
+                    and (redis_generation is None or self._redis_generation(key) == redis_generation))
+
+        if not unchanged():
+            self._count("stale_loads")
+            return value
+        self.local.set(key, value)
+        if redis_generation is not None:
+            self._redis_set(key, value)
+        if not unchanged():
+            self._count("stale_loads")
+            self.local.delete(key)
+            if redis_generation is not None:
+                self._redis_delete(key)
+        return value
+
+    def _redis_delete(self, key):
+        try:
+            self.client.delete(key)
+        except redis.RedisError:
+            self._count("redis_errors")
+
+    def invalidate(self, *keys):
+        """Exact keys, or prefixes ending in ':*'. Generations are bumped before anything is deleted."""
+        exact = [key for key in keys if not key.endswith("*")]
+        prefixes = [key[:-1] for key in keys if key.endswith("*")]
+        now = time.monotonic()
+        with self.lock:
+            for key in keys:
+                generation = self.local_generations.pop(key, (0,))[0] + 1
+                self.local_generations[key] = (generation, now)
+            while self.local_generations:
+                field, (_, bumped_at) = next(iter(self.local_generations.items()))
+                if bumped_at > now - self.generation_ttl:
+                    break
+                del self.local_generations[field]
+        for key in exact:
+            self.local.delete(key)
+        for prefix in prefixes:
+            self.local.delete_prefix(prefix)
+        self._count("invalidations", len(keys))
+
+        if self.client is None:
+            return
+        try:
+            for key in sorted(set(keys)):
+                self.client.incr(GENERATION_KEY.format(field=key))
+                self.client.expire(GENERATION_KEY.format(field=key), self.generation_ttl)
+            for prefix in prefixes:
+                exact.extend(self.client.scan_iter(match=prefix + "*"))
+            if exact:
+                self.client.delete(*exact)
+        except redis.RedisError:
+            self._count("redis_errors")
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+        lookups = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["local_hits"] + stats["redis_hits"]) / lookups, 4) if lookups else 0.0
+        stats["local_size"] = len(self.local.entries)
+        stats["local_capacity"] = self.local.capacity
+        stats["evictions"] = self.local.evictions
+        stats["expirations"] = self.local.expirations
+        stats["backend"] = "none" if self.client is None else type(self.client).__name__
+        return stats
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def make_redis_client(url: str):
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return InMemoryRedis()
+    return redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+
+
+cache = TwoTierCache(make_redis_client(REDIS_URL), LocalLRU(LOCAL_CACHE_SIZE, LOCAL_CACHE_TTL), CACHE_TTL, CACHE_GENERATION_TTL)
+
+
+def cached_read(key: str, schema, fetch):
+    """get_or_load for a row (or page) rendered through its response schema"""
+    def load():
+        row = fetch()
+        if row is None:
+            return None
+        return schema.model_validate(row, from_attributes=True).model_dump(mode="json")
+    return cache.get_or_load(key, load)
+
+
+# Invalidation - keys are collected per session and dropped only once the
+# transaction commits, so a rollback never evicts (or re-caches) anything.
+
+def mark_stale(db: Session, *keys):
+    """For writes that bypass the ORM unit of work (Core UPDATE/INSERT, raw SQL)"""
+    db.info.setdefault("stale_cache_keys", set()).update(keys)
+
+
+def _keys_for(obj):
+    if isinstance(obj, Product):
+        return [f"product:{obj.id}"]
+    if isinstance(obj, Customer):
+        return [f"customer:{obj.id}"]
+    if isinstance(obj, Inventory):
+        return [f"inventory:{obj.product_id}"]
+    if isinstance(obj, Role):
+        return ["roles:*"]
+    return []
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_stale_keys(session, flush_context):
+    keys = [key for obj in chain(session.new, session.dirty, session.deleted) for key in _keys_for(obj)]
+    if keys:
+        mark_stale(session, *keys)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    keys = session.info.pop("stale_cache_keys", None)
+    if keys:
+        cache.invalidate(*keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session):
+    session.info.pop("stale_cache_keys", None)
+
+
+# Data versions - one counter per table, bumped when a transaction that wrote
+# to it commits. Derived results (saved report caches) compare versions instead
+# of being invalidated key by key. It watches the statements themselves, so
+# Core and raw SQL writes count too.
+
+DATA_VERSIONS_KEY = "data_versions"
+_TABLES = frozenset(Base.metadata.tables)
+_WRITE_TARGET = re.compile(r'\b(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+"?(\w+)', re.IGNORECASE)
+_local_versions = Counter()  # without Redis - this process only
+
+
+def bump_data_version(*tables):
+    """For writes made outside this engine (COPY, another service)"""
+    if cache.client is None:
+        _local_versions.update(tables)
+        return
+    try:
+        for table in sorted(tables):
+            cache.client.hincrby(DATA_VERSIONS_KEY, table, 1)
+    except redis.RedisError:
+        cache._count("redis_errors")
+
+
+def data_version(tables) -> dict:
+    """{table: version} - None if Redis can't be reached"""
+    tables = sorted(tables)
+    if cache.client is None:
+        return {table: _local_versions[table] for table in tables}
+    if not tables:
+        return {}
+    try:
+        values = cache.client.hmget(DATA_VERSIONS_KEY, tables)
+    except redis.RedisError:
+        cache._count("redis_errors")
+        return None
+    return {table: int(value or 0) for table, value in zip(tables, values)}
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _collect_written_tables(conn, cursor, statement, parameters, context, executemany):
+    tables = _TABLES.intersection(name.lower() for name in _WRITE_TARGET.findall(statement))
+    if tables:
+        conn.info.setdefault("written_tables", set()).update(tables)
+
+
+@event.listens_for(Engine, "commit")
+def _bump_on_commit(conn):
+    tables = conn.info.pop("written_tables", None)
+    if tables:
+        bump_data_version(*tables)
+
+
+@event.listens_for(Engine, "rollback")
+def _forget_writes(conn):
+    conn.info.pop("written_tables", None)
@@ -1,10 +1,94 @@
 # common/db.py
+import anyio
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from common.pool_metrics import PoolStats, SessionSlots, instrumented_pool
 import os
 
 # Database URL - using PostgreSQL from docker-compose
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/backend")
 
-engine = create_engine(DATABASE_URL)
+# "sync" = routers run in Starlette's threadpool on psycopg2
+# "async" = routers run on the event loop with an async driver (asyncpg / aiosqlite)
+DB_MODE = os.getenv("DB_MODE", "sync")
+# Optional override - by default the async URL is DATABASE_URL with the driver swapped
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+# Connection pool - per process, so total connections = workers * (size + overflow).
+# Sync routers run in Starlette's threadpool (40 threads by default); size + overflow
+# should cover it, otherwise threads queue on the pool and hit DB_POOL_TIMEOUT.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))  # seconds, -1 = never
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+
+
+def _pool_options(pool_class, stats):
+    return {
+        "poolclass": instrumented_pool(pool_class, stats),
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+
+
+pool_stats = PoolStats()
+engine = create_engine(DATABASE_URL, **_pool_options(QueuePool, pool_stats))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+session_slots = SessionSlots(POOL_SIZE + MAX_OVERFLOW)
+
+
+async def get_db():
+    """
+    Request-scoped session - the one dependency every router uses.
+
+    A session keeps its connection until after the response is serialized,
+    and for sync routes both serialization and this cleanup run in
+    Starlette's threadpool. If more requests than the pool can serve were
+    let in, threads blocked on checkout would hold every threadpool slot
+    and the sessions holding connections could never finish. So requests
+    wait for a session slot here, on the event loop, instead.
+    """
+    await session_slots.acquire()
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        try:
+            await anyio.to_thread.run_sync(db.close)
+        finally:
+            session_slots.release()
+
+
+def _async_url(url: str) -> str:
+    """Same database, async driver"""
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+", 1)[0]
+    driver = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}[dialect]
+    return f"{dialect}+{driver}://{rest}"
+
+
+async_engine = None
+AsyncSessionLocal = None
+async_pool_stats = None
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    async_pool_stats = PoolStats()
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL or _async_url(DATABASE_URL),
+        **_pool_options(AsyncAdaptedQueuePool, async_pool_stats),
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,77 @@
+# common/export.py
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from common.db import SessionLocal
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 2000
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def jsonable(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def write_rows(names, partitions, fmt):
+    """Render batches of row tuples as NDJSON lines or CSV (header first), one chunk per batch"""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+        for partition in partitions:
+            writer.writerows(partition)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        yield buffer.getvalue()
+    else:
+        for partition in partitions:
+            yield "".join(
+                json.dumps({name: jsonable(value) for name, value in zip(names, row)}) + "\n"
+                for row in partition
+            )
+
+
+def _stream_rows(build_query, columns, fmt):
+    """
+    Generator that owns its own session so it outlives the request's get_db.
+    Rows come off a server-side cursor in EXPORT_BATCH_SIZE chunks and are
+    written out as plain tuples - no ORM objects or Pydantic per row.
+    """
+    db = SessionLocal()
+    try:
+        statement = build_query(db).with_entities(*columns).statement
+        result = db.execute(
+            statement.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+        )
+        names = [col.key for col in columns]
+        yield from write_rows(names, result.partitions(), fmt)
+    finally:
+        db.close()
+
+
+def export_response(build_query, columns, fmt: str, filename: str) -> StreamingResponse:
+    """Stream the rows of build_query(db) as NDJSON or CSV"""
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(400, f"Format must be one of: {list(EXPORT_FORMATS)}")
+
+    return StreamingResponse(
+        _stream_rows(build_query, columns, fmt),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
@@ -0,0 +1,83 @@
+# common/pagination.py
+import base64
+import json
+from datetime import date, datetime
+from typing import Optional
+
+from fastapi import HTTPException, Query
+from sqlalchemy import tuple_
+
+# Page size limits for every list endpoint
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class PageParams:
+    """Query params shared by all paginated list endpoints"""
+
+    def __init__(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        include_total: bool = False,
+    ):
+        self.cursor = cursor
+        self.limit = limit
+        self.include_total = include_total
+
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    """Turn the last row's sort key into an opaque token"""
+    if isinstance(sort_value, (date, datetime)):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_column):
+    """Inverse of encode_cursor - raises 400 on anything malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        python_type = sort_column.type.python_type
+        if python_type in (date, datetime):
+            sort_value = python_type.fromisoformat(sort_value)
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+
+def paginate(query, id_column, page: PageParams, sort_column=None, descending=False):
+    """
+    Keyset pagination: filter past the last seen (sort key, id) instead of OFFSET,
+    so page 1000 costs the same as page 1. Returns a dict matching schema.Page.
+    """
+    sort_column = sort_column if sort_column is not None else id_column
+
+    total = None
+    if page.include_total:
+        total = query.order_by(None).count()
+
+    if page.cursor:
+        sort_value, row_id = decode_cursor(page.cursor, sort_column)
+        if sort_column is id_column:
+            key, after = id_column, row_id
+        else:
+            key, after = tuple_(sort_column, id_column), tuple_(sort_value, row_id)
+        query = query.filter(key < after if descending else key > after)
+
+    if descending:
+        order = [sort_column.desc()] if sort_column is id_column else [sort_column.desc(), id_column.desc()]
+    else:
+        order = [sort_column.asc()] if sort_column is id_column else [sort_column.asc(), id_column.asc()]
+
+    # Fetch one extra row to know whether there is another page
+    rows = query.order_by(*order).limit(page.limit + 1).all()
+    items = rows[:page.limit]
+
+    next_cursor = None
+    if len(rows) > page.limit:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+    return {"items": items, "next_cursor": next_cursor, "total": total}
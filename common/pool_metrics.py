@@ -0,0 +1,132 @@
+# common/pool_metrics.py
+import threading
+import time
+
+import anyio
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# Upper bounds (seconds) of the checkout-wait histogram buckets
+WAIT_BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0]
+
+
+class PoolStats:
+    """Thread-safe counters for one engine's connection pool"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.timeouts = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.wait_total = 0.0
+        self.wait_counts = [0] * (len(WAIT_BUCKETS) + 1)  # last one is +Inf
+
+    def start_wait(self):
+        with self.lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+    def end_wait(self, seconds: float, timed_out: bool):
+        with self.lock:
+            self.waiting -= 1
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_total += seconds
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.wait_counts[i] += 1
+                    break
+            else:
+                self.wait_counts[-1] += 1
+
+    def record_checkin(self):
+        with self.lock:
+            self.checkins += 1
+
+    def snapshot(self, pool) -> dict:
+        with self.lock:
+            # Cumulative, Prometheus style: le_X = checkouts that waited <= X seconds
+            histogram = {}
+            running = 0
+            for bound, count in zip(WAIT_BUCKETS + ["inf"], self.wait_counts):
+                running += count
+                histogram[f"le_{bound}"] = running
+            return {
+                "pool_size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "in_use": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "waiting": self.waiting,
+                "max_waiting": self.max_waiting,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_histogram": histogram,
+            }
+
+
+def instrumented_pool(base_class, stats: PoolStats):
+    """Subclass of a QueuePool flavour that times how long callers wait for a connection"""
+
+    class InstrumentedPool(base_class):
+        def _do_get(self):
+            started = time.perf_counter()
+            stats.start_wait()
+            timed_out = False
+            try:
+                return super()._do_get()
+            except PoolTimeoutError:
+                timed_out = True
+                raise
+            finally:
+                stats.end_wait(time.perf_counter() - started, timed_out)
+
+        def _do_return_conn(self, record):
+            stats.record_checkin()
+            super()._do_return_conn(record)
+
+    InstrumentedPool.__name__ = f"Instrumented{base_class.__name__}"
+    return InstrumentedPool
+
+
+class SessionSlots:
+    """
+    Admission gate for request sessions, sized to the pool's capacity.
+    Requests queue here (on the event loop) instead of inside threadpool
+    threads blocked on pool checkout.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_use = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self._semaphore = None
+
+    async def acquire(self):
+        if self._semaphore is None:
+            self._semaphore = anyio.Semaphore(self.capacity)
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_use += 1
+
+    def release(self):
+        self.in_use -= 1
+        self._semaphore.release()
+
+    def snapshot(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+        }
@@ -0,0 +1,46 @@
+# common/processes.py
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+
+def process_pool(workers: int):
+    """
+    A started process pool, or None for workers <= 1 or where processes can't
+    be forked (a Celery prefork child is daemonic) - callers then run in process.
+    """
+    if workers <= 1:
+        return None
+    pool = ProcessPoolExecutor(workers)
+    try:
+        pool.submit(int).result()
+        return pool
+    except (AssertionError, OSError, BrokenProcessPool) as exc:
+        pool.shutdown(cancel_futures=True)
+        logger.warning("process pool unavailable (%s) - running in process; CPU-heavy tasks belong on "
+                       "the compute queue's solo worker", exc)
+        return None
+
+
+def map_chunks(function, jobs, workers: int):
+    """
+    function(*args) for each args tuple in jobs, results in order. jobs is read
+    lazily: with a pool at most workers + 1 are in flight, so the next one can
+    load (e.g. from the database) while earlier ones run.
+    """
+    pool = process_pool(workers)
+    if pool is None:
+        for args in jobs:
+            yield function(*args)
+        return
+    with pool:
+        pending = deque()
+        for args in jobs:
+            pending.append(pool.submit(function, *args))
+            if len(pending) > workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
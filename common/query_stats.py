@@ -0,0 +1,160 @@
+# common/query_stats.py
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Same statement shape more than this many times in one request = likely N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+# /debug/queries is only mounted when this is on - never in production
+ENABLE_DEBUG_ENDPOINTS = os.getenv("ENABLE_DEBUG_ENDPOINTS", "false").lower() in ("1", "true", "yes")
+MAX_TRACKED_SHAPES = 2000
+
+
+class RequestQueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+
+_current: ContextVar = ContextVar("request_query_stats", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\bIN\s*\((?:[^()]|\([^()]*\))*\)", re.IGNORECASE)
+_NUMBER = re.compile(r"\b\d+(\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+
+
+def normalize(statement: str) -> str:
+    """Collapse a statement to its shape - expanded IN lists and literals become '?'"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _IN_LIST.sub("IN (?)", shape)
+    shape = _STRING.sub("?", shape)
+    return _NUMBER.sub("?", shape)
+
+
+class StatementRegistry:
+    """Process-wide totals per statement shape, for /debug/queries"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.shapes = {}
+        self.n_plus_one = deque(maxlen=50)
+
+    def record(self, shape: str, seconds: float):
+        with self.lock:
+            entry = self.shapes.get(shape)
+            if entry is None:
+                if len(self.shapes) >= MAX_TRACKED_SHAPES:
+                    return
+                entry = self.shapes[shape] = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0}
+            ms = seconds * 1000
+            entry["calls"] += 1
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+
+    def record_n_plus_one(self, path: str, shape: str, times: int):
+        with self.lock:
+            self.n_plus_one.append({"path": path, "statement": shape, "times": times})
+
+    def slowest(self, limit: int, order_by: str) -> list:
+        with self.lock:
+            rows = [
+                {"statement": shape, **entry, "avg_ms": entry["total_ms"] / entry["calls"]}
+                for shape, entry in self.shapes.items()
+            ]
+        rows.sort(key=lambda row: row[order_by], reverse=True)
+        for row in rows:
+            for key in ("total_ms", "max_ms", "avg_ms"):
+                row[key] = round(row[key], 3)
+        return rows[:limit]
+
+    def reset(self):
+        with self.lock:
+            self.shapes.clear()
+            self.n_plus_one.clear()
+
+
+registry = StatementRegistry()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+    if context is not None:
+        context._query_timed = True
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    if context is not None:
+        context._query_timed = False
+    shape = normalize(statement)
+    registry.record(shape, elapsed)
+
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += elapsed
+        stats.shapes[shape] += 1
+
+
+@event.listens_for(Engine, "handle_error")
+def _drop_failed_start(exception_context):
+    """A failed statement never reaches after_cursor_execute - drop its start time so
+    later statements on the (pooled) connection pair with their own. Errors raised
+    while fetching come after the pop and have nothing to drop."""
+    context = exception_context.execution_context
+    if context is not None and getattr(context, "_query_timed", False):
+        context._query_timed = False
+        started = exception_context.connection.info.get("query_started")
+        if started:
+            started.pop()
+
+
+class QueryStatsMiddleware:
+    """
+    Counts statements and DB time per request and reports them as
+    `Server-Timing: db;dur=...` and `X-DB-Queries` response headers.
+    Requests that repeat one statement shape more than N_PLUS_ONE_THRESHOLD
+    times get `X-DB-N-Plus-One` and a warning in the log.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestQueryStats()
+        token = _current.set(stats)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(stats.count).encode()))
+                headers.append((b"server-timing", f"db;dur={stats.duration * 1000:.2f};desc=\"{stats.count} queries\"".encode()))
+                if stats.shapes:
+                    shape, times = stats.shapes.most_common(1)[0]
+                    if times > N_PLUS_ONE_THRESHOLD:
+                        headers.append((b"x-db-n-plus-one", str(times).encode()))
+                        logger.warning("Possible N+1 on %s: %d x %s", scope["path"], times, shape)
+                        registry.record_n_plus_one(scope["path"], shape, times)
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
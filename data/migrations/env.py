@@ -0,0 +1,48 @@
+# data/migrations/env.py
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from common.db import DATABASE_URL
+from models.db_models import Base
+
+if context.config.config_file_name is not None:
+    fileConfig(context.config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def include_name(name, type_, parent_names):
+    """Full-text search and trigram indexes live outside the models - see 0009 and 0010"""
+    if type_ == "index":
+        return not name.endswith(("_search", "_trgm"))
+    return not (type_ == "table" and (name.endswith("_fts") or "_fts_" in name))
+
+
+def run_migrations_offline():
+    """Emit SQL to stdout (alembic upgrade head --sql) instead of running it"""
+    context.configure(url=DATABASE_URL, target_metadata=target_metadata, literal_binds=True,
+                      include_name=include_name)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connectable = create_engine(DATABASE_URL, poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
+            # SQLite can't ALTER most things - recreate the table instead
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
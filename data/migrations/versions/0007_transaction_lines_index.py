@@ -0,0 +1,37 @@
+"""transaction lines index
+
+Lines are looked up by their transaction (anomaly detection keys a
+transaction by its debit account). Built CONCURRENTLY on Postgres.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 03:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        # CONCURRENTLY can't run inside a transaction
+        with op.get_context().autocommit_block():
+            op.create_index("ix_transaction_lines_transaction_id", "transaction_lines", ["transaction_id"],
+                            postgresql_concurrently=True, if_not_exists=True)
+    else:
+        op.create_index("ix_transaction_lines_transaction_id", "transaction_lines", ["transaction_id"],
+                        if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_transaction_lines_transaction_id", table_name="transaction_lines", if_exists=True)
@@ -0,0 +1,79 @@
+"""search indexes
+
+Full-text indexes for /tickets/search and /products/search.
+
+Postgres: a GIN index on the weighted tsvector expression services/search.py
+queries with (title words weigh A, descriptions B). Postgres maintains it on
+every insert and update. Built CONCURRENTLY.
+
+SQLite: an FTS5 table over the same columns (external content, so text
+isn't stored twice), kept in sync by triggers and filled once here.
+Batch-mode migrations that recreate tickets or products drop the triggers -
+recreate them after one.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 04:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# table: (title column, description column) - must match services/search.py
+SEARCHED = {
+    "tickets": ("subject", "description"),
+    "products": ("name", "description"),
+}
+
+
+def _document(title: str, description: str) -> str:
+    return (f"setweight(to_tsvector('english', coalesce({title}, '')), 'A') || "
+            f"setweight(to_tsvector('english', coalesce({description}, '')), 'B')")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        # CONCURRENTLY can't run inside a transaction
+        with op.get_context().autocommit_block():
+            for table, columns in SEARCHED.items():
+                op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_search "
+                           f"ON {table} USING gin (({_document(*columns)}))")
+        return
+
+    for table, (title, description) in SEARCHED.items():
+        fts = f"{table}_fts"
+        new = f"new.id, new.{title}, new.{description}"
+        old = f"old.id, old.{title}, old.{description}"
+        op.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5({title}, {description}, content='{table}', "
+                   f"content_rowid='id', tokenize='porter unicode61', prefix='2 3')")
+        op.execute(f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN "
+                   f"INSERT INTO {fts}(rowid, {title}, {description}) VALUES ({new}); END")
+        op.execute(f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN "
+                   f"INSERT INTO {fts}({fts}, rowid, {title}, {description}) VALUES ('delete', {old}); END")
+        # Only edits of the searched columns touch the index - status changes don't
+        op.execute(f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {title}, {description} ON {table} BEGIN "
+                   f"INSERT INTO {fts}({fts}, rowid, {title}, {description}) VALUES ('delete', {old}); "
+                   f"INSERT INTO {fts}(rowid, {title}, {description}) VALUES ({new}); END")
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        for table in SEARCHED:
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_search")
+        return
+    for table in SEARCHED:
+        for trigger in ("insert", "delete", "update"):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{trigger}")
+        op.execute(f"DROP TABLE IF EXISTS {table}_fts")
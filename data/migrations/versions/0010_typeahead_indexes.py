@@ -0,0 +1,65 @@
+"""typeahead indexes
+
+For /lookup (services/typeahead.py).
+
+Postgres: the pg_trgm extension and trigram GIN indexes on the lowercased
+looked-up columns - they serve LIKE prefix and fuzzy (word similarity)
+queries. They live outside the models, like the 0009 search indexes.
+
+Both: (updated_at, id) indexes on products and users, so each process can
+cheaply catch up with rows other processes changed.
+
+Built CONCURRENTLY on Postgres.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 05:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (table, column) - must match services/typeahead.py FIELDS
+LOOKED_UP = [
+    ("customers", "name"),
+    ("customers", "email"),
+    ("users", "username"),
+    ("products", "sku"),
+]
+WATERMARKED = ["products", "users"]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        for table in WATERMARKED:
+            op.create_index(f"ix_{table}_updated_at", table, ["updated_at", "id"], if_not_exists=True)
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        for table, column in LOOKED_UP:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_{column}_trgm "
+                       f"ON {table} USING gin (lower({column}) gin_trgm_ops)")
+        for table in WATERMARKED:
+            op.create_index(f"ix_{table}_updated_at", table, ["updated_at", "id"],
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in WATERMARKED:
+        op.drop_index(f"ix_{table}_updated_at", table_name=table, if_exists=True)
+    if op.get_bind().dialect.name == "postgresql":
+        for table, column in LOOKED_UP:
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_{column}_trgm")
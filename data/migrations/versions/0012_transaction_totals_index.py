@@ -0,0 +1,39 @@
+"""transaction totals index
+
+(date, created_by, total_amount) on transactions: the GROUP BY behind
+/transactions/by-date-range/totals reads nothing else, so on Postgres it's an
+index-only range scan. Built CONCURRENTLY on Postgres.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17 07:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, Sequence[str], None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = ["date", "created_by", "total_amount"]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        # CONCURRENTLY can't run inside a transaction
+        with op.get_context().autocommit_block():
+            op.create_index("ix_transactions_date_totals", "transactions", COLUMNS,
+                            postgresql_concurrently=True, if_not_exists=True)
+    else:
+        op.create_index("ix_transactions_date_totals", "transactions", COLUMNS, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_transactions_date_totals", table_name="transactions", if_exists=True)
@@ -0,0 +1,60 @@
+"""report reader role
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-17 11:02:15.384120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0014'
+down_revision: Union[str, Sequence[str], None] = '0013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Saved reports run as this role (services.reports.REPORT_DB_ROLE). Keep the
+# grants in step with REPORT_TABLES / REPORT_HIDDEN_COLUMNS there.
+ROLE = "report_reader"
+TABLES = (
+    "customers", "orders", "products", "inventory", "inventory_history", "locations",
+    "roles", "user_roles", "departments", "employees",
+    "accounts", "transactions", "transaction_lines", "invoices",
+    "vendors", "purchase_orders", "purchase_order_lines",
+    "contacts", "leads", "opportunities", "tickets", "ticket_comments",
+    "sales_rollups", "demand_forecasts",
+)
+# Column grants only - everything but password_hash
+USER_COLUMNS = (
+    "id", "username", "email", "first_name", "last_name", "is_active", "is_admin",
+    "title", "created_at", "last_login", "updated_at",
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return  # SQLite has no roles - services.reports checks reads with an authorizer
+    op.execute(f"""
+        DO $$ BEGIN
+            IF NOT EXISTS (SELECT FROM pg_roles WHERE rolname = '{ROLE}') THEN
+                CREATE ROLE {ROLE} NOLOGIN;
+            END IF;
+        END $$
+    """)
+    # The app's user has to be a member to SET ROLE to it
+    op.execute(f"GRANT {ROLE} TO CURRENT_USER")
+    op.execute(f"GRANT SELECT ON {', '.join(TABLES)} TO {ROLE}")
+    op.execute(f"GRANT SELECT ({', '.join(USER_COLUMNS)}) ON users TO {ROLE}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute(f"REVOKE ALL ON {', '.join(TABLES)}, users FROM {ROLE}")
+    op.execute(f"DROP ROLE IF EXISTS {ROLE}")
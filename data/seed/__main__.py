@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Generate and bulk-load a synthetic dataset covering every model.
+
+    alembic upgrade head
+    python -m data.seed --scale 1 --workers 8             # ~3.7M rows
+    python -m data.seed --scale 10 --defer-indexes        # ~37M rows, for capacity tests
+
+Same --seed/--scale/--chunk-size = same data, whatever the worker count.
+"""
+import argparse
+
+from data.seed.loader import DEFAULT_CHUNK_SIZE, seed_database
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m data.seed")
+    parser.add_argument("--database-url", default=None, help="defaults to DATABASE_URL / common.db")
+    parser.add_argument("--scale", type=float, default=1.0, help="1 = 100k customers, 1M orders")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=None, help="default: one per CPU")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--truncate", action="store_true", help="empty the tables first")
+    parser.add_argument("--defer-indexes", action="store_true",
+                        help="drop secondary indexes during the load and rebuild them after")
+    args = parser.parse_args()
+
+    url = args.database_url
+    if url is None:
+        from common.db import DATABASE_URL
+        url = DATABASE_URL
+
+    seed_database(
+        url,
+        scale=args.scale,
+        seed=args.seed,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        truncate=args.truncate,
+        defer_indexes=args.defer_indexes,
+    )
+
+
+if __name__ == "__main__":
+    main()
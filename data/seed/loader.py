@@ -0,0 +1,176 @@
+# data/seed/loader.py
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from common.cache import bump_data_version
+from data.seed.tables import FINALIZE_SQL, TABLES, TABLES_BY_NAME, counts_for
+from services import sales_rollups, transaction_totals
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+# Set in each worker process by _init_worker
+_engine = None
+
+
+def _init_worker(url: str):
+    global _engine
+    _engine = create_engine(url, poolclass=NullPool)
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def _copy_rows(dbapi_conn, spec, rows):
+    """COPY ... FROM STDIN (psycopg2 or psycopg 3) - None becomes NULL"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+    buffer.seek(0)
+
+    sql = f"COPY {spec.name} ({', '.join(spec.columns)}) FROM STDIN WITH (FORMAT csv)"
+    cursor = dbapi_conn.cursor()
+    try:
+        # Seed data can be regenerated - don't wait for the WAL flush on every chunk
+        cursor.execute("SET LOCAL synchronous_commit = off")
+        if hasattr(cursor, "copy_expert"):
+            cursor.copy_expert(sql, buffer)
+        else:
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+
+def _load_chunk(name, start, stop, counts, seed):
+    """Worker: generate ids start+1..stop and write them. Returns the row count."""
+    spec = TABLES_BY_NAME[name]
+    rows = spec.generate(seed, start, stop, counts)
+    if _engine.dialect.name == "postgresql":
+        dbapi_conn = _engine.raw_connection()
+        try:
+            _copy_rows(dbapi_conn.driver_connection, spec, rows)
+            dbapi_conn.commit()
+        finally:
+            dbapi_conn.close()
+    else:
+        with _engine.begin() as conn:
+            conn.execute(insert(spec.table), [dict(zip(spec.columns, row)) for row in rows])
+    return len(rows)
+
+
+def _chunks(count, chunk_size):
+    return [(start, min(start + chunk_size, count)) for start in range(0, count, chunk_size)]
+
+
+# Derived from the seeded rows - emptied with them. Rollups are rebuilt after
+# the load, forecasts by the next refit, balance snapshots by the next snapshot.
+DERIVED_TABLES = ["sales_rollups", "processed_events", "demand_forecasts", "account_balance_snapshots"]
+
+
+def _check_empty(engine, truncate: bool):
+    with engine.begin() as conn:
+        if truncate:
+            if engine.dialect.name == "postgresql":
+                names = [spec.name for spec in TABLES] + DERIVED_TABLES
+                conn.execute(text(f"TRUNCATE {', '.join(names)} RESTART IDENTITY CASCADE"))
+            else:
+                for name in DERIVED_TABLES:
+                    conn.execute(text(f"DELETE FROM {name}"))
+                for spec in reversed(TABLES):
+                    conn.execute(spec.table.delete())
+            return
+        populated = [
+            spec.name for spec in TABLES
+            if conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {spec.name})")).scalar()
+        ]
+    if populated:
+        raise SystemExit(f"Tables already have data: {', '.join(populated)} - rerun with --truncate")
+
+
+def seed_database(url: str, scale: float = 1.0, seed: int = 42, workers: int = None,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE, truncate: bool = False,
+                  defer_indexes: bool = False, log=print) -> dict:
+    """
+    Fill an empty, migrated database with a synthetic dataset.
+
+    Tables load in foreign-key order; each table is split into chunks that
+    worker processes generate and write in parallel (COPY on Postgres,
+    multi-row INSERTs elsewhere). SQLite allows one writer at a time, so it
+    always loads with a single worker. Returns {table: rows}.
+    """
+    engine = create_engine(url, poolclass=NullPool)
+    postgres = engine.dialect.name == "postgresql"
+    workers = 1 if engine.dialect.name == "sqlite" else (workers or os.cpu_count() or 1)
+    counts = counts_for(scale)
+    _check_empty(engine, truncate)
+
+    deferred = [index for spec in TABLES for index in spec.table.indexes] if defer_indexes else []
+    with engine.begin() as conn:
+        for index in deferred:
+            index.drop(conn, checkfirst=True)
+
+    loaded = {}
+    started = time.perf_counter()
+    executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(url,)) if workers > 1 else None
+    if executor is None:
+        _init_worker(url)
+    try:
+        for spec in TABLES:
+            table_started = time.perf_counter()
+            jobs = [(spec.name, start, stop, counts, seed) for start, stop in _chunks(counts[spec.name], chunk_size)]
+            if executor is None:
+                rows = sum(_load_chunk(*job) for job in jobs)
+            else:
+                rows = sum(executor.map(_load_chunk, *zip(*jobs)))
+            elapsed = time.perf_counter() - table_started
+            loaded[spec.name] = rows
+            log(f"{spec.name:<22} {rows:>11,} rows  {elapsed:7.1f}s  {rows / max(elapsed, 1e-9):>10,.0f} rows/s")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    with engine.begin() as conn:
+        if deferred:
+            index_started = time.perf_counter()
+            for index in deferred:
+                index.create(conn)
+            log(f"rebuilt {len(deferred)} indexes in {time.perf_counter() - index_started:.1f}s")
+        for statement in FINALIZE_SQL:
+            conn.execute(text(statement))
+        if postgres:
+            # Ids were assigned explicitly - move each sequence past them
+            for spec in TABLES:
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{spec.name}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {spec.name}), 0) + 1, false)"
+                ))
+
+    rollup_started = time.perf_counter()
+    with Session(engine) as db:
+        rolled_up = sales_rollups.backfill(db)
+    log(f"{'sales_rollups':<22} {rolled_up['orders']:>11,} orders {time.perf_counter() - rollup_started:7.1f}s")
+
+    if postgres:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("ANALYZE"))
+    # COPY / TRUNCATE don't go through the write tracking - drop cached report results by hand
+    bump_data_version(*loaded, *DERIVED_TABLES)
+    transaction_totals.forget_all()
+
+    total = sum(loaded.values())
+    elapsed = time.perf_counter() - started
+    log(f"{'total':<22} {total:>11,} rows  {elapsed:7.1f}s  {total / max(elapsed, 1e-9):>10,.0f} rows/s")
+    engine.dispose()
+    return loaded
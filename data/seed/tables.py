@@ -0,0 +1,351 @@
+# data/seed/tables.py
+"""
+Row generators for every table in models/db_models.py.
+
+Ids are assigned here (1..count per table) so foreign keys can be drawn
+without reading anything back from the database, and every chunk of rows
+is generated from its own RNG - the output depends only on the seed, the
+scale and the chunk size, never on how many workers produced it.
+"""
+import datetime
+import random
+
+from models.db_models import (
+    Account, AuditLog, Contact, Customer, Department, Employee, Inventory, InventoryHistory, Invoice, Lead,
+    Location, Opportunity, Order, Product, PurchaseOrder, PurchaseOrderLine, Report, Role, Ticket,
+    TicketComment, Transaction, TransactionLine, User, UserRole, Vendor,
+)
+
+# Rows at --scale 1. Lookup tables don't scale.
+BASE_COUNTS = {
+    "customers": 100_000,
+    "contacts": 150_000,
+    "users": 10_000,
+    "employees": 2_000,
+    "vendors": 1_000,
+    "products": 10_000,
+    "inventory_history": 500_000,
+    "orders": 1_000_000,
+    "invoices": 200_000,
+    "purchase_orders": 20_000,
+    "leads": 50_000,
+    "opportunities": 50_000,
+    "tickets": 100_000,
+    "transactions": 300_000,
+    "audit_logs": 200_000,
+}
+FIXED_COUNTS = {
+    "roles": 12,
+    "departments": 20,
+    "locations": 50,
+    "accounts": 200,
+    "reports": 25,
+}
+# Child rows per parent row
+ROLES_PER_USER = 2
+LINES_PER_PO = 3
+COMMENTS_PER_TICKET = 3
+LINES_PER_TRANSACTION = 2  # one debit, one credit - every transaction balances
+
+START = datetime.datetime(2023, 1, 1)
+SPAN_DAYS = 3 * 365
+
+FIRST_NAMES = ["Ava", "Ben", "Chloe", "Dan", "Ella", "Finn", "Grace", "Hugo", "Isla", "Jack",
+               "Kira", "Liam", "Maya", "Noah", "Olive", "Paul", "Quinn", "Rosa", "Sam", "Tara"]
+LAST_NAMES = ["Smith", "Jones", "Brown", "Garcia", "Miller", "Davis", "Wilson", "Moore",
+              "Taylor", "Clark", "Lewis", "Walker", "Young", "King", "Wright", "Scott"]
+CITIES = [("Austin", "TX"), ("Boston", "MA"), ("Chicago", "IL"), ("Denver", "CO"), ("Miami", "FL"),
+          ("Portland", "OR"), ("Seattle", "WA"), ("Phoenix", "AZ"), ("Atlanta", "GA"), ("Newark", "NJ")]
+WAREHOUSES = ["Main Warehouse", "East Warehouse", "West Warehouse"]
+ORDER_STATUSES = ["pending", "completed", "completed", "completed", "completed", "cancelled"]
+TICKET_STATUSES = ["open", "in_progress", "resolved", "closed", "closed", "closed"]
+PRIORITIES = ["low", "medium", "medium", "high", "urgent"]
+ACCOUNT_TYPES = ["asset", "liability", "equity", "revenue", "expense"]
+ROLE_NAMES = ["admin", "manager", "employee", "support", "sales", "finance",
+              "warehouse", "purchasing", "hr", "auditor", "analyst", "readonly"]
+REPORT_QUERIES = [
+    ("Orders by status", "SELECT status, COUNT(*) AS orders, SUM(sale_price) AS revenue FROM orders GROUP BY status"),
+    ("Top products", "SELECT product_id, COUNT(*) AS orders FROM orders GROUP BY product_id ORDER BY orders DESC LIMIT 50"),
+    ("Open tickets by priority", "SELECT priority, COUNT(*) AS tickets FROM tickets WHERE status = 'open' GROUP BY priority"),
+    ("Low stock", "SELECT product_id, quantity, location FROM inventory WHERE quantity < 10 ORDER BY quantity"),
+    ("Overdue invoices", "SELECT customer_id, COUNT(*) AS invoices, SUM(total_amount) AS owed FROM invoices WHERE status = 'overdue' GROUP BY customer_id"),
+]
+
+_MASK = (1 << 64) - 1
+
+
+def unit(n: int, salt: int) -> float:
+    """Stateless uniform [0, 1) from an integer (splitmix64) - for values another table must agree on"""
+    x = (n * 0x9E3779B97F4A7C15 + salt * 0xD1B54A32D192ED03) & _MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK
+    return (x ^ (x >> 31)) / 2.0 ** 64
+
+
+def product_price(product_id: int) -> float:
+    return round(5 + 495 * unit(product_id, 1), 2)
+
+
+def transaction_amount(transaction_id: int) -> float:
+    return round(10 + 9990 * unit(transaction_id, 2), 2)
+
+
+def _skewed(rng: random.Random, count: int) -> int:
+    """Id in 1..count with low ids much more popular - hot customers / best sellers"""
+    return int(count * rng.random() ** 2) + 1
+
+
+def _moment(rng: random.Random) -> datetime.datetime:
+    return START + datetime.timedelta(seconds=rng.randrange(SPAN_DAYS * 86400))
+
+
+def _name(rng):
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+
+def _phone(rng):
+    return f"555-{rng.randrange(1000):03d}-{rng.randrange(10000):04d}"
+
+
+def counts_for(scale: float) -> dict:
+    counts = {table: max(int(rows * scale), 1) for table, rows in BASE_COUNTS.items()}
+    counts.update(FIXED_COUNTS)
+    # employees are users, department heads are employees
+    counts["employees"] = min(max(counts["employees"], counts["departments"]), counts["users"])
+    counts["users"] = max(counts["users"], counts["employees"])
+    counts["inventory"] = counts["products"]
+    counts["user_roles"] = counts["users"] * ROLES_PER_USER
+    counts["purchase_order_lines"] = counts["purchase_orders"] * LINES_PER_PO
+    counts["ticket_comments"] = counts["tickets"] * COMMENTS_PER_TICKET
+    counts["transaction_lines"] = counts["transactions"] * LINES_PER_TRANSACTION
+    return counts
+
+
+# One function per table: (rng, id, counts) -> tuple in TableSpec.columns order
+
+def _customer(rng, i, c):
+    first, last = _name(rng)
+    return i, f"{first} {last}", f"customer{i}@example.com", _moment(rng), 0
+
+
+def _product(rng, i, c):
+    created = _moment(rng)
+    return (i, f"Product {i}", f"SKU-{i:08d}", product_price(i), f"Synthetic product {i}",
+            created, created, 0, rng.randint(0, 5000))
+
+
+def _inventory(rng, i, c):
+    return i, i, rng.randint(0, 5000), rng.choice(WAREHOUSES), _moment(rng)
+
+
+def _inventory_history(rng, i, c):
+    old = rng.randint(0, 5000)
+    reason = rng.choices(["sale", "restock", "adjustment", "damage"], [80, 12, 5, 3])[0]
+    change = {"sale": -1, "restock": rng.randint(50, 500)}.get(reason, -rng.randint(1, min(old, 20) or 1))
+    new = max(old + change, 0)
+    return (i, _skewed(rng, c["products"]), old, new, new - old, reason, rng.choice(WAREHOUSES),
+            "order_system" if reason == "sale" else f"user{rng.randint(1, c['users'])}", _moment(rng), None)
+
+
+def _order(rng, i, c):
+    product_id = _skewed(rng, c["products"])
+    return (i, f"Product {product_id}", product_price(product_id), _moment(rng),
+            rng.choice(ORDER_STATUSES), _skewed(rng, c["customers"]), product_id, False)
+
+
+def _user(rng, i, c):
+    first, last = _name(rng)
+    created = _moment(rng)
+    return (i, f"user{i}", f"user{i}@example.com", "!seeded", first, last, rng.random() < 0.9,
+            i == 1, "Staff", created, created + datetime.timedelta(days=rng.randrange(30)), created)
+
+
+def _role(rng, i, c):
+    return i, ROLE_NAMES[i - 1] if i <= len(ROLE_NAMES) else f"role-{i}", {"read": True, "write": i <= 3}
+
+
+def _user_role(rng, i, c):
+    user_id, k = divmod(i - 1, ROLES_PER_USER)
+    user_id += 1
+    return i, user_id, (user_id + k * 5) % c["roles"] + 1
+
+
+def _department(rng, i, c):
+    # manager_id is filled in once employees exist - the two tables reference each other
+    return i, f"Department {i}", None, round(rng.uniform(1e5, 5e6), 2)
+
+
+def _employee(rng, i, c):
+    department_id = (i - 1) % c["departments"] + 1
+    # employees 1..departments head their department and report to nobody
+    manager_id = None if i <= c["departments"] else department_id
+    return (i, i, f"EMP{i:07d}", department_id, rng.choice(["Associate", "Analyst", "Lead", "Engineer"]),
+            round(rng.uniform(40_000, 180_000), 2), _moment(rng).date(), manager_id)
+
+
+def _location(rng, i, c):
+    city, state = rng.choice(CITIES)
+    return i, f"{city} Site {i}", f"{rng.randint(1, 9999)} Main St", city, state, "US", f"{rng.randrange(100000):05d}"
+
+
+def _account(rng, i, c):
+    kind = ACCOUNT_TYPES[(i - 1) % len(ACCOUNT_TYPES)]
+    return i, f"{1000 + i}", f"{kind.title()} account {i}", kind, 0
+
+
+def _transaction(rng, i, c):
+    day = _moment(rng)
+    return (i, f"TX-{i:09d}", day.date(), "Synthetic journal entry", transaction_amount(i),
+            rng.randint(1, c["users"]), day)
+
+
+def _transaction_line(rng, i, c):
+    transaction_id, k = divmod(i - 1, LINES_PER_TRANSACTION)
+    transaction_id += 1
+    amount = transaction_amount(transaction_id)
+    account_id = int(unit(transaction_id, 3 + k) * c["accounts"]) + 1
+    return (i, transaction_id, account_id, amount, 0) if k == 0 else (i, transaction_id, account_id, 0, amount)
+
+
+def _invoice(rng, i, c):
+    issued = _moment(rng).date()
+    subtotal = round(rng.uniform(50, 20_000), 2)
+    tax = round(subtotal * 0.08, 2)
+    return (i, f"INV-{i:09d}", _skewed(rng, c["customers"]), issued, issued + datetime.timedelta(days=30),
+            subtotal, tax, round(subtotal + tax, 2), rng.choice(["draft", "sent", "paid", "paid", "overdue"]))
+
+
+def _vendor(rng, i, c):
+    return (i, f"Vendor {i}", f"vendor{i}@example.com", _phone(rng), f"{rng.randint(1, 9999)} Supply Rd",
+            rng.choice(["Net 30", "Net 60", "COD"]), rng.random() < 0.95)
+
+
+def _purchase_order(rng, i, c):
+    ordered = _moment(rng).date()
+    # total_amount is summed from the lines after loading
+    return (i, f"PO-{i:08d}", rng.randint(1, c["vendors"]), ordered, ordered + datetime.timedelta(days=rng.randint(3, 45)),
+            rng.choice(["pending", "approved", "shipped", "received", "received"]), 0)
+
+
+def _purchase_order_line(rng, i, c):
+    po_id = (i - 1) // LINES_PER_PO + 1
+    product_id = rng.randint(1, c["products"])
+    ordered = rng.randint(10, 500)
+    return (i, po_id, product_id, ordered, rng.choice([0, ordered]), round(product_price(product_id) * 0.6, 2))
+
+
+def _report(rng, i, c):
+    name, query = REPORT_QUERIES[(i - 1) % len(REPORT_QUERIES)]
+    return i, f"{name} #{i}", f"Seeded report: {name.lower()}", query, rng.randint(1, c["users"]), i % 2 == 0, None
+
+
+def _audit_log(rng, i, c):
+    table = rng.choice(["customers", "products", "orders", "tickets"])
+    action = rng.choice(["CREATE", "UPDATE", "UPDATE", "DELETE"])
+    return (i, table, rng.randint(1, c["customers"]), action,
+            None if action == "CREATE" else {"status": "pending"},
+            None if action == "DELETE" else {"status": "completed"},
+            rng.randint(1, c["users"]), _moment(rng), f"10.0.{rng.randrange(256)}.{rng.randrange(256)}")
+
+
+def _contact(rng, i, c):
+    first, last = _name(rng)
+    customer_id = (i - 1) % c["customers"] + 1
+    return (i, customer_id, first, last, rng.choice(["Buyer", "Owner", "Accounts"]),
+            f"contact{i}@example.com", _phone(rng), i <= c["customers"])
+
+
+def _lead(rng, i, c):
+    first, last = _name(rng)
+    return (i, f"Company {i}", f"{first} {last}", f"lead{i}@example.com", _phone(rng),
+            rng.choice(["website", "referral", "cold_call"]), rng.choice(["new", "contacted", "qualified", "converted"]),
+            rng.randint(1, c["employees"]))
+
+
+def _opportunity(rng, i, c):
+    return (i, _skewed(rng, c["customers"]), f"Deal {i}", round(rng.uniform(1_000, 250_000), 2),
+            rng.choice([10.0, 25.0, 50.0, 75.0, 90.0]), rng.choice(["prospecting", "proposal", "negotiation", "closed"]),
+            _moment(rng).date(), rng.randint(1, c["employees"]))
+
+
+def _ticket(rng, i, c):
+    created = _moment(rng)
+    status = rng.choice(TICKET_STATUSES)
+    resolved = created + datetime.timedelta(hours=rng.randint(1, 240)) if status in ("resolved", "closed") else None
+    return (i, f"TK-{i:09d}", _skewed(rng, c["customers"]), f"Issue {i}", "Synthetic support ticket",
+            rng.choice(PRIORITIES), status, rng.randint(1, c["employees"]) if status != "open" else None,
+            created, resolved or created, resolved)
+
+
+def _ticket_comment(rng, i, c):
+    ticket_id = (i - 1) // COMMENTS_PER_TICKET + 1
+    at = _moment(rng)
+    return i, ticket_id, "Synthetic comment", rng.random() < 0.3, rng.randint(1, c["users"]), at, at
+
+
+class TableSpec:
+    def __init__(self, model, row, columns):
+        self.model = model
+        self.table = model.__table__
+        self.name = self.table.name
+        self.row = row
+        self.columns = columns
+
+    def generate(self, seed: int, start: int, stop: int, counts: dict) -> list:
+        """Rows with ids start+1..stop - same rows for the same arguments, in any process"""
+        rng = random.Random(f"{seed}:{self.name}:{start}")
+        return [self.row(rng, i, counts) for i in range(start + 1, stop + 1)]
+
+
+def _spec(model, row):
+    return TableSpec(model, row, [column.name for column in model.__table__.columns])
+
+
+# Load order - every table comes after the tables it references
+TABLES = [
+    _spec(Account, _account),
+    _spec(Customer, _customer),
+    _spec(User, _user),
+    _spec(Role, _role),
+    _spec(Department, _department),
+    _spec(Location, _location),
+    _spec(Product, _product),
+    _spec(Vendor, _vendor),
+    _spec(Employee, _employee),
+    _spec(UserRole, _user_role),
+    _spec(Inventory, _inventory),
+    _spec(InventoryHistory, _inventory_history),
+    _spec(Order, _order),
+    _spec(Contact, _contact),
+    _spec(Invoice, _invoice),
+    _spec(PurchaseOrder, _purchase_order),
+    _spec(PurchaseOrderLine, _purchase_order_line),
+    _spec(Transaction, _transaction),
+    _spec(TransactionLine, _transaction_line),
+    _spec(Report, _report),
+    _spec(AuditLog, _audit_log),
+    _spec(Lead, _lead),
+    _spec(Opportunity, _opportunity),
+    _spec(Ticket, _ticket),
+    _spec(TicketComment, _ticket_comment),
+]
+TABLES_BY_NAME = {spec.name: spec for spec in TABLES}
+
+# Columns derived from other tables, filled in once everything is loaded
+FINALIZE_SQL = [
+    "UPDATE departments SET manager_id = id",
+    """UPDATE customers SET order_count = counts.n
+         FROM (SELECT customer_id, COUNT(*) AS n FROM orders GROUP BY customer_id) AS counts
+        WHERE customers.id = counts.customer_id""",
+    """UPDATE products SET order_count = counts.n
+         FROM (SELECT product_id, COUNT(*) AS n FROM orders GROUP BY product_id) AS counts
+        WHERE products.id = counts.product_id""",
+    """UPDATE accounts SET balance = sums.balance
+         FROM (SELECT account_id, SUM(debit_amount - credit_amount) AS balance
+                 FROM transaction_lines GROUP BY account_id) AS sums
+        WHERE accounts.id = sums.account_id""",
+    """UPDATE purchase_orders SET total_amount = sums.total
+         FROM (SELECT po_id, SUM(quantity_ordered * unit_price) AS total
+                 FROM purchase_order_lines GROUP BY po_id) AS sums
+        WHERE purchase_orders.id = sums.po_id""",
+]
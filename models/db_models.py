@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text, Boolean, JSON, Date
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Float, Text, Boolean, JSON, Date, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 import datetime
@@ -18,6 +18,13 @@ class Customer(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    # Hot filters + the (sold_at, id) keyset order the list endpoints page by
+    __table_args__ = (
+        Index("ix_orders_sold_at_id", "sold_at", "id"),
+        Index("ix_orders_status_sold_at", "status", "sold_at", "id"),
+        Index("ix_orders_customer_sold_at", "customer_id", "sold_at", "id"),
+        Index("ix_orders_product_sold_at", "product_id", "sold_at", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     product_name = Column(String, nullable=False)
     sale_price = Column(Float, nullable=False)
@@ -31,9 +38,15 @@ class Order(Base):
     customer = relationship("Customer", back_populates="orders")
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     product = relationship("Product", back_populates="orders")
+    # Set once the order is counted in sales_rollups - the consumer, status changes
+    # and the backfill all go through this flag so nothing is counted twice
+    in_rollups = Column(Boolean, nullable=False, default=False, server_default=text("false"))
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index("ix_products_updated_at", "updated_at", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     sku = Column(String, unique=True, index=True)
@@ -49,6 +62,9 @@ class Product(Base):
 
 class Inventory(Base):
     __tablename__ = "inventory"
+    __table_args__ = (
+        Index("ix_inventory_product_id", "product_id", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     quantity = Column(Integer, nullable=False, default=0)
@@ -60,6 +76,9 @@ class Inventory(Base):
 
 class InventoryHistory(Base):
     __tablename__ = "inventory_history"
+    __table_args__ = (
+        Index("ix_inventory_history_product_changed_at", "product_id", "changed_at", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     old_quantity = Column(Integer, nullable=False)
@@ -78,6 +97,9 @@ class InventoryHistory(Base):
 #user management and authentication
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_updated_at", "updated_at", "id"),
+    )
     id = Column(Integer, primary_key=True)
     username = Column(String, unique=True, nullable=False)
     email = Column(String, unique=True, nullable=False)
@@ -105,6 +127,10 @@ class Role(Base):
 
 class UserRole(Base):  # Many-to-many
     __tablename__ = "user_roles"
+    __table_args__ = (
+        Index("ux_user_roles_user_role", "user_id", "role_id", unique=True),
+        Index("ix_user_roles_role_user", "role_id", "user_id"),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     role_id = Column(Integer, ForeignKey("roles.id"))
@@ -116,7 +142,7 @@ class Department(Base):
     __tablename__ = "departments"
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)  # "Sales", "Engineering", "HR"
-    manager_id = Column(Integer, ForeignKey("employees.id"))
+    manager_id = Column(Integer, ForeignKey("employees.id", use_alter=True, name="departments_manager_id_fkey"))
     budget = Column(Float)
 
 class Employee(Base):
@@ -152,6 +178,12 @@ class Account(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_date_id", "date", "id"),
+        Index("ix_transactions_created_by", "created_by", "id"),
+        # Covers the date-range totals (services/transaction_totals.py) - index-only scans on Postgres
+        Index("ix_transactions_date_totals", "date", "created_by", "total_amount"),
+    )
     id = Column(Integer, primary_key=True)
     transaction_number = Column(String, unique=True)
     date = Column(Date)
@@ -162,6 +194,9 @@ class Transaction(Base):
 
 class TransactionLine(Base):  # Double-entry bookkeeping
     __tablename__ = "transaction_lines"
+    __table_args__ = (
+        Index("ix_transaction_lines_transaction_id", "transaction_id"),
+    )
     id = Column(Integer, primary_key=True)
     transaction_id = Column(Integer, ForeignKey("transactions.id"))
     account_id = Column(Integer, ForeignKey("accounts.id"))
@@ -223,6 +258,7 @@ class Report(Base):
     query = Column(Text)  # SQL query or report definition
     created_by = Column(Integer, ForeignKey("users.id"))
     is_public = Column(Boolean, default=False)
+    timeout_ms = Column(Integer)  # statement timeout, REPORT_TIMEOUT_MS when empty
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
@@ -271,6 +307,19 @@ class Opportunity(Base):
 
 class Ticket(Base):
     __tablename__ = "tickets"
+    # Lists page by (created_at, id) under each filter; the open queue gets its own partial index
+    __table_args__ = (
+        Index("ix_tickets_created_at_id", "created_at", "id"),
+        Index("ix_tickets_status_created_at", "status", "created_at", "id"),
+        Index("ix_tickets_priority_created_at", "priority", "created_at", "id"),
+        Index("ix_tickets_customer_created_at", "customer_id", "created_at", "id"),
+        Index("ix_tickets_status_priority", "status", "priority"),
+        Index(
+            "ix_tickets_open_priority", "priority", "created_at",
+            postgresql_where=text("status = 'open'"),
+            sqlite_where=text("status = 'open'"),
+        ),
+    )
     id = Column(Integer, primary_key=True)
     ticket_number = Column(String, unique=True)
     customer_id = Column(Integer, ForeignKey("customers.id"))
@@ -292,4 +341,90 @@ class TicketComment(Base):
     created_by = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
-    
\ No newline at end of file
+    
+
+
+#bulk imports
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # "products", "customers"
+    source = Column(String, nullable=False)  # file path under IMPORT_DIR
+    format = Column(String, nullable=False)  # "csv", "ndjson"
+    status = Column(String, nullable=False, default="pending")  # "pending", "running", "completed", "failed"
+    source_size = Column(BigInteger)
+    # Resume point - byte offset just past the last committed chunk
+    checkpoint_offset = Column(BigInteger, nullable=False, default=0)
+    rows_read = Column(Integer, nullable=False, default=0)
+    rows_inserted = Column(Integer, nullable=False, default=0)
+    rows_updated = Column(Integer, nullable=False, default=0)
+    rows_rejected = Column(Integer, nullable=False, default=0)
+    rows_per_sec = Column(Float)
+    sample_errors = Column(JSON)  # first few rejected rows: [{"row": n, "error": "..."}]
+    error = Column(Text)  # why the job failed
+    # Claim of the worker running it - a "running" job whose heartbeat is older
+    # than INGEST_HEARTBEAT_TIMEOUT has lost its worker and can be resumed
+    owner = Column(String)
+    heartbeat_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+
+#background tasks
+# Idempotency keys - an event whose key is here has already been applied
+class ProcessedEvent(Base):
+    __tablename__ = "processed_events"
+    __table_args__ = (
+        Index("ix_processed_events_processed_at", "processed_at"),
+    )
+    key = Column(String, primary_key=True)  # e.g. "order_created:123"
+    processed_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+
+#reporting
+# Pre-aggregated sales: one row per (grain, dimension, id, bucket, status).
+# dimension "all" (dimension_id 0) is the per-status total.
+class SalesRollup(Base):
+    __tablename__ = "sales_rollups"
+    __table_args__ = (
+        # Top-N products / customers over a window
+        Index("ix_sales_rollups_window", "grain", "dimension", "bucket"),
+    )
+    grain = Column(String, primary_key=True)  # "hour", "day"
+    dimension = Column(String, primary_key=True)  # "all", "product", "customer"
+    dimension_id = Column(Integer, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # start of the hour / day, UTC
+    status = Column(String, primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+
+# Fitted demand model per product (services/modeling.py). A nightly refit only
+# touches products with sales rows past last_row_id.
+class DemandForecast(Base):
+    __tablename__ = "demand_forecasts"
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    source = Column(String, nullable=False)  # "inventory", "orders"
+    model = Column(String, nullable=False)  # "ses", "seasonal_naive", "croston"
+    alpha = Column(Float)  # smoothing constant (ses / croston)
+    level = Column(Float)  # ses level, or croston demand size
+    interval = Column(Float)  # croston periods between demands
+    season = Column(JSON)  # last 7 days - the seasonal naive forecast
+    daily = Column(Float, nullable=False)  # mean units per day over the next week
+    rmse = Column(Float)  # one-step error over the holdout days
+    units = Column(Float, nullable=False, default=0)  # demand in the history window
+    demand_days = Column(Integer, nullable=False, default=0)  # days with any demand
+    history_end = Column(Date, nullable=False)  # last day fitted; forecasts start the day after
+    last_row_id = Column(BigInteger, nullable=False, default=0)  # newest source row seen
+    fitted_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+
+# End-of-day account balances (services/ledger.py). A balance as of any day is
+# the latest snapshot on or before it plus the lines dated after it. Postings
+# dated on or before a snapshot add to it, so snapshots never go stale.
+class AccountBalanceSnapshot(Base):
+    __tablename__ = "account_balance_snapshots"
+    as_of = Column(Date, primary_key=True)  # covers transactions dated up to and including this day
+    account_id = Column(Integer, ForeignKey("accounts.id"), primary_key=True)
+    balance = Column(Float, nullable=False, default=0)  # debits - credits, like accounts.balance
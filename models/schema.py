@@ -1,6 +1,14 @@
 from pydantic import BaseModel, EmailStr
-from datetime import datetime
-from typing import Optional, List
+from datetime import date, datetime
+from typing import Optional, List, Generic, TypeVar, Union
+
+T = TypeVar("T")
+
+# Paginated list envelope (see common/pagination.py)
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
+    total: Optional[int] = None  # only filled when include_total=true
 
 # Product schemas
 class ProductCreate(BaseModel):
@@ -23,6 +31,9 @@ class ProductRead(BaseModel):
     class Config:
         from_attributes = True
 
+class ProductSearchHit(ProductRead):
+    rank: float  # higher is a better match
+
 # Order schemas
 class OrderCreate(BaseModel):
     product_id: int
@@ -41,6 +52,13 @@ class OrderRead(BaseModel):
     class Config:
         from_attributes = True
 
+# One entry per item of POST /orders/batch, in request order
+class OrderBatchResult(BaseModel):
+    index: int
+    status: str  # "created" or "failed"
+    order: Optional[OrderRead] = None
+    error: Optional[str] = None
+
 # Customer schemas
 class CustomerCreate(BaseModel):
     name: str
@@ -63,7 +81,8 @@ class CustomerWithOrders(BaseModel):
     email: str
     created_at: datetime
     order_count: Optional[int] = 0
-    orders: List[OrderRead] = []
+    orders: List[OrderRead] = []  # newest first, one page
+    orders_next_cursor: Optional[str] = None  # pass back as ?orders_cursor=
     
     class Config:
         from_attributes = True
@@ -106,6 +125,10 @@ class UserCreate(BaseModel):
     last_name: Optional[str] = None
     title: str
 
+class UserLogin(BaseModel):
+    username: str
+    password: str
+
 class UserRead(BaseModel):
     id: int
     username: str
@@ -135,7 +158,8 @@ class UserWithRoles(BaseModel):
     created_at: datetime
     updated_at: datetime
     last_login: Optional[datetime] = None
-    roles: List[RoleRead] = []
+    roles: List[RoleRead] = []  # one page, by role id
+    roles_next_cursor: Optional[str] = None  # pass back as ?roles_cursor=
     
     class Config:
         from_attributes = True
@@ -145,7 +169,8 @@ class RoleWithUsers(BaseModel):
     id: int
     name: str
     permissions: Optional[dict] = None
-    users: List[UserRead] = []
+    users: List[UserRead] = []  # one page, by user id
+    users_next_cursor: Optional[str] = None  # pass back as ?users_cursor=
     
     class Config:
         from_attributes = True
@@ -169,6 +194,78 @@ class TransactionRead(BaseModel):
     class Config:
         from_attributes = True
 
+class TransactionTotalsBucket(BaseModel):
+    bucket: date  # first day of the day/week/month
+    created_by: Optional[int] = None  # by=user only
+    transaction_count: int
+    total_amount: float
+
+class TransactionTotals(BaseModel):
+    grain: str
+    by: str
+    start_date: date
+    end_date: date
+    created_by: Optional[int] = None
+    transaction_count: int
+    total_amount: float
+    cached_buckets: int  # closed buckets served without reading transactions
+    buckets: List[TransactionTotalsBucket]
+
+# Ledger schemas
+class JournalLine(BaseModel):
+    account_id: int
+    debit: float = 0  # exactly one of debit / credit per line
+    credit: float = 0
+
+class JournalEntryCreate(BaseModel):
+    transaction_number: str
+    date: date
+    description: Optional[str] = None
+    lines: List[JournalLine]  # debits must equal credits
+
+class TransactionLineRead(BaseModel):
+    id: int
+    account_id: int
+    debit_amount: float
+    credit_amount: float
+
+    class Config:
+        from_attributes = True
+
+class JournalEntryRead(BaseModel):
+    id: int
+    transaction_number: str
+    date: date
+    description: Optional[str] = None
+    total_amount: float
+    created_by: int
+    lines: List[TransactionLineRead]
+
+class AccountBalance(BaseModel):
+    account_id: int
+    as_of: Optional[date] = None  # None = everything posted so far
+    balance: float  # debits - credits
+    snapshot_as_of: Optional[date] = None  # snapshot the balance started from
+    lines_read: int  # lines dated after it
+
+class TrialBalanceRow(BaseModel):
+    account_id: int
+    account_number: Optional[str] = None
+    account_name: Optional[str] = None
+    account_type: Optional[str] = None
+    debit: float
+    credit: float
+    balance: float
+
+class TrialBalance(BaseModel):
+    as_of: Optional[date] = None
+    snapshot_as_of: Optional[date] = None
+    lines_read: int
+    accounts: List[TrialBalanceRow]
+    total_debit: float
+    total_credit: float
+    balanced: bool
+
 # Ticket schemas (for future use)
 class TicketCreate(BaseModel):
     ticket_number: str
@@ -193,3 +290,248 @@ class TicketRead(BaseModel):
     
     class Config:
         from_attributes = True
+
+class TicketSearchHit(TicketRead):
+    rank: float  # higher is a better match
+
+# Bulk import schemas
+class IngestionJobCreate(BaseModel):
+    kind: str  # "products" or "customers"
+    path: str  # relative to IMPORT_DIR
+    format: Optional[str] = None  # "csv" / "ndjson" - defaults to the file extension
+
+class IngestionJobRead(BaseModel):
+    id: int
+    kind: str
+    source: str
+    format: str
+    status: str
+    source_size: Optional[int] = None
+    checkpoint_offset: int
+    progress: Optional[float] = None  # 0..1, by bytes
+    rows_read: int
+    rows_inserted: int
+    rows_updated: int
+    rows_rejected: int
+    rows_per_sec: Optional[float] = None
+    sample_errors: Optional[List[dict]] = None
+    error: Optional[str] = None
+    owner: Optional[str] = None  # worker running it, host:pid:claim
+    heartbeat_at: Optional[datetime] = None  # its last checkpoint
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+# Sales reports (served from sales_rollups)
+class SalesBucket(BaseModel):
+    bucket: datetime
+    order_count: int
+    revenue: float
+    avg_price: Optional[float] = None
+
+class SalesSeries(BaseModel):
+    key: Optional[Union[int, str]] = None  # product / customer id or status, None for by=all
+    order_count: int
+    revenue: float
+    avg_price: Optional[float] = None
+    buckets: List[SalesBucket]
+
+class SalesReport(BaseModel):
+    grain: str
+    by: str
+    start: datetime
+    end: datetime
+    status: Optional[str] = None
+    series: List[SalesSeries]
+
+# Saved reports
+class ReportCreate(BaseModel):
+    name: str
+    description: Optional[str] = None
+    query: str  # one SELECT, :name placeholders for parameters
+    created_by: Optional[int] = None
+    is_public: bool = False
+    timeout_ms: Optional[int] = None  # REPORT_TIMEOUT_MS when empty
+
+class ReportRead(BaseModel):
+    id: int
+    name: Optional[str] = None
+    description: Optional[str] = None
+    query: Optional[str] = None
+    params: List[str] = []  # parameter names the run endpoint expects
+    created_by: Optional[int] = None
+    is_public: Optional[bool] = None
+    timeout_ms: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class ReportStats(BaseModel):
+    report_id: int
+    name: Optional[str] = None
+    runs: int  # live executions, refreshes included
+    cache_hits: int
+    stale_hits: int
+    refreshes: int
+    errors: int
+    timeouts: int
+    total_ms: int
+    avg_ms: Optional[float] = None
+    max_ms: int
+    last_ms: int
+    total_rows: int
+    avg_rows: Optional[float] = None
+    max_rows: int
+    last_rows: int
+    last_run_at: Optional[datetime] = None
+
+# Anomaly detection
+class AnomalyRow(BaseModel):
+    id: int  # order / inventory_history / transaction id
+    key: int  # product id, or account id for transactions
+    reason: Optional[str] = None  # inventory change_reason group
+    value: float
+    robust_z: float
+    ewma_z: float
+    score: float  # the larger |z|
+
+class AnomalyReport(BaseModel):
+    source: str
+    key_name: str
+    fitted_at: Optional[datetime] = None
+    rows_scored: int
+    last_id: int
+    fitting: bool = False  # a refit is running; this is the previous fit, caught up
+    flagged: int
+    anomalies: List[AnomalyRow]
+
+class AnomalyScore(BaseModel):
+    source: str
+    key: int
+    reason: Optional[str] = None
+    value: float
+    history: int  # values seen for this key
+    robust_z: float
+    ewma_z: float
+    anomaly: bool
+
+# Demand forecasts
+class ForecastRead(BaseModel):
+    product_id: int
+    source: str
+    model: str  # "ses", "seasonal_naive", "croston"
+    alpha: Optional[float] = None
+    level: Optional[float] = None
+    interval: Optional[float] = None  # croston: days between demands
+    season: List[float]  # last 7 days of history
+    daily: float  # mean units per day
+    rmse: Optional[float] = None
+    units: float  # demand in the history window
+    demand_days: int
+    history_end: date
+    last_row_id: int
+    fitted_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ForecastPoint(BaseModel):
+    date: date
+    units: float
+
+class ProductForecast(BaseModel):
+    forecast: ForecastRead
+    horizon: int
+    total: float
+    points: List[ForecastPoint]
+
+# Stock-out simulation
+class StockoutRisk(BaseModel):
+    product_id: int
+    on_hand: float
+    incoming: float  # open purchase order units due within the horizon
+    daily_demand: float  # mean of the resampled history
+    stockout_probability: float  # share of scenarios that ran out at least once
+    stockout_day_p50: Optional[int] = None  # median day of the first stock-out, None if under half run out
+    fill_rate: float  # share of demand served
+    expected_demand: float
+    expected_lost_units: float
+
+class StockoutSimulation(BaseModel):
+    seed: int  # pass back to reproduce the run
+    scenarios: int
+    horizon_days: int
+    start: date
+    history_start: Optional[date] = None
+    history_end: Optional[date] = None
+    products_simulated: int
+    matching: int  # products at or above min_probability
+    seconds: float
+    computed_at: Optional[datetime] = None  # catalog runs only
+    products: List[StockoutRisk]
+
+class ElasticityBand(BaseModel):
+    band: int  # list-price quantile, 0 = cheapest
+    price_low: float
+    price_high: float
+    products: int
+    products_pooled: int  # products whose relative price moved - the ones the regression learns from
+    orders: int
+    elasticity: Optional[float] = None  # pooled regression slope, within products
+    ci_low: Optional[float] = None
+    ci_high: Optional[float] = None
+    did_events: int
+    did_elasticity: Optional[float] = None
+    did_ci_low: Optional[float] = None
+    did_ci_high: Optional[float] = None
+
+class ProductElasticity(BaseModel):
+    product_id: int
+    band: int
+    list_price: float
+    orders: int
+    weeks: int  # weeks with orders
+    mean_discount: Optional[float] = None  # 1 - revenue / (orders x list price)
+    elasticity: Optional[float] = None  # % change in orders per % change in price, by regression
+    ci_low: Optional[float] = None
+    ci_high: Optional[float] = None
+    did_events: int
+    did_elasticity: Optional[float] = None  # the same, by diff-in-diff around price changes
+    did_ci_low: Optional[float] = None
+    did_ci_high: Optional[float] = None
+
+class PriceElasticity(BaseModel):
+    cache: str  # hit or stale (a refresh is running) - a cold cache is a 202 {"cache": "pending"}
+    computed_at: datetime
+    seconds: float
+    history_start: Optional[date] = None
+    history_end: Optional[date] = None
+    weeks: int
+    replicates: int
+    seed: int
+    confidence: float
+    products_analyzed: int
+    products_estimated: int
+    events: int  # price changes the diff-in-diff used
+    bands: List[ElasticityBand]
+    matching: int
+    products: List[ProductElasticity]
+
+# Typeahead schemas
+class TypeaheadMatch(BaseModel):
+    kind: str  # "customer", "user" or "product"
+    id: int
+    label: str  # customer name, username or product name
+    field: str  # what matched - customer_name, customer_email, username or sku
+    value: str  # that field's value
+    score: float  # 0.5-1 for a prefix match (share of the value typed), below 0.5 for a fuzzy one
+    match: str  # "prefix" or "fuzzy"
+
+class TypeaheadResults(BaseModel):
+    query: str
+    source: str  # "memory" (the in-process index) or "database" (while it's being built)
+    results: List[TypeaheadMatch]
@@ -0,0 +1,458 @@
+# services/anomaly.py
+import datetime
+import logging
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import case, func, select, tuple_
+from sqlalchemy.orm import Session
+
+from common.db import SessionLocal
+from models.db_models import InventoryHistory, Order, Transaction, TransactionLine
+
+# |robust z| above this is flagged - 3.5 is the usual cut-off for MAD scores
+ANOMALY_MAD_THRESHOLD = float(os.getenv("ANOMALY_MAD_THRESHOLD", "3.5"))
+ANOMALY_EWMA_THRESHOLD = float(os.getenv("ANOMALY_EWMA_THRESHOLD", "4"))
+ANOMALY_EWMA_ALPHA = float(os.getenv("ANOMALY_EWMA_ALPHA", "0.05"))
+# A group isn't scored until it has this much history
+ANOMALY_MIN_HISTORY = int(os.getenv("ANOMALY_MIN_HISTORY", "10"))
+# Spread floor as a fraction of the level - a fixed price has a MAD of 0
+ANOMALY_MIN_SPREAD = float(os.getenv("ANOMALY_MIN_SPREAD", "0.01"))
+# Rows per round trip when pulling history
+ANOMALY_PULL_ROWS = int(os.getenv("ANOMALY_PULL_ROWS", "100000"))
+MAX_FLAGGED = 10000  # kept per source, worst first
+
+logger = logging.getLogger(__name__)
+
+_MAD_TO_SIGMA = 0.6745
+# Step of the streaming median / MAD trackers, as a fraction of the current spread
+_TRACKING_RATE = 0.02
+# Weight below which earlier rows no longer change an EWMA in double precision
+_NEGLIGIBLE = 1e-18
+
+
+class Detector:
+    """
+    Robust z-score (median / MAD) and EWMA z-score per group. State lives in
+    flat arrays indexed by the group key (product or account id), so fit()
+    can score a whole history with array operations and update() folds in
+    one new value in O(1).
+    """
+
+    FIELDS = ("count", "median", "mad", "mean", "var")
+
+    def __init__(self, alpha: float = ANOMALY_EWMA_ALPHA):
+        self.alpha = alpha
+        self.count = np.zeros(0, dtype=np.int64)
+        self.median = np.zeros(0)
+        self.mad = np.zeros(0)
+        self.mean = np.zeros(0)
+        self.var = np.zeros(0)
+
+    def _grow(self, size: int):
+        if size <= len(self.count):
+            return
+        size = max(size, 2 * len(self.count), 1024)
+        for field in self.FIELDS:
+            old = getattr(self, field)
+            new = np.zeros(size, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, field, new)
+
+    def fit(self, keys: np.ndarray, values: np.ndarray):
+        """
+        Rebuild the state from a full history and score every row. Rows must
+        be in time order within each key. Returns (robust_z, ewma_z) arrays.
+        """
+        n = len(values)
+        self.count = np.zeros(0, dtype=np.int64)
+        self._grow(int(keys.max()) + 1 if n else 0)
+        if not n:
+            return np.zeros(0), np.zeros(0)
+
+        # Stable sort by key keeps each group's rows in time order
+        order = np.argsort(keys, kind="stable")
+        k, v = keys[order], values[order]
+        starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+        sizes = np.diff(np.r_[starts, n])
+        groups = k[starts]
+        self.count[groups] = sizes
+
+        # Median and MAD per group: sort values within each group, take the middle
+        self.median[groups] = _group_medians(k, v, starts, sizes)
+        self.mad[groups] = _group_medians(k, np.abs(v - self.median[k]), starts, sizes)
+        spread = _floor(self.mad[k], self.median[k])
+        robust = _MAD_TO_SIGMA * (v - self.median[k]) / spread
+        robust[self.count[k] < ANOMALY_MIN_HISTORY] = 0.0
+
+        # EWMA mean and variance are linear recurrences that restart at each
+        # group: mean[i] = (1 - alpha) * mean[i-1] + alpha * v[i], seeded with the
+        # first value; var likewise with (1 - alpha) * alpha * diff**2.
+        # Scores use the state before the row (the previous row's).
+        alpha = self.alpha
+        first = np.zeros(n, dtype=bool)
+        first[starts] = True
+        decay = np.where(first, 0.0, 1 - alpha)
+        mean = _recurrence(decay, np.where(first, v, alpha * v), int(sizes.max()))
+        before = np.r_[0, mean[:-1]]
+        diff = np.where(first, 0.0, v - before)
+        var = _recurrence(decay, (1 - alpha) * alpha * diff * diff, int(sizes.max()))
+        var_before = np.r_[0, var[:-1]]
+        rank = np.arange(n) - np.repeat(starts, sizes)
+        ewma = np.where(rank >= ANOMALY_MIN_HISTORY, diff / _floor(np.sqrt(var_before), before), 0.0)
+        last = starts + sizes - 1
+        self.mean[groups] = mean[last]
+        self.var[groups] = var[last]
+
+        robust_z = np.empty(n)
+        ewma_z = np.empty(n)
+        robust_z[order] = robust
+        ewma_z[order] = ewma
+        return robust_z, ewma_z
+
+    def score(self, key: int, value: float):
+        """(robust_z, ewma_z) of a value against the group's current state, 0 without enough history"""
+        if key >= len(self.count) or self.count[key] < ANOMALY_MIN_HISTORY:
+            return 0.0, 0.0
+        median, mad = float(self.median[key]), float(self.mad[key])
+        mean, var = float(self.mean[key]), float(self.var[key])
+        robust = _MAD_TO_SIGMA * (value - median) / _floor_scalar(mad, median)
+        ewma = (value - mean) / _floor_scalar(math.sqrt(var), mean)
+        return robust, ewma
+
+    def update(self, key: int, value: float):
+        """Score one new value, then fold it into the group's state - O(1)"""
+        self._grow(key + 1)
+        scores = self.score(key, value)
+        count = int(self.count[key])
+        self.count[key] = count + 1
+        if count == 0:
+            self.median[key] = self.mean[key] = value
+            return scores
+
+        median, mad = float(self.median[key]), float(self.mad[key])
+        deviation = abs(value - median)
+        if count < ANOMALY_MIN_HISTORY:
+            # Warm-up (not scored yet): running mean and mean deviation as a starting point
+            self.median[key] = median + (value - median) / (count + 1)
+            self.mad[key] = mad + (deviation - mad) / (count + 1)
+        else:
+            # Median / MAD can't be updated exactly in O(1): nudge them towards the
+            # value by a step proportional to the spread (stochastic quantile tracking)
+            step = _TRACKING_RATE * _floor_scalar(mad, median)
+            self.median[key] = median + math.copysign(step, value - median) if value != median else median
+            self.mad[key] = mad + math.copysign(step, deviation - mad) if deviation != mad else mad
+
+        mean, var = float(self.mean[key]), float(self.var[key])
+        diff = value - mean
+        self.mean[key] = mean + self.alpha * diff
+        self.var[key] = (1 - self.alpha) * (var + diff * self.alpha * diff)
+        return scores
+
+
+def _group_medians(keys, values, starts, sizes):
+    """Median of each run of equal keys (keys sorted, runs given by starts/sizes)"""
+    ordered = values[np.lexsort((values, keys))]
+    return (ordered[starts + (sizes - 1) // 2] + ordered[starts + sizes // 2]) / 2
+
+
+def _recurrence(decay, step, longest: int):
+    """
+    x[i] = decay[i] * x[i-1] + step[i] for a whole array, decay 0 where a group
+    starts. Recursive doubling: pass p folds in the 2**p rows before each row,
+    so it takes log2(longest group) array passes - or fewer, once the carried
+    decay is too small to matter - rather than one Python step per row.
+    """
+    decay, x = decay.copy(), step.copy()
+    shift = 1
+    while shift < longest and decay.max() > _NEGLIGIBLE:
+        x[shift:] += decay[shift:] * x[:-shift]
+        decay[shift:] = decay[shift:] * decay[:-shift]
+        shift *= 2
+    return x
+
+
+def _floor(spread, level):
+    return np.maximum(spread, ANOMALY_MIN_SPREAD * np.abs(level) + 1e-9)
+
+
+def _floor_scalar(spread, level):
+    return max(spread, ANOMALY_MIN_SPREAD * abs(level) + 1e-9)
+
+
+def is_anomaly(robust_z, ewma_z):
+    return (np.abs(robust_z) > ANOMALY_MAD_THRESHOLD) | (np.abs(ewma_z) > ANOMALY_EWMA_THRESHOLD)
+
+
+# Sources - what is scored, grouped by what. Each pulls columns in keyset
+# order (history: time order per group; new rows: id order).
+
+# inventory_history is grouped per product *and* reason - a restock of 300 is
+# normal, a "sale" of -300 isn't
+REASONS = ("sale", "restock", "adjustment", "damage", "initial_stock", "return")
+_REASON_SLOTS = len(REASONS) + 1  # + "other"
+
+
+def _columns(rows, count):
+    """Row tuples -> one array per column"""
+    return [np.fromiter((row[i] for row in rows), dtype=float, count=len(rows)) for i in range(count)]
+
+
+def _pull(db: Session, columns, order, where, after):
+    """One page of rows: order columns first, then the selected columns"""
+    query = select(*order, *columns).where(*where).order_by(*order).limit(ANOMALY_PULL_ROWS)
+    if after is not None:
+        query = query.where(tuple_(*order) > tuple_(*after))
+    return db.execute(query).all()
+
+
+class Source:
+    def __init__(self, name, model, value, key_name, history_order):
+        self.name = name
+        self.model = model
+        self.value = value
+        self.key_name = key_name
+        self.history_order = history_order
+
+    def key_columns(self):
+        return [self.model.__table__.c[self.key_name]]
+
+    def keys(self, db: Session, ids, key_values):
+        return key_values[0].astype(np.int64)
+
+    def decode(self, key: int) -> dict:
+        return {"key": key}
+
+    def encode(self, key: int, reason: str = None) -> int:
+        return key
+
+    def rows(self, db: Session, after_id: int = None):
+        """(ids, keys, values) per page - full history in time order, or rows after an id"""
+        order = self.history_order if after_id is None else [self.model.id]
+        after = None if after_id is None else (after_id,)
+        key_columns = self.key_columns()
+        columns = [self.model.id, self.value, *key_columns]
+        where = [self.value.isnot(None), key_columns[0].isnot(None)]
+        while True:
+            page = _pull(db, columns, order, where, after)
+            if not page:
+                return
+            width = len(order)
+            ids, values, *key_values = _columns([row[width:] for row in page], len(columns))
+            ids = ids.astype(np.int64)
+            yield ids, self.keys(db, ids, key_values), values
+            after = tuple(page[-1][:width])
+            if len(page) < ANOMALY_PULL_ROWS:
+                return
+
+
+class InventorySource(Source):
+    def key_columns(self):
+        reason = case({reason: i for i, reason in enumerate(REASONS)}, value=InventoryHistory.change_reason,
+                      else_=len(REASONS))
+        return [InventoryHistory.product_id, reason]
+
+    def keys(self, db, ids, key_values):
+        product, reason = key_values
+        return product.astype(np.int64) * _REASON_SLOTS + reason.astype(np.int64)
+
+    def decode(self, key):
+        product, slot = divmod(key, _REASON_SLOTS)
+        return {"key": product, "reason": REASONS[slot] if slot < len(REASONS) else "other"}
+
+    def encode(self, key, reason=None):
+        slot = REASONS.index(reason) if reason in REASONS else len(REASONS)
+        return key * _REASON_SLOTS + slot
+
+
+class TransactionSource(Source):
+    """Grouped by the debit account (0 for entries without lines)"""
+
+    def key_columns(self):
+        account = (
+            select(func.min(TransactionLine.account_id))
+            .where(TransactionLine.transaction_id == Transaction.id, TransactionLine.debit_amount > 0)
+            .scalar_subquery()
+        )
+        return [func.coalesce(account, 0)]
+
+
+SOURCES = {
+    source.name: source for source in (
+        Source("orders", Order, Order.sale_price, "product_id", [Order.product_id, Order.sold_at, Order.id]),
+        InventorySource("inventory", InventoryHistory, InventoryHistory.quantity_change, "product_id",
+                        [InventoryHistory.product_id, InventoryHistory.changed_at, InventoryHistory.id]),
+        TransactionSource("transactions", Transaction, Transaction.total_amount, "account_id",
+                          [Transaction.date, Transaction.id]),
+    )
+}
+
+
+# Monitors - one per source per process: a batch fit on first use, then
+# each read catches up on rows added since, one O(1) update per row
+
+# Fits run here, one at a time, never in the request - a source answers
+# "warming up" until its first fit is done
+_fitter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="anomaly-fit")
+
+
+class Monitor:
+    def __init__(self, source: Source):
+        self.source = source
+        self.detector = Detector()
+        self.lock = threading.Lock()
+        self.fitting = False
+        self.fitted_at = None
+        self.last_id = 0
+        self.rows_scored = 0
+        self.flagged = []
+
+    def fit(self, db: Session):
+        """Score the full history into a new detector, then swap it in - readers keep the old state meanwhile"""
+        pages = list(self.source.rows(db))
+        ids = np.concatenate([page[0] for page in pages]) if pages else np.zeros(0, dtype=np.int64)
+        keys = np.concatenate([page[1] for page in pages]) if pages else np.zeros(0, dtype=np.int64)
+        values = np.concatenate([page[2] for page in pages]) if pages else np.zeros(0)
+        detector = Detector()
+        robust_z, ewma_z = detector.fit(keys, values)
+        hits = np.flatnonzero(is_anomaly(robust_z, ewma_z))
+        severity = np.maximum(np.abs(robust_z[hits]), np.abs(ewma_z[hits]))
+        worst = hits[np.argsort(-severity, kind="stable")[:MAX_FLAGGED]]
+        flagged = [
+            self._row(int(ids[i]), int(keys[i]), float(values[i]), float(robust_z[i]), float(ewma_z[i]))
+            for i in worst
+        ]
+        with self.lock:
+            # Rows caught up on meanwhile are past last_id and get re-scored on the new state
+            self.detector = detector
+            self.flagged = flagged
+            self.last_id = int(ids.max()) if len(ids) else 0
+            self.rows_scored = len(ids)
+            self.fitted_at = datetime.datetime.utcnow()
+
+    def schedule_fit(self):
+        """At most one fit per source in flight"""
+        with self.lock:
+            if self.fitting:
+                return
+            self.fitting = True
+        _fitter.submit(self._fit_in_background)
+
+    def _fit_in_background(self):
+        db = SessionLocal()
+        try:
+            self.fit(db)
+        except Exception:
+            logger.exception("anomaly fit of %s failed", self.source.name)
+        finally:
+            db.close()
+            with self.lock:
+                self.fitting = False
+
+    def catch_up(self, db: Session) -> int:
+        added = 0
+        for ids, keys, values in self.source.rows(db, after_id=self.last_id):
+            for row_id, key, value in zip(ids.tolist(), keys.tolist(), values.tolist()):
+                robust, ewma = self.detector.update(key, value)
+                if abs(robust) > ANOMALY_MAD_THRESHOLD or abs(ewma) > ANOMALY_EWMA_THRESHOLD:
+                    self.flagged.append(self._row(row_id, key, value, robust, ewma))
+            self.last_id = int(ids[-1])
+            added += len(ids)
+        self.rows_scored += added
+        if len(self.flagged) > MAX_FLAGGED:
+            self.flagged.sort(key=lambda row: -row["score"])
+            del self.flagged[MAX_FLAGGED:]
+        return added
+
+    def _row(self, row_id, key, value, robust, ewma):
+        return {
+            "id": row_id,
+            **self.source.decode(key),
+            "value": value,
+            "robust_z": round(robust, 3),
+            "ewma_z": round(ewma, 3),
+            "score": round(max(abs(robust), abs(ewma)), 3),
+        }
+
+
+_monitors = {}
+_monitors_lock = threading.Lock()
+
+
+def _monitor(source: str) -> Monitor:
+    if source not in SOURCES:
+        raise HTTPException(400, f"Source must be one of: {list(SOURCES)}")
+    with _monitors_lock:
+        if source not in _monitors:
+            _monitors[source] = Monitor(SOURCES[source])
+        return _monitors[source]
+
+
+def _synced(source: str, refit: bool = False):
+    """
+    The source's monitor, caught up on rows added since. None until its first
+    fit (scheduled here) is done; refit=True schedules a new one and serves
+    the current state meanwhile.
+    """
+    monitor = _monitor(source)
+    if refit or monitor.fitted_at is None:
+        monitor.schedule_fit()
+    if monitor.fitted_at is None:
+        return None
+    db = SessionLocal()
+    try:
+        with monitor.lock:
+            monitor.catch_up(db)
+    finally:
+        db.close()
+    return monitor
+
+
+def report(source: str, key: int = None, reason: str = None, limit: int = 50,
+           order_by: str = "score", refit: bool = False):
+    """Flagged rows of a source, worst (or newest) first - None while the first fit runs"""
+    if order_by not in ("score", "id"):
+        raise HTTPException(400, "order_by must be score or id")
+    monitor = _synced(source, refit)
+    if monitor is None:
+        return None
+    with monitor.lock:
+        rows = [
+            row for row in monitor.flagged
+            if (key is None or row["key"] == key) and (reason is None or row.get("reason") == reason)
+        ]
+        rows.sort(key=lambda row: -row[order_by])
+        return {
+            "source": source,
+            "key_name": monitor.source.key_name,
+            "fitted_at": monitor.fitted_at,
+            "rows_scored": monitor.rows_scored,
+            "last_id": monitor.last_id,
+            "fitting": monitor.fitting,
+            "flagged": len(rows),
+            "anomalies": rows[:limit],
+        }
+
+
+def score(source: str, key: int, value: float, reason: str = None):
+    """Score a value against a group's current state without recording it - None while the first fit runs"""
+    monitor = _synced(source)
+    if monitor is None:
+        return None
+    with monitor.lock:
+        internal = monitor.source.encode(key, reason)
+        robust, ewma = monitor.detector.score(internal, value)
+        history = int(monitor.detector.count[internal]) if internal < len(monitor.detector.count) else 0
+    return {
+        "source": source,
+        **monitor.source.decode(internal),
+        "value": value,
+        "history": history,
+        "robust_z": round(robust, 3),
+        "ewma_z": round(ewma, 3),
+        "anomaly": abs(robust) > ANOMALY_MAD_THRESHOLD or abs(ewma) > ANOMALY_EWMA_THRESHOLD,
+    }
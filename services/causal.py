@@ -0,0 +1,494 @@
+# services/causal.py
+import datetime
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import redis
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from common.cache import REDIS_URL, InMemoryRedis, data_version, make_redis_client
+from common.db import SessionLocal
+from common.processes import map_chunks
+from models.db_models import Order, Product
+from services import modeling
+
+logger = logging.getLogger(__name__)
+
+# Weekly order volume over this many days up to the last day with sales
+CAUSAL_HISTORY_DAYS = int(os.getenv("CAUSAL_HISTORY_DAYS", "364"))
+# The diff-in-diff compares this many weeks before and after a price change
+CAUSAL_WINDOW_WEEKS = int(os.getenv("CAUSAL_WINDOW_WEEKS", "4"))
+# Week-to-week move in log(sale price / list price) that counts as a price change (~5%)
+CAUSAL_MIN_CHANGE = float(os.getenv("CAUSAL_MIN_CHANGE", "0.05"))
+# Weeks with orders a product needs for its own regression
+CAUSAL_MIN_WEEKS = int(os.getenv("CAUSAL_MIN_WEEKS", "8"))
+# Products have no category - pooled estimates are per list-price band (equal-count quantiles)
+CAUSAL_PRICE_BANDS = int(os.getenv("CAUSAL_PRICE_BANDS", "10"))
+CAUSAL_BOOTSTRAP = int(os.getenv("CAUSAL_BOOTSTRAP", "1000"))
+CAUSAL_SEED = int(os.getenv("CAUSAL_SEED", "0"))
+CAUSAL_CHUNK = int(os.getenv("CAUSAL_CHUNK", "5000"))
+# replicates x observations per bootstrap block - bounds memory (a few float arrays of this size)
+CAUSAL_BOOTSTRAP_CELLS = int(os.getenv("CAUSAL_BOOTSTRAP_CELLS", "5000000"))
+CAUSAL_WORKERS = int(os.getenv("CAUSAL_WORKERS", str(os.cpu_count() or 1)))
+# How long a result is kept - it is served (stale) while a refresh runs until then
+CAUSAL_CACHE_TTL = int(os.getenv("CAUSAL_CACHE_TTL", str(7 * 86400)))
+# A scheduled refresh that hasn't finished by then (lost task, dead worker) can be scheduled again
+CAUSAL_REFRESH_TIMEOUT = int(os.getenv("CAUSAL_REFRESH_TIMEOUT", "3600"))
+
+CONFIDENCE = 0.95
+TABLES = ["orders", "products"]
+
+_client = make_redis_client(REDIS_URL) or InMemoryRedis()
+# Background refreshes when Celery runs eagerly (no worker to hand them to)
+_refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="elasticity-refresh")
+# Parsed copy of the last entry read, by cache key - entries can be megabytes of JSON
+_parsed = {}
+
+
+# Bootstrap - Poisson(1) weights per row stand in for resampling with replacement
+
+# Inverse CDF of Poisson(1) over 16 random bits - several times cheaper than rng.poisson
+_POISSON = np.searchsorted(
+    np.cumsum([math.exp(-1) / math.factorial(k) for k in range(16)]) * 65536, np.arange(65536), side="right"
+).astype(np.float32)
+
+
+def poisson_weights(rng, shape) -> np.ndarray:
+    return _POISSON[rng.integers(0, 65536, shape, dtype=np.uint16)]  # float32 - halves the matmul
+
+
+def _interval(samples, axis: int) -> tuple:
+    samples[~np.isfinite(samples)] = np.nan
+    tail = (1 - CONFIDENCE) / 2 * 100
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # groups no replicate could estimate
+        low, high = np.nanpercentile(samples, [tail, 100 - tail], axis=axis)
+    return low, high
+
+
+def bootstrap(groups, columns, statistic, replicates: int, seed) -> tuple:
+    """
+    statistic(*sums of each column) per group, with a percentile interval:
+    each block of replicates is one (replicates x rows) weight matrix, summed
+    per group with reduceat - no Python loop over groups or replicates.
+    Returns (groups, estimate, low, high).
+    """
+    order = np.argsort(groups, kind="stable")
+    ids, starts = np.unique(groups[order], return_index=True)
+    if not len(ids):
+        return ids, *(np.zeros(0) for _ in range(3))
+    columns = [np.asarray(column, dtype=float)[order] for column in columns]
+    rng = np.random.default_rng(seed)
+    samples = np.empty((replicates, len(ids)))
+    block = max(1, CAUSAL_BOOTSTRAP_CELLS // len(order))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        estimate = statistic(*(np.add.reduceat(column, starts) for column in columns))
+        for first in range(0, replicates, block):
+            weights = poisson_weights(rng, (min(block, replicates - first), len(order)))
+            samples[first:first + len(weights)] = statistic(
+                *(np.add.reduceat(weights * column, starts, axis=1) for column in columns))
+    estimate[~np.isfinite(estimate)] = np.nan
+    return ids, estimate, *_interval(samples, 0)
+
+
+def panel_bootstrap(panel, statistic, replicates: int, seed) -> tuple:
+    """
+    The same for groups of at most a few dozen rows - a product's weeks - laid
+    out as a dense (groups x rows x columns) panel, zero-padded. The weighted
+    sums of a block of groups are one batched matmul of its (groups x
+    replicates x rows) weights with the panel. Returns (estimate, low, high).
+    """
+    groups, rows, _ = panel.shape
+    if not groups:
+        return tuple(np.zeros(0) for _ in range(3))
+    rng = np.random.default_rng(seed)
+    samples = np.empty((groups, replicates))
+    block = max(1, CAUSAL_BOOTSTRAP_CELLS // max(replicates * rows, 1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        estimate = statistic(*panel.sum(1, dtype=float).T)
+        for first in range(0, groups, block):
+            part = panel[first:first + block]
+            sums = np.matmul(poisson_weights(rng, (len(part), replicates, rows)), part)
+            samples[first:first + len(part)] = statistic(*np.moveaxis(sums, 2, 0))
+    estimate[~np.isfinite(estimate)] = np.nan
+    return estimate, *_interval(samples, 1)
+
+
+def _slope(n, x, y, xy, xx):
+    """OLS slope of y on x from (weighted) sums"""
+    spread = xx - x * x / n
+    # Relative, so float32 rounding of a sample with no price variation doesn't pass for some
+    return np.where(spread > 1e-5 * xx, (xy - x * y / n) / spread, np.nan)
+
+
+def _ratio(numerator, denominator):
+    return np.where(denominator > 1e-9, numerator / denominator, np.nan)
+
+
+# Estimation - pure NumPy per chunk of products, so chunks can run in other processes
+
+def analyze(row, week, volume, revenue, list_price, band, weeks: int, replicates: int, seed) -> dict:
+    """
+    One chunk of products from its weekly (row, week, orders, revenue) extract.
+
+    Regression: log(orders) on log(mean sale price / list price) over the
+    product's weeks with orders, bootstrapped per product.
+    Diff-in-diff: every week the relative price moves by CAUSAL_MIN_CHANGE
+    after CAUSAL_WINDOW_WEEKS quiet weeks (and stays put as long after) is an
+    event; its change in mean log(1 + orders), before vs after, is returned
+    with the same change summed per band and week over products whose price
+    didn't move - the controls, combined across chunks by the caller.
+    """
+    products = len(list_price)
+    valid = (revenue > 0) & (list_price[row] > 0)
+    row, week, volume, revenue = row[valid], week[valid], volume[valid], revenue[valid]
+    x = np.log(revenue / volume / list_price[row])
+    y = np.log(volume)
+
+    count = np.bincount(row, minlength=products)
+    sold = np.bincount(row, weights=volume, minlength=products)
+    paid = np.bincount(row, weights=revenue, minlength=products)
+    sums = [np.bincount(row, weights=values, minlength=products) for values in (x, y, x * y, x * x)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        discount = np.where(sold > 0, 1 - paid / (sold * list_price), np.nan)
+        # Within-product sums - the price band's fixed-effects slope adds them up
+        sxy = np.nan_to_num(sums[2] - sums[0] * sums[1] / count)
+        sxx = np.nan_to_num(sums[3] - sums[0] ** 2 / count)
+    low, high = np.full(products, np.inf), np.full(products, -np.inf)
+    np.minimum.at(low, row, x)
+    np.maximum.at(high, row, x)
+    eligible = (count >= CAUSAL_MIN_WEEKS) & (high - low >= CAUSAL_MIN_CHANGE)
+    regression = np.full((3, products), np.nan)
+    # Centered on the product's means - the slope doesn't change and the sums lose less precision
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cx, cy = x - (sums[0] / count)[row], y - (sums[1] / count)[row]
+    slot = np.cumsum(eligible) - 1
+    keep = eligible[row]
+    panel = np.zeros((eligible.sum(), weeks, 5), dtype=np.float32)
+    panel[slot[row[keep]], week[keep]] = np.column_stack(
+        [np.ones(keep.sum()), cx[keep], cy[keep], (cx * cy)[keep], (cx * cx)[keep]])
+    regression[:, eligible] = panel_bootstrap(panel, _slope, replicates, seed)
+
+    # Weekly panel: log(1 + orders), and the relative price carried over weeks without orders
+    outcome = np.zeros((products, weeks))
+    outcome[row, week] = np.log1p(volume)
+    observed = np.zeros((products, weeks), dtype=bool)
+    observed[row, week] = True
+    price = np.zeros((products, weeks))
+    price[row, week] = x
+    last = np.maximum.accumulate(np.where(observed, np.arange(weeks), -1), axis=1)
+    last = np.where(last < 0, observed.argmax(1)[:, None], last)  # before the first sale: its price
+    price = price[np.arange(products)[:, None], last]
+    jump = np.zeros((products, weeks), dtype=bool)
+    jump[:, 1:] = np.abs(np.diff(price, axis=1)) >= CAUSAL_MIN_CHANGE
+
+    def cumulative(matrix):
+        return np.concatenate([np.zeros((products, 1)), np.cumsum(matrix, axis=1)], axis=1)
+
+    window = CAUSAL_WINDOW_WEEKS
+    at = np.arange(window, weeks - window + 1)  # first week after a (possible) change
+    total, level, changes = cumulative(outcome), cumulative(price), cumulative(jump)
+    d_outcome = (total[:, at + window] - 2 * total[:, at] + total[:, at - window]) / window
+    d_price = (level[:, at + window] - 2 * level[:, at] + level[:, at - window]) / window
+    quiet = ((changes[:, at] - changes[:, at - window + 1] == 0)
+             & (changes[:, at + window] - changes[:, at + 1] == 0)
+             & (total[:, at + window] - total[:, at - window] > 0))
+    moved = jump[:, at]
+    control = quiet & ~moved
+    cell = band[:, None] * len(at) + np.arange(len(at))
+    cells = CAUSAL_PRICE_BANDS * len(at)
+    event_row, event_at = np.nonzero(quiet & moved)
+    return {
+        "orders": sold,
+        "weeks": count,
+        "discount": discount,
+        "elasticity": regression[0],
+        "ci_low": regression[1],
+        "ci_high": regression[2],
+        "sxy": sxy,
+        "sxx": sxx,
+        "event_row": event_row,
+        "event_at": event_at,
+        "event_outcome": d_outcome[event_row, event_at],
+        "event_price": d_price[event_row, event_at],
+        "control_sum": np.bincount(cell[control], weights=d_outcome[control], minlength=cells),
+        "control_count": np.bincount(cell[control], minlength=cells),
+    }
+
+
+# Loading
+
+def extract(db: Session, ids: np.ndarray, start: datetime.datetime, weeks: int) -> tuple:
+    """(row, week, orders, revenue) per product and week with orders, one GROUP BY for the chunk. ids sorted."""
+    weekly = (
+        select(Order.product_id.label("product_id"),
+               (modeling.day_index(db, Order.sold_at, start) // 7).label("week"),
+               Order.sale_price.label("sale_price"))
+        .where(Order.product_id.in_(ids.tolist()), Order.status != "cancelled",
+               Order.sold_at >= start, Order.sold_at < start + datetime.timedelta(weeks=weeks))
+        .subquery()
+    )
+    rows = db.execute(
+        select(weekly.c.product_id, weekly.c.week, func.count(), func.sum(weekly.c.sale_price))
+        .group_by(weekly.c.product_id, weekly.c.week)
+    ).all()
+    product_ids, week, volume, revenue = np.asarray(rows, dtype=float).reshape(-1, 4).T
+    inside = (week >= 0) & (week < weeks)
+    return (np.searchsorted(ids, product_ids[inside]), week[inside].astype(np.int64),
+            volume[inside], revenue[inside])
+
+
+def price_bands(prices: np.ndarray) -> tuple:
+    """(band per product, band edges) - equal-count list-price quantiles"""
+    if not len(prices):
+        return np.zeros(0, dtype=np.int64), np.zeros(CAUSAL_PRICE_BANDS + 1)
+    edges = np.quantile(prices, np.linspace(0, 1, CAUSAL_PRICE_BANDS + 1))
+    return np.clip(np.searchsorted(edges, prices, side="right") - 1, 0, CAUSAL_PRICE_BANDS - 1), edges
+
+
+def estimate(replicates: int = CAUSAL_BOOTSTRAP, seed: int = CAUSAL_SEED, workers: int = CAUSAL_WORKERS) -> dict:
+    """
+    Price elasticity of order volume for every product and list-price band,
+    by regression and diff-in-diff, with bootstrap intervals. Chunks of
+    CAUSAL_CHUNK products are extracted here and estimated in a process pool,
+    then the diff-in-diff controls and band estimates are combined - the band
+    and per-product diff-in-diff bootstraps run in the pool as well.
+    """
+    started = time.perf_counter()
+    weeks = CAUSAL_HISTORY_DAYS // 7
+    db = SessionLocal()
+    try:
+        catalog = db.execute(select(Product.id, Product.price).order_by(Product.id)).all()
+        ids = np.asarray([product_id for product_id, _ in catalog], dtype=np.int64)
+        prices = np.asarray([price for _, price in catalog], dtype=float)
+        band, edges = price_bands(prices)
+        end = modeling.history_end(db, "orders")
+        start = None if end is None else (
+            datetime.datetime.combine(end, datetime.time()) + datetime.timedelta(days=1, weeks=-weeks))
+        chunks = [slice(i, i + CAUSAL_CHUNK) for i in range(0, len(ids), CAUSAL_CHUNK)] if end else []
+        # Chunk i always draws from seed (seed, 0, i), whatever the worker count
+        jobs = (
+            (*extract(db, ids[chunk], start, weeks), prices[chunk], band[chunk], weeks, replicates, (seed, 0, index))
+            for index, chunk in enumerate(chunks)
+        )
+        parts = list(map_chunks(analyze, jobs, workers if len(chunks) > 1 else 1))
+    finally:
+        db.close()
+
+    products = {
+        name: np.concatenate([part[name] for part in parts]) if parts else np.zeros(0)
+        for name in ("orders", "weeks", "discount", "elasticity", "ci_low", "ci_high", "sxy", "sxx")
+    }
+    events = {
+        name: np.concatenate([part[name] for part in parts]) if parts else np.zeros(0)
+        for name in ("event_at", "event_outcome", "event_price")
+    }
+    events["product"] = (np.concatenate([part["event_row"] + chunk.start for part, chunk in zip(parts, chunks)])
+                         if parts else np.zeros(0, dtype=np.int64))
+    events["band"] = band[events["product"]]
+    at = max(weeks - 2 * CAUSAL_WINDOW_WEEKS + 1, 0)
+    control_sum = sum(part["control_sum"] for part in parts).reshape(CAUSAL_PRICE_BANDS, at) if parts else None
+    control_count = sum(part["control_count"] for part in parts).reshape(CAUSAL_PRICE_BANDS, at) if parts else None
+
+    # Diff-in-diff: each event's change less the mean change of same-band controls that week
+    did = np.zeros(0)
+    if len(events["product"]):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            baseline = (control_sum / control_count)[events["band"], events["event_at"].astype(np.int64)]
+        did = events["event_outcome"] - baseline
+        usable = np.isfinite(did)
+        events = {name: values[usable] for name, values in events.items()}
+        did = did[usable]
+    slope = [did * events["event_price"], events["event_price"] ** 2]
+    pooled = np.flatnonzero(products["sxx"] > 1e-9)
+    bounds = np.searchsorted(events["product"], [chunk.start for chunk in chunks[1:]])
+    jobs = [
+        (band[pooled], [products["sxy"][pooled], products["sxx"][pooled]], _ratio, replicates, (seed, 1, 0)),
+        (events["band"], slope, _ratio, replicates, (seed, 1, 1)),
+        *((group, [column[part] for column in slope], _ratio, replicates, (seed, 1, 2 + index))
+          for index, (group, part) in enumerate(
+              (events["product"][part], part) for part in np.split(np.arange(len(did)), bounds))),
+    ]
+    band_regression, band_did, *product_did = map_chunks(bootstrap, jobs, workers if len(chunks) > 1 else 1)
+
+    did_estimates = np.full((3, len(ids)), np.nan)
+    for group, *values in product_did:
+        did_estimates[:, group] = values
+    did_events = np.bincount(events["product"], minlength=len(ids))
+    estimated = np.flatnonzero(np.isfinite(products["elasticity"]) | np.isfinite(did_estimates[0]))
+    return {
+        "computed_at": datetime.datetime.utcnow().isoformat(),
+        "seconds": round(time.perf_counter() - started, 3),
+        "history_start": start.date().isoformat() if start else None,
+        "history_end": end.isoformat() if end else None,
+        "weeks": weeks,
+        "replicates": replicates,
+        "seed": seed,
+        "confidence": CONFIDENCE,
+        "products_analyzed": len(ids),
+        "products_estimated": len(estimated),
+        "events": len(did),
+        "bands": _bands(band, prices, products, pooled, band_regression, band_did, events["band"]),
+        # Columns, not rows - a full catalog is far smaller (and quicker to parse) this way
+        "products": {
+            "product_id": ids[estimated].tolist(),
+            "band": band[estimated].tolist(),
+            "list_price": prices[estimated].tolist(),
+            "orders": products["orders"][estimated].tolist(),
+            "weeks": products["weeks"][estimated].tolist(),
+            "mean_discount": _column(products["discount"][estimated]),
+            "elasticity": _column(products["elasticity"][estimated]),
+            "ci_low": _column(products["ci_low"][estimated]),
+            "ci_high": _column(products["ci_high"][estimated]),
+            "did_elasticity": _column(did_estimates[0][estimated]),
+            "did_ci_low": _column(did_estimates[1][estimated]),
+            "did_ci_high": _column(did_estimates[2][estimated]),
+            "did_events": did_events[estimated].tolist(),
+        },
+    }
+
+
+def _column(values) -> list:
+    return [None if value != value else round(value, 4) for value in values.tolist()]  # NaN -> null
+
+
+def _bands(band, prices, products, pooled, regression, did, event_band) -> list:
+    rows = []
+    estimates = {"": regression, "did_": did}
+    for number in range(CAUSAL_PRICE_BANDS):
+        members = band == number
+        if not members.any():
+            continue
+        row = {
+            "band": number,
+            "price_low": float(prices[members].min()),
+            "price_high": float(prices[members].max()),
+            "products": int(members.sum()),
+            "products_pooled": int(np.sum(band[pooled] == number)),
+            "orders": int(products["orders"][members].sum()),
+            "did_events": int(np.sum(event_band == number)),
+        }
+        for prefix, (groups, *values) in estimates.items():
+            found = np.flatnonzero(groups == number)
+            for name, column in zip(("elasticity", "ci_low", "ci_high"), values):
+                row[prefix + name] = _column(column[found])[0] if len(found) else None
+        rows.append(row)
+    return rows
+
+
+# Result cache - one entry per estimation settings, stamped with the data
+# versions of orders and products. A version mismatch means stale.
+
+def _cache_key(replicates: int, seed: int) -> str:
+    settings = [CAUSAL_HISTORY_DAYS, CAUSAL_WINDOW_WEEKS, CAUSAL_MIN_CHANGE, CAUSAL_MIN_WEEKS,
+                CAUSAL_PRICE_BANDS, CONFIDENCE, replicates, seed]
+    return f"price_elasticity:{hashlib.sha1(json.dumps(settings).encode()).hexdigest()[:20]}"
+
+
+def _load_entry(key: str):
+    try:
+        computed_at = _client.get(f"{key}:computed_at")
+        if computed_at is None:
+            return None
+        computed_at = computed_at.decode() if isinstance(computed_at, bytes) else computed_at
+        if key in _parsed and _parsed[key]["computed_at"] == computed_at:
+            return _parsed[key]
+        raw = _client.get(key)
+    except redis.RedisError:
+        return None
+    if raw is None:
+        return None
+    _parsed[key] = json.loads(raw)
+    return _parsed[key]
+
+
+def _store_entry(key: str, entry: dict):
+    try:
+        _client.set(key, json.dumps(entry), ex=CAUSAL_CACHE_TTL)
+        _client.set(f"{key}:computed_at", entry["computed_at"], ex=CAUSAL_CACHE_TTL)
+    except redis.RedisError:
+        logger.warning("could not cache price elasticity %s", key)
+
+
+def _compute(key: str, replicates: int, seed: int) -> dict:
+    # Read before estimating, so a write that lands mid-run leaves the entry stale
+    version = data_version(TABLES)
+    entry = {**estimate(replicates=replicates, seed=seed), "version": version}
+    if version is not None:
+        _store_entry(key, entry)
+    logger.info("price elasticity estimated: %s products in %ss", entry["products_estimated"], entry["seconds"])
+    return entry
+
+
+def elasticity(replicates: int = CAUSAL_BOOTSTRAP, seed: int = CAUSAL_SEED, refresh: bool = False):
+    """
+    Estimates at the current data version from the cache, or stale ones while
+    a background refresh runs (also what refresh=True gives). The catalog is
+    never estimated in the request: on a cold cache this schedules the refresh
+    and returns None. The result carries a "cache" field: hit or stale.
+    """
+    key = _cache_key(replicates, seed)
+    version = data_version(TABLES)
+    if version is None:
+        raise HTTPException(503, "Price elasticity cache unavailable, retry shortly")
+    entry = _load_entry(key)
+    fresh = entry is not None and entry["version"] == version and not refresh
+    if not fresh:
+        schedule_refresh(replicates, seed)
+    if entry is None:
+        return None
+    return {**entry, "cache": "hit" if fresh else "stale"}
+
+
+def schedule_refresh(replicates: int = CAUSAL_BOOTSTRAP, seed: int = CAUSAL_SEED):
+    """At most one refresh per cached entry in flight"""
+    from tasks.celery_app import celery_app
+    from tasks.tasks import refresh_price_elasticity
+
+    key = _cache_key(replicates, seed)
+    try:
+        if not _client.set(f"{key}:refresh", "1", ex=CAUSAL_REFRESH_TIMEOUT, nx=True):
+            return
+        if celery_app.conf.task_always_eager:
+            _refresher.submit(refresh_result, replicates, seed)
+        else:
+            refresh_price_elasticity.apply_async(args=[replicates, seed], retry=False)
+    except Exception:
+        # The stale result is still served - never fail the request over this
+        logger.exception("could not schedule refresh of price elasticity %s", key)
+
+
+def refresh_result(replicates: int = CAUSAL_BOOTSTRAP, seed: int = CAUSAL_SEED) -> dict:
+    """Estimate and cache (the background half of elasticity)"""
+    key = _cache_key(replicates, seed)
+    try:
+        entry = _compute(key, replicates, seed)
+        return {name: entry[name] for name in ("computed_at", "seconds", "products_estimated", "events")}
+    finally:
+        _client.delete(f"{key}:refresh")
+
+
+def select_products(entry: dict, product_ids: list = None, band: int = None, limit: int = 100) -> tuple:
+    """(matching count, rows) of an entry's products - most price-sensitive (lowest elasticity) first"""
+    columns = entry["products"]
+    ids = np.asarray(columns["product_id"], dtype=np.int64)
+    matching = np.ones(len(ids), dtype=bool)
+    if product_ids:
+        matching &= np.isin(ids, product_ids)
+    if band is not None:
+        matching &= np.asarray(columns["band"]) == band
+    matching = np.flatnonzero(matching)
+    regression = np.asarray(columns["elasticity"], dtype=float)[matching]
+    did = np.asarray(columns["did_elasticity"], dtype=float)[matching]
+    # By the regression estimate, then the diff-in-diff one - missing ones last
+    order = np.lexsort((ids[matching], np.nan_to_num(did, nan=np.inf), np.nan_to_num(regression, nan=np.inf)))
+    return len(matching), [{name: values[i] for name, values in columns.items()} for i in matching[order][:limit]]
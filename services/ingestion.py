@@ -0,0 +1,381 @@
+# services/ingestion.py
+import csv
+import datetime
+import io
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from fastapi import HTTPException
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import func, insert, literal_column, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from common.cache import mark_stale
+from common.db import SessionLocal
+from models.db_models import Customer, IngestionJob, Inventory, InventoryHistory, Product
+from models.schema import CustomerCreate, ProductCreate
+
+logger = logging.getLogger(__name__)
+
+# Import files must live under this directory - the API never reads arbitrary paths
+IMPORT_DIR = Path(os.getenv("IMPORT_DIR", "data/imports")).resolve()
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "5000"))
+# Parsing/validation processes, shared by all running jobs
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+# Jobs that can run at once in this process
+INGEST_MAX_JOBS = int(os.getenv("INGEST_MAX_JOBS", "2"))
+# A running job's heartbeat moves on every checkpoint commit - one older than
+# this means its worker died (or stalled), and another worker may take it over
+INGEST_HEARTBEAT_TIMEOUT = int(os.getenv("INGEST_HEARTBEAT_TIMEOUT", "120"))
+MAX_SAMPLE_ERRORS = 100
+
+FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+# kind -> (schema, model, conflict key, columns refreshed when the key already exists)
+KINDS = {
+    "products": (ProductCreate, Product, "sku", ["name", "price", "description"]),
+    "customers": (CustomerCreate, Customer, "email", ["name"]),
+}
+
+_parsers = None
+_runner = ThreadPoolExecutor(max_workers=INGEST_MAX_JOBS, thread_name_prefix="ingest")
+_lock = threading.Lock()
+_worker = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ClaimLost(Exception):
+    """Another worker took the job over - this run stops without touching it"""
+
+
+def _parser_pool() -> ProcessPoolExecutor:
+    global _parsers
+    with _lock:
+        if _parsers is None:
+            _parsers = ProcessPoolExecutor(INGEST_WORKERS)
+        return _parsers
+
+
+# Reading - runs in the job thread, holds one chunk of raw lines at a time
+
+def _read_header(fh) -> list:
+    line = fh.readline()
+    return next(csv.reader([line.decode("utf-8-sig")]))
+
+
+def _read_chunks(fh, fmt: str, chunk_rows: int):
+    """
+    Yield (raw_records, end_offset). A CSV record can span lines when a quoted
+    field contains a newline, so lines are joined until the quotes balance.
+    """
+    records = []
+    pending = b""
+    for line in iter(fh.readline, b""):
+        if fmt == "csv":
+            pending += line
+            if pending.count(b'"') % 2:
+                continue
+            line, pending = pending, b""
+        if line.strip():
+            records.append(line)
+        if len(records) >= chunk_rows:
+            yield records, fh.tell()
+            records = []
+    if pending.strip():
+        records.append(pending)
+    if records:
+        yield records, fh.tell()
+
+
+# Parsing + validation - runs in the process pool
+
+def _parse_chunk(kind: str, fmt: str, header: list, records: list, first_row: int):
+    """Returns (valid rows as dicts, [(row number, error)]) for one chunk"""
+    schema = KINDS[kind][0]
+    raw_rows = []
+    errors = []
+    numbers = []
+    if fmt == "csv":
+        text = b"".join(records).decode("utf-8")
+        for offset, values in enumerate(csv.reader(io.StringIO(text))):
+            # Empty cells mean "not given" so optional fields fall back to their defaults
+            raw_rows.append({key: value for key, value in zip(header, values) if value != ""})
+            numbers.append(first_row + offset)
+    else:
+        for offset, line in enumerate(records):
+            try:
+                raw_rows.append(json.loads(line))
+                numbers.append(first_row + offset)
+            except ValueError as exc:
+                errors.append((first_row + offset, f"Invalid JSON: {exc}"))
+
+    adapter = TypeAdapter(list[schema])
+    try:
+        valid = adapter.validate_python(raw_rows)
+    except ValidationError as exc:
+        # One pass reports every bad row; validate the rest again as a batch
+        bad = {}
+        for error in exc.errors():
+            index, *field = error["loc"]
+            bad.setdefault(index, f"{'.'.join(map(str, field)) or 'row'}: {error['msg']}")
+        errors.extend((numbers[index], message) for index, message in bad.items())
+        valid = adapter.validate_python([row for index, row in enumerate(raw_rows) if index not in bad])
+    return [row.model_dump() for row in valid], sorted(errors)
+
+
+# Writing - one transaction per chunk, checkpoint included
+
+def _upsert(db: Session, kind: str, rows: list, job_id: int):
+    """Insert new rows and refresh existing ones on the unique key. Returns (inserted, updated)."""
+    _, model, key, refresh = KINDS[kind]
+    # Last occurrence wins - Postgres can't update the same row twice in one statement
+    rows = list({row[key]: row for row in rows}.values())
+    if kind == "products":
+        now = datetime.datetime.utcnow()
+        rows = [{**row, "created_at": now, "updated_at": now} for row in rows]
+        refresh = refresh + ["updated_at"]
+
+    dialect = db.bind.dialect.name
+    key_column = getattr(model, key)
+    if dialect == "postgresql":
+        statement = postgresql.insert(model)
+        # xmax = 0 only for rows this statement inserted
+        inserted_flag = literal_column("xmax = 0")
+        existing = None
+    else:
+        statement = sqlite.insert(model)
+        inserted_flag = None
+        # SQLite has a single writer, so a pre-read of the keys can't race
+        existing = set(db.scalars(select(key_column).where(key_column.in_([row[key] for row in rows]))))
+
+    statement = statement.on_conflict_do_update(
+        index_elements=[key],
+        set_={column: statement.excluded[column] for column in refresh},
+    )
+    returning = [model.id, key_column] + ([inserted_flag.label("inserted")] if inserted_flag is not None else [])
+    results = db.execute(statement.returning(*returning, sort_by_parameter_order=True), rows).all()
+
+    inserted = []
+    updated = []
+    for row, result in zip(rows, results):
+        is_new = result.inserted if existing is None else result[1] not in existing
+        (inserted if is_new else updated).append((result.id, row))
+
+    if kind == "products":
+        _create_stock(db, inserted, job_id)
+        mark_stale(db, *[f"product:{pid}" for pid, _ in updated])
+    else:
+        mark_stale(db, *[f"customer:{cid}" for cid, _ in updated])
+    return len(inserted), len(updated)
+
+
+def _create_stock(db: Session, new_products: list, job_id: int):
+    """Same initial Inventory + InventoryHistory rows POST /products/ creates"""
+    if not new_products:
+        return
+    db.execute(insert(Inventory), [
+        {"product_id": pid, "quantity": row["quantity"], "location": "Main Warehouse"}
+        for pid, row in new_products
+    ])
+    db.execute(insert(InventoryHistory), [
+        {
+            "product_id": pid,
+            "old_quantity": 0,
+            "new_quantity": row["quantity"],
+            "quantity_change": row["quantity"],
+            "change_reason": "initial_stock",
+            "changed_by": "import",
+            "notes": f"Import job #{job_id}",
+        }
+        for pid, row in new_products
+    ])
+
+
+# Jobs
+
+def resolve_source(path: str) -> Path:
+    source = (IMPORT_DIR / path).resolve()
+    if not source.is_relative_to(IMPORT_DIR):
+        raise HTTPException(400, "Path must be inside the import directory")
+    if not source.is_file():
+        raise HTTPException(404, "Import file not found")
+    return source
+
+
+def create_job(db: Session, kind: str, path: str, fmt: str = None) -> IngestionJob:
+    if kind not in KINDS:
+        raise HTTPException(400, f"Kind must be one of: {list(KINDS)}")
+    source = resolve_source(path)
+    fmt = fmt or FORMATS.get(source.suffix.lower())
+    if fmt not in FORMATS.values():
+        raise HTTPException(400, "Format must be csv or ndjson")
+
+    job = IngestionJob(
+        kind=kind,
+        source=str(source.relative_to(IMPORT_DIR)),
+        format=fmt,
+        status="pending",
+        source_size=source.stat().st_size,
+        checkpoint_offset=0,
+        rows_read=0,
+        rows_inserted=0,
+        rows_updated=0,
+        rows_rejected=0,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def _stale_before() -> datetime.datetime:
+    return datetime.datetime.utcnow() - datetime.timedelta(seconds=INGEST_HEARTBEAT_TIMEOUT)
+
+
+def claim_job(db: Session, job_id: int):
+    """
+    Mark a job running under a new owner, in one conditional UPDATE - only
+    if it isn't completed, and isn't running with a live heartbeat. Of
+    workers racing for the same job exactly one gets a row. Returns the
+    owner, or None if the job is taken.
+    """
+    owner = f"{_worker}:{uuid.uuid4().hex[:8]}"
+    now = datetime.datetime.utcnow()
+    result = db.execute(
+        update(IngestionJob)
+        .where(
+            IngestionJob.id == job_id,
+            IngestionJob.status != "completed",
+            or_(IngestionJob.status != "running", IngestionJob.heartbeat_at.is_(None),
+                IngestionJob.heartbeat_at < _stale_before()),
+        )
+        .values(status="running", owner=owner, heartbeat_at=now, error=None,
+                started_at=func.coalesce(IngestionJob.started_at, now))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return owner if result.rowcount else None
+
+
+def _heartbeat(db: Session, job_id: int, owner: str, **values):
+    """Move the heartbeat (and set values) in the caller's transaction, or raise ClaimLost"""
+    result = db.execute(
+        update(IngestionJob)
+        .where(IngestionJob.id == job_id, IngestionJob.owner == owner)
+        .values(heartbeat_at=datetime.datetime.utcnow(), **values)
+        .execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        raise ClaimLost(job_id)
+
+
+def start_job(db: Session, job_id: int) -> bool:
+    """Claim a job and run (or resume) it in the background. Returns False if another run holds it."""
+    owner = claim_job(db, job_id)
+    if owner is None:
+        return False
+    _runner.submit(_run_job, job_id, owner)
+    return True
+
+
+def _run_job(job_id: int, owner: str):
+    db = SessionLocal()
+    try:
+        # Queued behind INGEST_MAX_JOBS others for longer than the timeout, the job
+        # may have been resumed elsewhere meanwhile
+        _heartbeat(db, job_id, owner)
+        db.commit()
+        run_job(db, db.get(IngestionJob, job_id), owner)
+    except ClaimLost:
+        db.rollback()
+        logger.warning("import job %s was taken over by another worker - this run stopped", job_id)
+    except Exception as exc:
+        db.rollback()
+        try:
+            _heartbeat(db, job_id, owner, status="failed", error=str(exc)[:2000])
+            db.commit()
+        except ClaimLost:
+            db.rollback()
+    finally:
+        db.close()
+
+
+def run_job(db: Session, job: IngestionJob, owner: str):
+    """
+    Stream the file from the job's checkpoint to the end.
+
+    Raw chunks go to the parser processes with a bounded number in flight,
+    so memory stays flat whatever the file size. Results are written in file
+    order and each chunk's upsert commits together with the new checkpoint
+    and heartbeat, so a resumed job neither skips nor repeats a chunk. A
+    checkpoint whose heartbeat finds another owner rolls back (ClaimLost).
+    """
+    source = IMPORT_DIR / job.source
+    size = source.stat().st_size
+    if job.checkpoint_offset and size != job.source_size:
+        raise RuntimeError("Source file changed since the job started - create a new job")
+
+    pool = _parser_pool()
+    max_in_flight = INGEST_WORKERS * 2
+    run_started = time.perf_counter()
+    rows_this_run = 0
+
+    with open(source, "rb") as fh:
+        header = _read_header(fh) if job.format == "csv" else None
+        if job.checkpoint_offset:
+            fh.seek(job.checkpoint_offset)
+
+        in_flight = []
+        next_row = job.rows_read + 1
+        chunks = _read_chunks(fh, job.format, INGEST_CHUNK_ROWS)
+        while True:
+            for records, end_offset in chunks:
+                future = pool.submit(_parse_chunk, job.kind, job.format, header, records, next_row)
+                in_flight.append((future, end_offset, len(records)))
+                next_row += len(records)
+                if len(in_flight) >= max_in_flight:
+                    break
+            if not in_flight:
+                break
+
+            future, end_offset, record_count = in_flight.pop(0)
+            rows, errors = future.result()
+            inserted, updated = _upsert(db, job.kind, rows, job.id) if rows else (0, 0)
+
+            rows_this_run += record_count
+            job.rows_read += record_count
+            job.rows_inserted += inserted
+            job.rows_updated += updated
+            job.rows_rejected += len(errors)
+            samples = list(job.sample_errors or [])
+            if len(samples) < MAX_SAMPLE_ERRORS and errors:
+                samples.extend({"row": row, "error": message} for row, message in errors[:MAX_SAMPLE_ERRORS - len(samples)])
+                job.sample_errors = samples
+            job.checkpoint_offset = end_offset
+            job.rows_per_sec = round(rows_this_run / (time.perf_counter() - run_started), 1)
+            db.flush()
+            _heartbeat(db, job.id, owner)
+            db.commit()
+
+    job.status = "completed"
+    job.finished_at = datetime.datetime.utcnow()
+    db.flush()
+    _heartbeat(db, job.id, owner)
+    db.commit()
+
+
+def job_status(job: IngestionJob) -> dict:
+    status = {column.name: getattr(job, column.name) for column in IngestionJob.__table__.columns}
+    if job.source_size:
+        status["progress"] = round(job.checkpoint_offset / job.source_size, 4)
+    if job.status == "running" and (job.heartbeat_at is None or job.heartbeat_at < _stale_before()):
+        # Its worker died or stalled - resume picks it up from the checkpoint
+        status["status"] = "interrupted"
+    return status
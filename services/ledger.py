@@ -0,0 +1,299 @@
+# services/ledger.py
+import datetime
+from collections import defaultdict
+
+from fastapi import HTTPException
+from sqlalchemy import delete, false, func, insert, literal, select, text, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.db_models import Account, AccountBalanceSnapshot, Transaction, TransactionLine, User
+
+# Balances are debits - credits (the seed data's convention): positive for
+# debit-normal accounts (assets, expenses), negative for credit-normal ones.
+
+# Postgres advisory lock: postings share it, a snapshot takes it exclusively -
+# so a posting can't commit between a snapshot reading the lines and writing it
+_SNAPSHOT_LOCK = 150023
+
+
+def cents(amount) -> int:
+    return round((amount or 0) * 100)
+
+
+def _lock(db: Session, exclusive: bool = False):
+    """Held until the transaction ends. Take it before any row lock."""
+    if db.bind.dialect.name == "postgresql":
+        function = "pg_advisory_xact_lock" if exclusive else "pg_advisory_xact_lock_shared"
+        db.execute(text(f"SELECT {function}(:key)"), {"key": _SNAPSHOT_LOCK})
+    elif exclusive:
+        # SQLite has one writer - a no-op write takes its lock before anything is read
+        db.execute(delete(AccountBalanceSnapshot).where(false()))
+
+
+def _deltas(lines, sign: int = 1) -> dict:
+    """{account_id: net debit in cents} of (account_id, debit, credit) rows"""
+    deltas = defaultdict(int)
+    for account_id, debit, credit in lines:
+        deltas[account_id] += sign * (cents(debit) - cents(credit))
+    return {account_id: delta for account_id, delta in deltas.items() if delta}
+
+
+def _apply(db: Session, deltas: dict, day: datetime.date):
+    """
+    Add net debits to the accounts' balances and to every snapshot on or after
+    day, atomically in SQL. Rows in key order so concurrent postings can't deadlock.
+    """
+    for account_id, delta in sorted(deltas.items()):
+        db.execute(
+            update(Account).where(Account.id == account_id).values(balance=func.coalesce(Account.balance, 0) + delta / 100),
+            execution_options={"synchronize_session": False},
+        )
+    later = db.scalars(select(AccountBalanceSnapshot.as_of).distinct().where(AccountBalanceSnapshot.as_of >= day)).all()
+    rows = [
+        {"as_of": as_of, "account_id": account_id, "balance": delta / 100}
+        for as_of in sorted(later) for account_id, delta in sorted(deltas.items())
+    ]
+    if not rows:
+        return
+    insert_ = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    statement = insert_(AccountBalanceSnapshot)
+    statement = statement.on_conflict_do_update(
+        index_elements=[column.name for column in AccountBalanceSnapshot.__table__.primary_key],
+        set_={"balance": AccountBalanceSnapshot.balance + statement.excluded.balance},
+    )
+    db.execute(statement, rows)
+
+
+def _lines(db: Session, transaction_id: int) -> list:
+    return db.execute(
+        select(TransactionLine.account_id, TransactionLine.debit_amount, TransactionLine.credit_amount)
+        .where(TransactionLine.transaction_id == transaction_id)
+    ).all()
+
+
+# Posting
+
+def post(db: Session, entry, created_by: int) -> Transaction:
+    """
+    Write a transaction and its debit/credit lines and add them to the account
+    balances (and any snapshot on or after its date) in one commit. Each line
+    is either a debit or a credit; debits and credits must balance to the cent.
+    """
+    if len(entry.lines) < 2:
+        raise HTTPException(400, "A journal entry needs at least two lines")
+    for line in entry.lines:
+        if line.debit < 0 or line.credit < 0 or (cents(line.debit) > 0) == (cents(line.credit) > 0):
+            raise HTTPException(400, "Each line needs either a positive debit or a positive credit, not both")
+    debits, credits = (sum(cents(getattr(line, side)) for line in entry.lines) for side in ("debit", "credit"))
+    if debits != credits:
+        raise HTTPException(400, f"Debits ({debits / 100:.2f}) and credits ({credits / 100:.2f}) don't balance")
+
+    if not db.get(User, created_by):
+        raise HTTPException(404, "User not found")
+    account_ids = {line.account_id for line in entry.lines}
+    missing = account_ids - set(db.scalars(select(Account.id).where(Account.id.in_(account_ids))))
+    if missing:
+        raise HTTPException(404, f"Accounts not found: {sorted(missing)}")
+    if db.query(Transaction.id).filter(Transaction.transaction_number == entry.transaction_number).first():
+        raise HTTPException(400, "Transaction number already exists")
+
+    _lock(db)
+    transaction = Transaction(
+        transaction_number=entry.transaction_number,
+        date=entry.date,
+        description=entry.description,
+        total_amount=debits / 100,
+        created_by=created_by,
+    )
+    db.add(transaction)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(400, "Transaction number already exists")
+    db.execute(insert(TransactionLine), [
+        {"transaction_id": transaction.id, "account_id": line.account_id,
+         "debit_amount": cents(line.debit) / 100, "credit_amount": cents(line.credit) / 100}
+        for line in entry.lines
+    ])
+    _apply(db, _deltas((line.account_id, line.debit, line.credit) for line in entry.lines), entry.date)
+    db.commit()
+    db.refresh(transaction)
+    return transaction
+
+
+def unpost(db: Session, transaction: Transaction):
+    """Delete a transaction's lines and take them back out of the balances. The caller deletes it and commits."""
+    _lock(db)
+    lines = _lines(db, transaction.id)
+    if lines:
+        db.query(TransactionLine).filter(TransactionLine.transaction_id == transaction.id).delete(
+            synchronize_session=False
+        )
+        if transaction.date is not None:
+            _apply(db, _deltas(lines, sign=-1), transaction.date)
+
+
+def redate(db: Session, transaction: Transaction, day: datetime.date):
+    """Move a posted transaction to another day - only the snapshots in between change. The caller commits."""
+    if transaction.date == day:
+        return
+    _lock(db)
+    lines = _lines(db, transaction.id)
+    if lines and transaction.date is not None:
+        _apply(db, _deltas(lines, sign=-1), transaction.date)
+        _apply(db, _deltas(lines), day)
+    transaction.date = day
+
+
+def lines_total(db: Session, transaction_id: int):
+    """Sum of a transaction's debits, or None when it has no lines"""
+    count, total = db.execute(
+        select(func.count(), func.sum(TransactionLine.debit_amount)).where(TransactionLine.transaction_id == transaction_id)
+    ).one()
+    if not count:
+        return None
+    return total or 0
+
+
+# Balances as of a day
+
+def latest_snapshot(db: Session, day: datetime.date):
+    return db.scalar(select(func.max(AccountBalanceSnapshot.as_of)).where(AccountBalanceSnapshot.as_of <= day))
+
+
+def balances_as_of(db: Session, day: datetime.date, account_id: int = None) -> tuple:
+    """
+    ({account_id: balance}, snapshot day used, lines read) at the end of day:
+    the latest snapshot on or before it plus the lines dated after that, in
+    one statement so a concurrent posting is either fully in or fully out.
+    """
+    snapshot_day = latest_snapshot(db, day)
+    snapshot = (
+        select(AccountBalanceSnapshot.account_id, AccountBalanceSnapshot.balance.label("amount"), literal(0).label("line"))
+        .where(AccountBalanceSnapshot.as_of == snapshot_day)
+    )
+    delta = (
+        select(TransactionLine.account_id, (TransactionLine.debit_amount - TransactionLine.credit_amount).label("amount"),
+               literal(1).label("line"))
+        .join(Transaction, Transaction.id == TransactionLine.transaction_id)
+        .where(Transaction.date <= day)
+    )
+    if snapshot_day:
+        delta = delta.where(Transaction.date > snapshot_day)
+    if account_id is not None:
+        snapshot = snapshot.where(AccountBalanceSnapshot.account_id == account_id)
+        delta = delta.where(TransactionLine.account_id == account_id)
+    parts = union_all(snapshot, delta).subquery() if snapshot_day else delta.subquery()
+    rows = db.execute(
+        select(parts.c.account_id, func.sum(parts.c.amount), func.sum(parts.c.line)).group_by(parts.c.account_id)
+    ).all()
+    balances = {row_account: round(amount or 0, 2) for row_account, amount, _ in rows}
+    return balances, snapshot_day, int(sum(line or 0 for _, _, line in rows))
+
+
+def account_balance(db: Session, account_id: int, day: datetime.date = None) -> dict:
+    account = db.get(Account, account_id)
+    if not account:
+        raise HTTPException(404, "Account not found")
+    if day is None:
+        return {"account_id": account_id, "as_of": None, "balance": round(account.balance or 0, 2),
+                "snapshot_as_of": None, "lines_read": 0}
+    balances, snapshot_day, lines = balances_as_of(db, day, account_id)
+    return {"account_id": account_id, "as_of": day, "balance": balances.get(account_id, 0.0),
+            "snapshot_as_of": snapshot_day, "lines_read": lines}
+
+
+def trial_balance(db: Session, day: datetime.date = None) -> dict:
+    """
+    Every account with a balance, in a debit or a credit column, and the two
+    totals - they match when every posting balanced. Without a day, the live
+    accounts.balance (everything posted, whatever its date); with one, as of
+    the end of that day.
+    """
+    accounts = db.query(Account).order_by(Account.account_number, Account.id).all()
+    if day is None:
+        balances, snapshot_day, lines = {account.id: round(account.balance or 0, 2) for account in accounts}, None, 0
+    else:
+        balances, snapshot_day, lines = balances_as_of(db, day)
+
+    rows = []
+    for account in accounts:
+        balance = balances.get(account.id, 0.0)
+        if cents(balance):
+            rows.append({"account_id": account.id, "account_number": account.account_number,
+                         "account_name": account.account_name, "account_type": account.account_type,
+                         "debit": max(balance, 0.0), "credit": max(-balance, 0.0), "balance": balance})
+    total_debit = sum(cents(row["debit"]) for row in rows)
+    total_credit = sum(cents(row["credit"]) for row in rows)
+    return {"as_of": day, "snapshot_as_of": snapshot_day, "lines_read": lines, "accounts": rows,
+            "total_debit": total_debit / 100, "total_credit": total_credit / 100,
+            "balanced": total_debit == total_credit}
+
+
+# Snapshots
+
+def snapshot(db: Session, day: datetime.date = None) -> dict:
+    """
+    Write every account's balance at the end of day (default: yesterday, UTC)
+    from the previous snapshot plus the lines dated since. Postings wait while
+    it runs. A day that already has a snapshot is left alone.
+    """
+    day = day or datetime.datetime.utcnow().date() - datetime.timedelta(days=1)
+    _lock(db, exclusive=True)
+    if db.scalar(select(AccountBalanceSnapshot.as_of).where(AccountBalanceSnapshot.as_of == day).limit(1)):
+        db.rollback()
+        return {"as_of": day.isoformat(), "skipped": True}
+    balances, previous, lines = balances_as_of(db, day)
+    rows = [{"as_of": day, "account_id": account_id, "balance": balance}
+            for account_id, balance in sorted(balances.items())]
+    if rows:
+        db.execute(insert(AccountBalanceSnapshot), rows)
+    db.commit()
+    return {"as_of": day.isoformat(), "previous": previous.isoformat() if previous else None,
+            "accounts": len(rows), "lines_read": lines}
+
+
+def check(db: Session, max_samples: int = 20) -> dict:
+    """
+    Compare accounts.balance and the latest snapshot with sums over every line
+    (full scans - a consistency check, not a hot path)
+    """
+    lines = {
+        account_id: round(total or 0, 2)
+        for account_id, total in db.execute(
+            select(TransactionLine.account_id, func.sum(TransactionLine.debit_amount - TransactionLine.credit_amount))
+            .group_by(TransactionLine.account_id)
+        )
+    }
+    mismatches = [
+        {"account_id": account_id, "balance": round(balance or 0, 2), "lines": lines.get(account_id, 0.0)}
+        for account_id, balance in db.execute(select(Account.id, Account.balance).order_by(Account.id))
+        if cents(balance) != cents(lines.get(account_id, 0.0))
+    ]
+    result = {"accounts_checked": len(lines), "mismatches": len(mismatches), "samples": mismatches[:max_samples]}
+
+    snapshot_day = latest_snapshot(db, datetime.date.max)
+    if snapshot_day:
+        expected = {
+            account_id: round(total or 0, 2)
+            for account_id, total in db.execute(
+                select(TransactionLine.account_id, func.sum(TransactionLine.debit_amount - TransactionLine.credit_amount))
+                .join(Transaction, Transaction.id == TransactionLine.transaction_id)
+                .where(Transaction.date <= snapshot_day)
+                .group_by(TransactionLine.account_id)
+            )
+        }
+        stored = dict(db.execute(
+            select(AccountBalanceSnapshot.account_id, AccountBalanceSnapshot.balance)
+            .where(AccountBalanceSnapshot.as_of == snapshot_day)
+        ).all())
+        result["snapshot_as_of"] = snapshot_day
+        result["snapshot_mismatches"] = sum(
+            cents(stored.get(account_id, 0.0)) != cents(expected.get(account_id, 0.0))
+            for account_id in set(stored) | set(expected)
+        )
+    result["ok"] = not result["mismatches"] and not result.get("snapshot_mismatches")
+    return result
@@ -0,0 +1,293 @@
+# services/modeling.py
+import datetime
+import logging
+import os
+import time
+from collections import Counter
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from common.processes import map_chunks
+from models.db_models import DemandForecast, InventoryHistory, Order, Product, SalesRollup
+
+logger = logging.getLogger(__name__)
+
+# "inventory": units of inventory_history "sale" rows, by changed_at.
+# "orders": one unit per order that wasn't cancelled, by sold_at (read from the
+# daily sales_rollups). An order writes both, so the two are never added up.
+FORECAST_DEMAND_SOURCE = os.getenv("FORECAST_DEMAND_SOURCE", "inventory")
+FORECAST_HISTORY_DAYS = int(os.getenv("FORECAST_HISTORY_DAYS", "365"))
+# Models are compared on their one-step error over the last days of history
+FORECAST_HOLDOUT_DAYS = int(os.getenv("FORECAST_HOLDOUT_DAYS", "28"))
+# Products per demand matrix - one query and one vectorized fit each
+FORECAST_CHUNK = int(os.getenv("FORECAST_CHUNK", "10000"))
+# Above 1, matrices are fitted in a process pool while the next one loads
+FORECAST_WORKERS = int(os.getenv("FORECAST_WORKERS", "1"))
+MAX_HORIZON = 365
+
+SOURCES = ("inventory", "orders")
+MODELS = ("ses", "seasonal_naive", "croston")
+# Smoothing constants tried for ses and croston - the best one per product is kept
+ALPHAS = np.array([0.05, 0.1, 0.2, 0.3, 0.5])
+SEASON = 7  # days
+
+
+# Fitting - pure NumPy, so a matrix can be shipped to another process
+
+def fit_matrix(demand: np.ndarray, holdout: int = FORECAST_HOLDOUT_DAYS) -> dict:
+    """
+    Fit every model to every row of a (products x days) demand matrix and keep
+    each row's best by one-step squared error over the last `holdout` days.
+    The loops are over days only - each step is one array operation across
+    all products and smoothing constants.
+    """
+    products, days = demand.shape
+    holdout = max(1, min(holdout, days - SEASON - 1))
+    scored_from = days - holdout
+    rows = np.arange(products)
+
+    ses_level, ses_alpha, ses_sse = _ses(demand, scored_from)
+    size, interval, croston_alpha, croston_sse = _croston(demand, scored_from)
+    season = demand[:, days - SEASON:]
+    seasonal_error = demand[:, scored_from:] - demand[:, scored_from - SEASON:days - SEASON]
+    seasonal_sse = np.einsum("ij,ij->i", seasonal_error, seasonal_error)
+
+    # Ties go to the first model, so a product that never sold gets a flat 0
+    sse = np.stack([ses_sse, seasonal_sse, croston_sse], axis=1)
+    model = sse.argmin(1)
+    croston_daily = (1 - croston_alpha / 2) * size / interval
+    is_ses, is_seasonal, is_croston = model == 0, model == 1, model == 2
+    return {
+        "model": model,
+        "alpha": np.select([is_ses, is_croston], [ses_alpha, croston_alpha], np.nan),
+        "level": np.select([is_ses, is_croston], [ses_level, size], np.nan),
+        "interval": np.where(is_croston, interval, np.nan),
+        "season": season,
+        "daily": np.select([is_ses, is_seasonal], [ses_level, season.mean(1)], croston_daily),
+        "rmse": np.sqrt(sse[rows, model] / holdout),
+        "units": demand.sum(1),
+        "demand_days": np.count_nonzero(demand, axis=1),
+    }
+
+
+def _ses(demand, scored_from):
+    """Simple exponential smoothing, every alpha at once: (level, alpha, sse) of the best"""
+    alphas = ALPHAS[None, :]
+    level = np.repeat(demand[:, :SEASON].mean(1, keepdims=True), len(ALPHAS), axis=1)
+    sse = np.zeros_like(level)
+    for day in range(demand.shape[1]):
+        error = demand[:, day, None] - level
+        if day >= scored_from:
+            sse += error * error
+        level += alphas * error
+    best = sse.argmin(1)
+    rows = np.arange(len(demand))
+    return level[rows, best], ALPHAS[best], sse[rows, best]
+
+
+def _croston(demand, scored_from):
+    """
+    Croston for intermittent demand: smooth the size of non-zero demands and the
+    gap between them separately. The forecast is debiased (Syntetos-Boylan).
+    Returns (size, interval, alpha, sse) of the best alpha.
+    """
+    products, days = demand.shape
+    alphas = ALPHAS[None, :]
+    debias = 1 - alphas / 2
+    nonzero = demand > 0
+    hits = np.maximum(np.count_nonzero(nonzero, axis=1), 1)[:, None]
+    # Start from the averages over the whole window
+    size = np.repeat(demand.sum(1, keepdims=True) / hits, len(ALPHAS), axis=1)
+    interval = np.repeat(days / hits, len(ALPHAS), axis=1)
+    since = np.zeros((products, 1))
+    sse = np.zeros_like(size)
+    for day in range(days):
+        actual = demand[:, day, None]
+        if day >= scored_from:
+            error = actual - debias * size / interval
+            sse += error * error
+        since += 1
+        hit = nonzero[:, day, None]
+        size = np.where(hit, size + alphas * (actual - size), size)
+        interval = np.where(hit, interval + alphas * (since - interval), interval)
+        since = np.where(hit, 0, since)
+    best = sse.argmin(1)
+    rows = np.arange(products)
+    return size[rows, best], interval[rows, best], ALPHAS[best], sse[rows, best]
+
+
+# Loading - daily demand per product, aggregated in SQL
+
+def _source(source: str):
+    """(units, moment, product, filters, newest row id) of a demand source"""
+    if source == "orders":
+        # Orders still queued for the rollups at the watermark wait for the product's next sale
+        return (SalesRollup.order_count, SalesRollup.bucket, SalesRollup.dimension_id,
+                [SalesRollup.grain == "day", SalesRollup.dimension == "product", SalesRollup.status != "cancelled"],
+                Order.id)
+    return (-InventoryHistory.quantity_change, InventoryHistory.changed_at, InventoryHistory.product_id,
+            [InventoryHistory.change_reason == "sale"], InventoryHistory.id)
+
+
+def day_index(db: Session, moment, start: datetime.datetime):
+    """Whole days between start and moment, in SQL"""
+    if db.bind.dialect.name == "postgresql":
+        return cast(func.floor(func.extract("epoch", moment - start) / 86400), Integer)
+    return cast(func.julianday(moment) - func.julianday(start), Integer)
+
+
+def history_end(db: Session, source: str):
+    """Last complete day with sales - yesterday on a live system"""
+    if source == "orders":
+        newest = db.scalar(select(func.max(Order.sold_at)))
+    else:
+        newest = db.scalar(select(func.max(InventoryHistory.changed_at)).where(InventoryHistory.change_reason == "sale"))
+    if newest is None:
+        return None
+    return min(newest.date(), datetime.datetime.utcnow().date() - datetime.timedelta(days=1))
+
+
+def _changed_products(db: Session, source: str, since: int) -> list:
+    if source == "orders":
+        query = select(Order.product_id).where(Order.id > since)
+    else:
+        query = select(InventoryHistory.product_id).where(
+            InventoryHistory.id > since, InventoryHistory.change_reason == "sale")
+    return sorted(db.scalars(query.distinct()))
+
+
+def demand_matrix(db: Session, source: str, ids: np.ndarray, start: datetime.datetime, days: int) -> np.ndarray:
+    """(len(ids) x days) units sold from start, one GROUP BY for the whole chunk. ids sorted."""
+    units, moment, product, where, _ = _source(source)
+    daily = (
+        select(product.label("product_id"), day_index(db, moment, start).label("day"), units.label("units"))
+        .where(*where, product.in_(ids.tolist()), moment >= start,
+               moment < start + datetime.timedelta(days=days))
+        .subquery()
+    )
+    rows = db.execute(
+        select(daily.c.product_id, daily.c.day, func.sum(daily.c.units))
+        .group_by(daily.c.product_id, daily.c.day)
+    ).all()
+    demand = np.zeros((len(ids), days))
+    if rows:
+        product_ids, day, total = np.asarray(rows, dtype=float).T
+        inside = (day >= 0) & (day < days)
+        demand[np.searchsorted(ids, product_ids[inside]), day[inside].astype(np.int64)] = total[inside]
+    return np.maximum(demand, 0)
+
+
+def _save(db: Session, source: str, ids: np.ndarray, fit: dict, end: datetime.date, last_row_id: int):
+    """Upsert one chunk of fitted models"""
+    columns = {name: np.round(values, 4).tolist() for name, values in fit.items() if name != "model"}
+    now = datetime.datetime.utcnow()
+    rows = [
+        {
+            "product_id": product_id,
+            "source": source,
+            "model": MODELS[model],
+            "alpha": _number(columns["alpha"][i]),
+            "level": _number(columns["level"][i]),
+            "interval": _number(columns["interval"][i]),
+            "season": columns["season"][i],
+            "daily": columns["daily"][i],
+            "rmse": columns["rmse"][i],
+            "units": columns["units"][i],
+            "demand_days": int(columns["demand_days"][i]),
+            "history_end": end,
+            "last_row_id": last_row_id,
+            "fitted_at": now,
+        }
+        for i, (product_id, model) in enumerate(zip(ids.tolist(), fit["model"].tolist()))
+    ]
+    insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    # Core table, not the ORM bulk path - that splits the batch wherever a NULL moves
+    statement = insert(DemandForecast.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=["product_id"],
+        set_={name: statement.excluded[name] for name in rows[0] if name != "product_id"},
+    )
+    db.execute(statement, rows)
+
+
+def _number(value):
+    return None if value != value else value  # NaN -> NULL
+
+
+def refit(db: Session, full: bool = False, source: str = None, workers: int = FORECAST_WORKERS) -> dict:
+    """
+    Fit demand models for every product with sales past the newest row the
+    last run saw (every product on the first run or with full). One
+    transaction per chunk of FORECAST_CHUNK products. Returns run stats.
+    """
+    source = source or FORECAST_DEMAND_SOURCE
+    if source not in SOURCES:
+        raise HTTPException(400, f"Source must be one of: {list(SOURCES)}")
+    started = time.perf_counter()
+    result = {"source": source, "mode": "full", "products": 0, "chunks": 0, "models": {}}
+    # Taken first: rows that land during the run are picked up by the next one
+    last_row_id = db.scalar(select(func.max(_source(source)[4]))) or 0
+    end = history_end(db, source)
+    if end is None:
+        return result
+    start = datetime.datetime.combine(end, datetime.time()) - datetime.timedelta(days=FORECAST_HISTORY_DAYS - 1)
+
+    since = None if full else db.scalar(
+        select(func.max(DemandForecast.last_row_id)).where(DemandForecast.source == source))
+    if since is None:
+        ids = list(db.scalars(select(Product.id).order_by(Product.id)))
+    else:
+        result["mode"] = "incremental"
+        ids = _changed_products(db, source, since)
+    ids = np.asarray(ids, dtype=np.int64)
+    chunks = [ids[i:i + FORECAST_CHUNK] for i in range(0, len(ids), FORECAST_CHUNK)]
+
+    models = Counter()
+    # Fitted in a process pool with FORECAST_WORKERS > 1, while the next matrix loads
+    jobs = ((demand_matrix(db, source, ids, start, FORECAST_HISTORY_DAYS),) for ids in chunks)
+    fits = map_chunks(fit_matrix, jobs, workers if len(chunks) > 1 else 1)
+    for chunk, fit in zip(chunks, fits):
+        _save(db, source, chunk, fit, end, last_row_id)
+        db.commit()
+        models.update(MODELS[model] for model in fit["model"].tolist())
+    elapsed = time.perf_counter() - started
+    result.update({
+        "products": len(ids),
+        "chunks": len(chunks),
+        "models": dict(models),
+        "history_end": end.isoformat(),
+        "last_row_id": last_row_id,
+        "seconds": round(elapsed, 3),
+        "products_per_sec": round(len(ids) / elapsed, 1) if elapsed else None,
+    })
+    logger.info("demand forecasts refit: %s", result)
+    return result
+
+
+# Reading
+
+def daily_units(forecast: DemandForecast, horizon: int) -> list:
+    """Expected units for each of the `horizon` days after history_end"""
+    if forecast.model == "seasonal_naive":
+        return [forecast.season[day % SEASON] for day in range(horizon)]
+    return [forecast.daily] * horizon
+
+
+def product_forecast(db: Session, product_id: int, horizon: int) -> dict:
+    forecast = db.get(DemandForecast, product_id)
+    if forecast is None:
+        raise HTTPException(404, "No forecast for this product")
+    units = daily_units(forecast, horizon)
+    return {
+        "forecast": forecast,
+        "horizon": horizon,
+        "total": round(sum(units), 4),
+        "points": [
+            {"date": forecast.history_end + datetime.timedelta(days=day + 1), "units": value}
+            for day, value in enumerate(units)
+        ],
+    }
@@ -0,0 +1,262 @@
+# services/order_events.py
+import datetime
+import json
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+
+import redis
+from sqlalchemy import bindparam, func, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from common.cache import REDIS_URL, make_redis_client, mark_stale
+from models.db_models import Customer, InventoryHistory, ProcessedEvent, Product
+from services import sales_rollups
+
+logger = logging.getLogger(__name__)
+
+# "deferred": the order request only queues an event and a Celery worker writes
+# the history row / counters / sales rollups / notifications in batches. "inline": written in
+# the order's own transaction, like before. Deferred needs REDIS_URL.
+ORDER_SIDE_EFFECTS = os.getenv("ORDER_SIDE_EFFECTS", "deferred")
+ORDER_EVENTS_BATCH = int(os.getenv("ORDER_EVENTS_BATCH", "1000"))
+# Idempotency keys are kept this long - a redelivery older than that would apply twice
+PROCESSED_EVENTS_RETENTION_DAYS = int(os.getenv("PROCESSED_EVENTS_RETENTION_DAYS", "7"))
+
+QUEUE_KEY = "order_events:queue"
+STATS_KEY = "order_events:stats"
+LOCK_KEY = "order_events:flush_lock"
+SCHEDULED_KEY = "order_events:flush_scheduled"
+LOCK_TIMEOUT = 300  # seconds - one consumer at a time, renewed every batch
+
+_client = make_redis_client(REDIS_URL)
+
+# Called with the list of newly applied events after their transaction commits
+_hooks = []
+
+
+def on_order_created(hook):
+    """Register a notification hook: hook(events). Failures are logged, not retried."""
+    _hooks.append(hook)
+    return hook
+
+
+def deferred() -> bool:
+    return ORDER_SIDE_EFFECTS == "deferred" and _client is not None
+
+
+def order_event(order: dict, old_quantity: int, new_quantity: int, location: str) -> dict:
+    """Everything the consumer needs, so it never has to read the order back"""
+    return {
+        "type": "order_created",
+        "key": f"order_created:{order['id']}",
+        "order_id": order["id"],
+        "customer_id": order["customer_id"],
+        "product_id": order["product_id"],
+        "old_quantity": old_quantity,
+        "new_quantity": new_quantity,
+        "location": location,
+        "sold_at": order["sold_at"].isoformat(),
+        "queued_at": time.time(),
+    }
+
+
+# Producer side - the order request
+
+def record(db: Session, events: list):
+    """Before the order commits: in inline mode write the side effects in the same transaction"""
+    if not deferred():
+        db.info.setdefault("applied_order_events", []).extend(apply_events(db, events))
+
+
+def publish(db: Session, events: list):
+    """
+    After the order commits: queue the events for the worker. If Redis is
+    unreachable they are applied right here instead, so nothing is lost.
+    """
+    if not deferred():
+        _notify(db.info.pop("applied_order_events", []))
+        return
+    try:
+        _client.rpush(QUEUE_KEY, *[json.dumps(event) for event in events])
+    except redis.RedisError:
+        logger.warning("order event queue unavailable - applying %d events inline", len(events))
+        _notify(apply_events(db, events))
+        db.commit()
+        return
+    schedule_flush()
+
+
+def schedule_flush():
+    """At most one flush task queued at a time; the periodic flush covers a lost one"""
+    from tasks.celery_app import celery_app
+    from tasks.tasks import flush_order_events
+
+    eager = celery_app.conf.task_always_eager
+    try:
+        if eager or _client.set(SCHEDULED_KEY, "1", ex=LOCK_TIMEOUT, nx=True):
+            flush_order_events.apply_async(retry=False)
+    except Exception:
+        # The order is already committed - never fail the request over this
+        logger.exception("could not schedule order event flush")
+
+
+# Consumer side - the Celery worker
+
+def apply_events(db: Session, events: list) -> list:
+    """
+    Write the side effects of events not seen before and return those events.
+
+    Event keys go into processed_events in the same transaction as the
+    effects, so a redelivered event is skipped and the counters are bumped
+    exactly once. The caller commits.
+    """
+    if not events:
+        return []
+    events = list({event["key"]: event for event in events}.values())
+    now = datetime.datetime.utcnow()
+    if db.bind.dialect.name == "postgresql":
+        statement = postgresql.insert(ProcessedEvent).on_conflict_do_nothing()
+    else:
+        statement = sqlite.insert(ProcessedEvent).on_conflict_do_nothing()
+    fresh_keys = set(db.scalars(
+        statement.returning(ProcessedEvent.key),
+        [{"key": event["key"], "processed_at": now} for event in events],
+    ))
+    fresh = [event for event in events if event["key"] in fresh_keys]
+    if not fresh:
+        return []
+
+    db.execute(insert(InventoryHistory), [
+        {
+            "product_id": event["product_id"],
+            "old_quantity": event["old_quantity"],
+            "new_quantity": event["new_quantity"],
+            "quantity_change": event["new_quantity"] - event["old_quantity"],
+            "change_reason": "sale",
+            "location": event["location"],
+            "changed_by": "order_system",
+            # When the stock moved, not when the worker got to it
+            "changed_at": datetime.datetime.fromisoformat(event["sold_at"]),
+            "notes": f"Order #{event['order_id']} created",
+        }
+        for event in fresh
+    ])
+
+    # One UPDATE per customer / product, in id order so concurrent flushes can't deadlock.
+    # A counter bump isn't an edit: products.updated_at (in ProductRead, and the typeahead
+    # catch-up watermark) is pinned, or its onupdate would move it on every sale.
+    per_customer = Counter(event["customer_id"] for event in fresh)
+    per_product = Counter(event["product_id"] for event in fresh)
+    for model, counts in ((Customer, per_customer), (Product, per_product)):
+        table = model.__table__
+        pinned = {"updated_at": table.c.updated_at} if "updated_at" in table.c else {}
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("row_id"))
+            .values(order_count=func.coalesce(table.c.order_count, 0) + bindparam("placed"), **pinned),
+            [{"row_id": row_id, "placed": count} for row_id, count in sorted(counts.items())],
+        )
+    mark_stale(db, *[f"customer:{cid}" for cid in per_customer])
+    sales_rollups.add_orders(db, [event["order_id"] for event in fresh])
+    return fresh
+
+
+def _notify(events: list):
+    if not events:
+        return
+    for hook in _hooks:
+        try:
+            hook(events)
+        except Exception:
+            logger.exception("order notification hook %r failed", hook)
+
+
+def flush(db_factory, max_events: int = None) -> dict:
+    """
+    Drain the queue in batches of ORDER_EVENTS_BATCH, one DB transaction each.
+
+    Events are only trimmed off the queue after their batch commits, so a
+    crash mid-batch means a redelivery, which apply_events skips. A Redis
+    lock keeps it to one consumer at a time. Returns what was done.
+    """
+    result = {"events": 0, "applied": 0, "batches": 0}
+    if _client is None:
+        return result
+    token = uuid.uuid4().hex
+    if not _client.set(LOCK_KEY, token, ex=LOCK_TIMEOUT, nx=True):
+        result["skipped"] = "another flush is running"
+        return result
+    try:
+        while max_events is None or result["events"] < max_events:
+            raw = _client.lrange(QUEUE_KEY, 0, ORDER_EVENTS_BATCH - 1)
+            if not raw:
+                break
+            started = time.perf_counter()
+            events = [json.loads(item) for item in raw]
+            db = db_factory()
+            try:
+                applied = apply_events(db, events)
+                db.commit()
+            finally:
+                db.close()
+            _client.ltrim(QUEUE_KEY, len(raw), -1)
+            _client.set(LOCK_KEY, token, ex=LOCK_TIMEOUT)
+            _notify(applied)
+
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+            oldest = min(event["queued_at"] for event in events)
+            _client.hincrby(STATS_KEY, "events", len(events))
+            _client.hincrby(STATS_KEY, "applied", len(applied))
+            _client.hincrby(STATS_KEY, "duplicates", len(events) - len(applied))
+            _client.hincrby(STATS_KEY, "batches", 1)
+            _client.hset(STATS_KEY, mapping={
+                "last_flush_at": time.time(),
+                "last_batch_size": len(events),
+                "last_batch_ms": elapsed_ms,
+                "last_batch_lag_s": round(time.time() - oldest, 3),
+            })
+            result["events"] += len(events)
+            result["applied"] += len(applied)
+            result["batches"] += 1
+    finally:
+        if _decode(_client.get(LOCK_KEY)) == token:
+            _client.delete(LOCK_KEY)
+        _client.delete(SCHEDULED_KEY)
+    return result
+
+
+def prune_processed(db: Session) -> int:
+    """Drop idempotency keys older than the retention window"""
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=PROCESSED_EVENTS_RETENTION_DAYS)
+    deleted = db.query(ProcessedEvent).filter(ProcessedEvent.processed_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def backlog() -> dict:
+    """Queue depth, lag of the oldest waiting event and consumer counters"""
+    metrics = {"mode": "deferred" if deferred() else "inline"}
+    if _client is None:
+        return metrics
+    try:
+        head = _client.lindex(QUEUE_KEY, 0)
+        metrics["backlog"] = _client.llen(QUEUE_KEY)
+        metrics["lag_s"] = round(time.time() - json.loads(head)["queued_at"], 3) if head else 0.0
+        metrics["flush_running"] = _client.get(LOCK_KEY) is not None
+        stats = {_decode(field): _decode(value) for field, value in _client.hgetall(STATS_KEY).items()}
+    except redis.RedisError as exc:
+        metrics["error"] = str(exc)
+        return metrics
+    for field in ("events", "applied", "duplicates", "batches", "last_batch_size"):
+        metrics[field] = int(stats.get(field, 0))
+    for field in ("last_flush_at", "last_batch_ms", "last_batch_lag_s"):
+        metrics[field] = float(stats[field]) if field in stats else None
+    return metrics
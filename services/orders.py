@@ -0,0 +1,229 @@
+# services/orders.py
+import datetime
+from fastapi import HTTPException
+from sqlalchemy import bindparam, exists, insert, select, text, update
+from sqlalchemy.orm import Session
+
+from common.cache import mark_stale
+from models.db_models import Customer, Inventory, Order, Product
+from services import order_events
+from services.order_events import order_event
+
+# Upper bound on items per POST /orders/batch request
+MAX_BATCH_SIZE = 5000
+
+# Postgres: decrement stock and insert the order in ONE statement. The insert
+# hangs off the `stock` CTE, so if the conditional UPDATE matches nothing (no
+# stock / unknown customer) nothing is written. The history row and counters
+# are written by services/order_events.py.
+PLACE_ORDER_SQL = text("""
+WITH stock AS (
+    UPDATE inventory
+       SET quantity = quantity - 1, updated_at = :now
+     WHERE id = (SELECT id FROM inventory
+                  WHERE product_id = :product_id AND quantity >= 1
+                  ORDER BY id LIMIT 1)
+       AND quantity >= 1
+       AND EXISTS (SELECT 1 FROM customers WHERE id = :customer_id)
+ RETURNING product_id, quantity, location
+),
+new_order AS (
+    INSERT INTO orders (customer_id, product_id, product_name, sale_price, status, sold_at)
+    SELECT :customer_id, p.id, p.name, COALESCE(:sale_price, p.price), 'pending', :now
+      FROM stock JOIN products p ON p.id = stock.product_id
+ RETURNING id, customer_id, product_id, product_name, sale_price, status, sold_at
+)
+SELECT new_order.*, stock.quantity AS new_quantity, stock.location
+  FROM new_order, stock
+""")
+
+def place_order(db: Session, customer_id: int, product_id: int, sale_price: float = None) -> dict:
+    """
+    Take one unit of stock and create the order atomically.
+
+    The stock decrement is a conditional UPDATE (quantity >= 1) rather than a
+    read-modify-write, so concurrent buyers can never oversell the last unit.
+    Returns the new order row as a dict; raises 404/400 like the old path did.
+    """
+    if db.bind.dialect.name == "postgresql":
+        order = db.execute(PLACE_ORDER_SQL, {
+            "customer_id": customer_id,
+            "product_id": product_id,
+            "sale_price": sale_price or None,
+            "now": datetime.datetime.utcnow(),
+        }).mappings().first()
+    else:
+        order = _place_order_portable(db, customer_id, product_id, sale_price)
+
+    if order is None:
+        db.rollback()
+        _raise_placement_error(db, customer_id, product_id)
+
+    order = dict(order)
+    new_quantity, location = order.pop("new_quantity"), order.pop("location")
+    events = [order_event(order, new_quantity + 1, new_quantity, location)]
+    order_events.record(db, events)
+    mark_stale(db, f"inventory:{product_id}")
+    db.commit()
+    # History row, order counts and notifications - queued for the worker
+    order_events.publish(db, events)
+    return order
+
+
+def _place_order_portable(db: Session, customer_id: int, product_id: int, sale_price: float):
+    """Same steps as PLACE_ORDER_SQL as separate statements in one transaction (SQLite etc.)"""
+    target = (
+        select(Inventory.id)
+        .where(Inventory.product_id == product_id, Inventory.quantity >= 1)
+        .order_by(Inventory.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    stock = db.execute(
+        update(Inventory)
+        .where(Inventory.id == target, Inventory.quantity >= 1, exists().where(Customer.id == customer_id))
+        .values(quantity=Inventory.quantity - 1)
+        .returning(Inventory.quantity, Inventory.location),
+        execution_options={"synchronize_session": False},
+    ).first()
+    if stock is None:
+        return None
+
+    product = db.execute(select(Product.name, Product.price).where(Product.id == product_id)).one()
+    order = db.execute(
+        insert(Order)
+        .values(
+            customer_id=customer_id,
+            product_id=product_id,
+            product_name=product.name,
+            sale_price=sale_price if sale_price else product.price,
+            status="pending",
+        )
+        .returning(Order.id, Order.customer_id, Order.product_id, Order.product_name,
+                   Order.sale_price, Order.status, Order.sold_at)
+    ).mappings().one()
+
+    return {**order, "new_quantity": stock.quantity, "location": stock.location}
+
+
+def _raise_placement_error(db: Session, customer_id: int, product_id: int):
+    """Only runs on the failure path - works out why nothing was written"""
+    if not db.query(exists().where(Customer.id == customer_id)).scalar():
+        raise HTTPException(404, "Customer not found")
+    if not db.query(exists().where(Product.id == product_id)).scalar():
+        raise HTTPException(404, "Product not found")
+    raise HTTPException(400, "Product out of stock")
+
+
+def place_orders_batch(db: Session, items: list) -> list:
+    """
+    Place many orders in one transaction with a fixed number of statements.
+
+    Ids are validated with one IN query per table, the affected inventory rows
+    are locked in product_id order (so concurrent batches can't deadlock), and
+    orders are written with executemany. Items that
+    fail validation or run out of stock are reported and skipped - the rest
+    still go through. Returns one result dict per item, in request order.
+    """
+    customer_ids = {item.customer_id for item in items}
+    product_ids = {item.product_id for item in items}
+
+    if db.bind.dialect.name != "postgresql":
+        # No FOR UPDATE here (SQLite) - a no-op write takes the database's write
+        # lock before anything is read, so concurrent batches can't both see the
+        # same stock
+        inventory = Inventory.__table__
+        db.execute(
+            update(inventory)
+            .where(inventory.c.product_id.in_(product_ids))
+            .values(quantity=inventory.c.quantity, updated_at=inventory.c.updated_at)
+        )
+
+    known_customers = set(db.scalars(select(Customer.id).where(Customer.id.in_(customer_ids))))
+    products = {
+        row.id: row
+        for row in db.execute(select(Product.id, Product.name, Product.price).where(Product.id.in_(product_ids)))
+    }
+
+    # Every inventory row per product in id order - each unit comes from the first
+    # row that still has stock, same as the single-order path
+    stock = {}
+    locked = db.scalars(
+        select(Inventory)
+        .where(Inventory.product_id.in_(product_ids))
+        .order_by(Inventory.product_id, Inventory.id)
+        .with_for_update()
+    )
+    for inventory in locked:
+        stock.setdefault(inventory.product_id, []).append({
+            "id": inventory.id,
+            "quantity": inventory.quantity,
+            "original": inventory.quantity,
+            "location": inventory.location,
+        })
+
+    results = []
+    new_orders = []
+    stock_moves = []
+    for index, item in enumerate(items):
+        product = products.get(item.product_id)
+        inventory = next((row for row in stock.get(item.product_id, []) if row["quantity"] >= 1), None)
+        if item.customer_id not in known_customers:
+            error = "Customer not found"
+        elif product is None:
+            error = "Product not found"
+        elif inventory is None:
+            error = "Product out of stock"
+        else:
+            error = None
+
+        if error:
+            results.append({"index": index, "status": "failed", "order": None, "error": error})
+            continue
+
+        inventory["quantity"] -= 1
+        new_orders.append({
+            "customer_id": item.customer_id,
+            "product_id": item.product_id,
+            "product_name": product.name,
+            "sale_price": item.sale_price if item.sale_price else product.price,
+            "status": "pending",
+        })
+        stock_moves.append((inventory["quantity"] + 1, inventory["quantity"], inventory["location"]))
+        results.append({"index": index, "status": "created", "order": None, "error": None})
+
+    if not new_orders:
+        db.rollback()
+        return results
+
+    created = db.execute(
+        insert(Order).returning(
+            Order.id, Order.customer_id, Order.product_id, Order.product_name,
+            Order.sale_price, Order.status, Order.sold_at,
+            sort_by_parameter_order=True,
+        ),
+        new_orders,
+    ).mappings().all()
+
+    created_iter = iter(created)
+    for result in results:
+        if result["status"] == "created":
+            result["order"] = dict(next(created_iter))
+    events = [order_event(order, *move) for order, move in zip(created, stock_moves)]
+
+    touched = {
+        product_id: [row for row in rows if row["quantity"] != row["original"]]
+        for product_id, rows in stock.items()
+    }
+    db.execute(
+        update(Inventory.__table__)
+        .where(Inventory.__table__.c.id == bindparam("inventory_id"))
+        .values(quantity=bindparam("new_quantity")),
+        [{"inventory_id": row["id"], "new_quantity": row["quantity"]} for rows in touched.values() for row in rows],
+    )
+
+    order_events.record(db, events)
+    mark_stale(db, *[f"inventory:{pid}" for pid, rows in touched.items() if rows])
+    db.commit()
+    order_events.publish(db, events)
+    return results
@@ -0,0 +1,198 @@
+# services/passwords.py
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# scrypt cost - each hash takes about PASSWORD_SCRYPT_N * PASSWORD_SCRYPT_R * 128
+# bytes of memory (16 MiB by default) and tens of milliseconds of CPU. Hashes
+# made with other settings still verify and are upgraded on the next login.
+PASSWORD_SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", str(2 ** 14)))
+PASSWORD_SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+PASSWORD_SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+# Hashing threads per process - OpenSSL's scrypt releases the GIL, so they use
+# that many cores while request threads and the event loop keep running
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+# Hashes that may wait for a thread - any more are turned away with a 503
+# instead of piling up behind a slow KDF
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", str(4 * PASSWORD_HASH_WORKERS)))
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+SCHEME = "scrypt"
+# hash_password of the old users router: unsalted hex SHA-256
+_LEGACY_LENGTH = 64
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r * p, dklen=KEY_BYTES)
+
+
+def _encode(password: str, n: int = None, r: int = None, p: int = None) -> str:
+    """scrypt$n$r$p$salt$key, salt and key in unpadded base64"""
+    n, r, p = n or PASSWORD_SCRYPT_N, r or PASSWORD_SCRYPT_R, p or PASSWORD_SCRYPT_P
+    salt = os.urandom(SALT_BYTES)
+    key = _scrypt(password, salt, n, r, p)
+    return "$".join([SCHEME, str(n), str(r), str(p), _b64(salt), _b64(key)])
+
+
+def _b64(value: bytes) -> str:
+    return base64.b64encode(value).decode().rstrip("=")
+
+
+def _unb64(value: str) -> bytes:
+    return base64.b64decode(value + "=" * (-len(value) % 4))
+
+
+def is_legacy(stored: str) -> bool:
+    return len(stored) == _LEGACY_LENGTH and all(c in "0123456789abcdef" for c in stored)
+
+
+def needs_rehash(stored: str) -> bool:
+    """Legacy SHA-256, or scrypt with other settings than the current ones"""
+    if is_legacy(stored):
+        return True
+    parts = stored.split("$")
+    return len(parts) == 6 and parts[:4] != [SCHEME, str(PASSWORD_SCRYPT_N), str(PASSWORD_SCRYPT_R),
+                                            str(PASSWORD_SCRYPT_P)]
+
+
+def _verify(password: str, stored: str) -> tuple:
+    """(matches, new hash to store or None). Unknown formats (e.g. seeded '!seeded') never match."""
+    if is_legacy(stored):
+        matches = hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+    else:
+        parts = stored.split("$")
+        if len(parts) != 6 or parts[0] != SCHEME:
+            return False, None
+        try:
+            n, r, p = (int(part) for part in parts[1:4])
+            salt, key = _unb64(parts[4]), _unb64(parts[5])
+            # Bad parameters (n not a power of 2, r * p too big) are a ValueError from scrypt too
+            computed = _scrypt(password, salt, n, r, p)
+        except ValueError as exc:
+            logger.warning("unusable scrypt hash (%s) - treated as a mismatch", exc)
+            return False, None
+        matches = hmac.compare_digest(computed, key)
+    if matches and needs_rehash(stored):
+        return True, _encode(password)
+    return matches, None
+
+
+class HashPool:
+    """
+    A fixed set of hashing threads with a bounded queue in front. Requests
+    await their hash without holding a threadpool thread or blocking the
+    event loop. When workers + queue hashes are already in flight, submit
+    raises a 503 (Retry-After: 1) so logins shed load instead of queueing
+    for seconds.
+    """
+
+    def __init__(self, workers: int, queue: int):
+        self.workers = workers
+        self.capacity = workers + queue
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.stats = {"hashes": 0, "verifies": 0, "rehashes": 0, "rejected": 0, "wait_ms": 0.0, "hash_ms": 0.0}
+
+    def _reject(self):
+        self.stats["rejected"] += 1
+        raise HTTPException(503, "Password hashing is at capacity, retry shortly", headers={"Retry-After": "1"})
+
+    def check_capacity(self):
+        """503 now if a hash would be turned away - call before doing other work for it"""
+        with self.lock:
+            if self.in_flight >= self.capacity:
+                self._reject()
+
+    def _submit(self, function, *args):
+        with self.lock:
+            if self.in_flight >= self.capacity:
+                self._reject()
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        queued = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                with self.lock:
+                    self.stats["wait_ms"] += (started - queued) * 1000
+                    self.stats["hash_ms"] += (time.perf_counter() - started) * 1000
+
+        future = self.executor.submit(timed)
+        # Counted until the hash finishes, even if the request that wanted it has gone
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self.lock:
+            self.in_flight -= 1
+
+    def _count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    async def hash(self, password: str) -> str:
+        future = self._submit(_encode, password)
+        self._count("hashes")
+        return await asyncio.wrap_future(future)
+
+    async def verify(self, password: str, stored: str) -> tuple:
+        """(matches, new hash to store or None) - see _verify"""
+        future = self._submit(_verify, password, stored)
+        self._count("verifies")
+        matches, new_hash = await asyncio.wrap_future(future)
+        if new_hash:
+            self._count("rehashes")
+        return matches, new_hash
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+            in_flight, max_in_flight = self.in_flight, self.max_in_flight
+        done = stats["hashes"] + stats["verifies"]
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": in_flight,
+            "queued": max(in_flight - self.workers, 0),
+            "max_in_flight": max_in_flight,
+            **{name: stats[name] for name in ("hashes", "verifies", "rehashes", "rejected")},
+            "avg_wait_ms": round(stats["wait_ms"] / done, 3) if done else 0.0,
+            "avg_hash_ms": round(stats["hash_ms"] / done, 3) if done else 0.0,
+            "scrypt": {"n": PASSWORD_SCRYPT_N, "r": PASSWORD_SCRYPT_R, "p": PASSWORD_SCRYPT_P},
+        }
+
+
+pool = HashPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE)
+
+# Unknown usernames are checked against this, so a login costs the same
+# whether or not the user exists
+_DUMMY_HASH = _encode("not a password")
+
+
+async def hash_password(password: str) -> str:
+    return await pool.hash(password)
+
+
+async def verify_password(password: str, stored: str = None) -> tuple:
+    """(matches, new hash or None). stored=None (no such user) still costs a hash, and never matches."""
+    matches, new_hash = await pool.verify(password, stored or _DUMMY_HASH)
+    if stored is None:
+        return False, None
+    return matches, new_hash
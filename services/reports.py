@@ -0,0 +1,414 @@
+# services/reports.py
+import datetime
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from common.cache import REDIS_URL, InMemoryRedis, data_version, make_redis_client
+from common.db import SessionLocal
+from common.export import EXPORT_BATCH_SIZE, jsonable
+from models.db_models import Base, Report
+
+logger = logging.getLogger(__name__)
+
+# Statement timeout for reports that don't set their own, and the ceiling for those that do
+REPORT_TIMEOUT_MS = int(os.getenv("REPORT_TIMEOUT_MS", "30000"))
+REPORT_MAX_TIMEOUT_MS = int(os.getenv("REPORT_MAX_TIMEOUT_MS", "300000"))
+# Bigger results are streamed but never cached
+REPORT_CACHE_MAX_ROWS = int(os.getenv("REPORT_CACHE_MAX_ROWS", "50000"))
+# How long a result is kept - it is served (stale) while a refresh runs until then
+REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", "86400"))
+
+# Query string names the run endpoint keeps for itself
+RESERVED_PARAMS = ("format", "refresh")
+
+# What a report may read: the business tables, minus secrets. Bookkeeping
+# (reports, audit_logs, ingestion_jobs, processed_events, account_balance_snapshots)
+# is left out. Postgres enforces this through REPORT_DB_ROLE, whose grants
+# (migration 0014) must be kept in step; SQLite through an authorizer.
+REPORT_TABLES = (
+    "customers", "orders", "products", "inventory", "inventory_history", "locations",
+    "users", "roles", "user_roles", "departments", "employees",
+    "accounts", "transactions", "transaction_lines", "invoices",
+    "vendors", "purchase_orders", "purchase_order_lines",
+    "contacts", "leads", "opportunities", "tickets", "ticket_comments",
+    "sales_rollups", "demand_forecasts",
+)
+REPORT_HIDDEN_COLUMNS = {"users": ("password_hash",)}
+# Postgres role reports run as (SET LOCAL ROLE) - empty to run as the app's own user
+REPORT_DB_ROLE = os.getenv("REPORT_DB_ROLE", "report_reader")
+
+_client = make_redis_client(REDIS_URL) or InMemoryRedis()
+# Background refreshes when Celery runs eagerly (no worker to hand them to)
+_refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="report-refresh")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_SELECT = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+_CATALOGS = re.compile(r"\b(pg_\w+|information_schema|sqlite_\w+)\b", re.IGNORECASE)
+_SQLITE_ALLOWED = (sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE)
+
+
+# Definitions
+
+def validate_query(query: str):
+    """Cheap up-front check - the database enforces read-only and REPORT_TABLES again at run time"""
+    body = _STRING.sub("''", query).strip().rstrip(";")
+    if not _SELECT.match(body) or ";" in body:
+        raise HTTPException(400, "Report query must be a single SELECT (or WITH ... SELECT) statement")
+    internal = sorted(table for table in Base.metadata.tables
+                      if table not in REPORT_TABLES and re.search(rf"\b{table}\b", body, re.IGNORECASE))
+    hidden = sorted({column for columns in REPORT_HIDDEN_COLUMNS.values() for column in columns
+                     if re.search(rf"\b{column}\b", body, re.IGNORECASE)})
+    catalogs = _CATALOGS.findall(body)
+    if internal or hidden or catalogs:
+        raise HTTPException(400, f"Reports can't read {internal + hidden + catalogs} - see REPORT_TABLES")
+
+
+def param_names(query: str) -> list:
+    return list(text(query).compile().params)
+
+
+def tables_read(query: str) -> list:
+    """Tables a query mentions - their data versions key its cached results"""
+    return sorted(table for table in Base.metadata.tables if re.search(rf"\b{table}\b", query, re.IGNORECASE))
+
+
+def bind_params(query: str, raw: dict) -> dict:
+    """
+    Match query string values to the query's :name parameters. Values that
+    parse as JSON numbers/booleans/null are passed as such, anything else as text.
+    """
+    names = param_names(query)
+    missing = [name for name in names if name not in raw]
+    unknown = [name for name in raw if name not in names]
+    if missing:
+        raise HTTPException(400, f"Missing report parameters: {missing}")
+    if unknown:
+        raise HTTPException(400, f"Unknown report parameters: {unknown} - this report takes {names}")
+    return {name: _coerce(value) for name, value in raw.items()}
+
+
+def _coerce(value):
+    if not isinstance(value, str):
+        return value
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        return value
+    return parsed if parsed is None or isinstance(parsed, (bool, int, float)) else value
+
+
+def _spec(report: Report) -> dict:
+    """What a run needs, detached from the session that loaded it"""
+    timeout = min(report.timeout_ms or REPORT_TIMEOUT_MS, REPORT_MAX_TIMEOUT_MS)
+    return {"id": report.id, "query": report.query, "timeout_ms": timeout}
+
+
+def describe(report: Report) -> dict:
+    fields = {column.name: getattr(report, column.name) for column in Report.__table__.columns}
+    return {**fields, "params": param_names(report.query or "")}
+
+
+def create_report(db: Session, payload) -> Report:
+    validate_query(payload.query)
+    if payload.timeout_ms is not None and not 0 < payload.timeout_ms <= REPORT_MAX_TIMEOUT_MS:
+        raise HTTPException(400, f"timeout_ms must be between 1 and {REPORT_MAX_TIMEOUT_MS}")
+    report = Report(**payload.model_dump())
+    db.add(report)
+    db.commit()
+    db.refresh(report)
+    return report
+
+
+def load_report(db: Session, report_id: int) -> Report:
+    report = db.query(Report).get(report_id)
+    if not report:
+        raise HTTPException(404, "Report not found")
+    return report
+
+
+# Execution - read-only transaction, statement timeout, server-side cursor
+
+def _begin(db: Session, timeout_ms: int):
+    connection = db.connection()
+    if db.bind.dialect.name == "postgresql":
+        db.execute(text("SET TRANSACTION READ ONLY"))
+        db.execute(text("SELECT set_config('statement_timeout', :timeout, true)"), {"timeout": str(timeout_ms)})
+        if REPORT_DB_ROLE:
+            db.execute(text("SELECT set_config('role', :role, true)"), {"role": REPORT_DB_ROLE})
+        return
+    # SQLite: refuse writes on this connection, allow reads of REPORT_TABLES
+    # only and abort the VM past the deadline
+    raw = db.info["report_connection"] = connection.connection.driver_connection
+    deadline = time.monotonic() + timeout_ms / 1000
+    raw.execute("PRAGMA query_only = ON")
+    raw.set_authorizer(_authorize)
+    raw.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+
+
+def _authorize(action, table, column, database, trigger):
+    if action not in _SQLITE_ALLOWED:
+        return sqlite3.SQLITE_DENY
+    if action == sqlite3.SQLITE_READ and (
+            table not in REPORT_TABLES or column in REPORT_HIDDEN_COLUMNS.get(table, ())):
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+
+def _end(db: Session):
+    try:
+        raw = db.info.pop("report_connection", None)
+        if raw is not None:
+            # Undo before the connection goes back to the pool
+            raw.set_progress_handler(None, 0)
+            raw.set_authorizer(None)
+            raw.execute("PRAGMA query_only = OFF")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def _as_http_error(exc: DBAPIError, spec: dict) -> HTTPException:
+    code = getattr(exc.orig, "pgcode", None)
+    message = str(exc.orig)
+    if code == "57014" or "interrupted" in message:
+        return HTTPException(504, f"Report timed out after {spec['timeout_ms']} ms")
+    if code == "25006" or "readonly database" in message:
+        return HTTPException(400, "Report queries must be read-only")
+    if code == "42501" or "prohibited" in message or "not authorized" in message:
+        return HTTPException(400, f"Reports can only read report tables: {message.splitlines()[0]}")
+    return HTTPException(400, f"Report query failed: {message.splitlines()[0]}")
+
+
+def execute(spec: dict, params: dict):
+    """
+    Start the report's query and return (column names, batches of rows).
+    The first batch is fetched here, so most failures - bad SQL, a write,
+    a timeout - surface as an HTTP error before any output is sent.
+    """
+    db = SessionLocal()
+    try:
+        _begin(db, spec["timeout_ms"])
+        result = db.execute(
+            text(spec["query"]).execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE),
+            params,
+        )
+        columns = list(result.keys())
+        partitions = result.partitions()
+        first = next(partitions, [])
+    except DBAPIError as exc:
+        _end(db)
+        error = _as_http_error(exc, spec)
+        _record(spec["id"], errors=1, timeouts=int(error.status_code == 504))
+        raise error from None
+    except Exception:
+        _end(db)
+        raise
+
+    def batches():
+        try:
+            yield first
+            yield from partitions
+        finally:
+            _end(db)
+
+    return columns, batches()
+
+
+# Result cache - one entry per report + definition + parameters, stamped with
+# the data versions of the tables it read. A version mismatch means stale.
+
+def _cache_key(spec: dict, params: dict) -> str:
+    digest = hashlib.sha1(json.dumps([spec["query"], params], sort_keys=True, default=str).encode()).hexdigest()
+    return f"report_result:{spec['id']}:{digest[:20]}"
+
+
+def _load_entry(key: str):
+    try:
+        raw = _client.get(key)
+    except redis.RedisError:
+        return None
+    return json.loads(raw) if raw is not None else None
+
+
+def _store_entry(key: str, version: dict, columns: list, rows: list, elapsed_ms: float):
+    entry = {
+        "version": version,
+        "computed_at": datetime.datetime.utcnow().isoformat(),
+        "ms": round(elapsed_ms, 1),
+        "columns": columns,
+        "rows": rows,
+    }
+    try:
+        _client.set(key, json.dumps(entry), ex=REPORT_CACHE_TTL)
+    except redis.RedisError:
+        logger.warning("could not cache report result %s", key)
+
+
+def _cached_batches(rows: list):
+    for start in range(0, len(rows), EXPORT_BATCH_SIZE):
+        yield rows[start:start + EXPORT_BATCH_SIZE]
+
+
+def _run_live(spec: dict, params: dict, key: str, version: dict):
+    """Stream a fresh run, keeping a copy of the rows to cache if it finishes and fits"""
+    started = time.perf_counter()
+    columns, partitions = execute(spec, params)
+
+    def batches():
+        kept = [] if version is not None else None
+        count = 0
+        try:
+            for partition in partitions:
+                count += len(partition)
+                if kept is not None:
+                    if count <= REPORT_CACHE_MAX_ROWS:
+                        kept.extend([jsonable(value) for value in row] for row in partition)
+                    else:
+                        kept = None
+                yield partition
+        except DBAPIError as exc:
+            # Output has started - all that's left is to cut the stream short
+            _record(spec["id"], errors=1, timeouts=int(_as_http_error(exc, spec).status_code == 504))
+            logger.error("report %s failed mid-stream: %s", spec["id"], exc.orig)
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        _record(spec["id"], runs=1, rows=count, elapsed_ms=elapsed_ms)
+        if kept is not None:
+            _store_entry(key, version, columns, kept, elapsed_ms)
+
+    return columns, batches()
+
+
+def run(report_id: int, raw_params: dict, refresh: bool = False) -> dict:
+    """
+    Serve a report: a cached result at the current data version, a stale
+    one while a background refresh runs, or a live streamed run on a cold
+    cache (or with refresh=True). Returns columns, row batches and cache info.
+    """
+    db = SessionLocal()
+    try:
+        spec = _spec(load_report(db, report_id))
+    finally:
+        db.close()
+    params = bind_params(spec["query"], raw_params)
+    key = _cache_key(spec, params)
+    # Read before running, so a write that lands mid-run leaves the entry stale
+    version = data_version(tables_read(spec["query"]))
+
+    entry = None if refresh or version is None else _load_entry(key)
+    if entry is not None:
+        fresh = entry["version"] == version
+        _record(spec["id"], **{"cache_hits" if fresh else "stale_hits": 1})
+        if not fresh:
+            schedule_refresh(spec["id"], params, key)
+        return {
+            "cache": "hit" if fresh else "stale",
+            "computed_at": entry["computed_at"],
+            "columns": entry["columns"],
+            "batches": _cached_batches(entry["rows"]),
+        }
+
+    columns, batches = _run_live(spec, params, key, version)
+    return {"cache": "miss", "computed_at": None, "columns": columns, "batches": batches}
+
+
+def schedule_refresh(report_id: int, params: dict, key: str):
+    """At most one refresh per cached entry in flight"""
+    from tasks.celery_app import celery_app
+    from tasks.tasks import refresh_report
+
+    try:
+        if not _client.set(f"report_refresh:{key}", "1", ex=REPORT_MAX_TIMEOUT_MS // 1000, nx=True):
+            return
+        if celery_app.conf.task_always_eager:
+            _refresher.submit(refresh_result, report_id, params)
+        else:
+            refresh_report.apply_async(args=[report_id, params], retry=False)
+    except Exception:
+        # The stale result is still served - never fail the request over this
+        logger.exception("could not schedule refresh of report %s", report_id)
+
+
+def refresh_result(report_id: int, params: dict) -> dict:
+    """Run a report to completion and cache the result (the background half of run)"""
+    db = SessionLocal()
+    try:
+        spec = _spec(load_report(db, report_id))
+    finally:
+        db.close()
+    key = _cache_key(spec, params)
+    try:
+        version = data_version(tables_read(spec["query"]))
+        columns, batches = _run_live(spec, params, key, version)
+        rows = sum(len(batch) for batch in batches)
+        _record(spec["id"], refreshes=1)
+        return {"report_id": report_id, "rows": rows}
+    finally:
+        _client.delete(f"report_refresh:{key}")
+
+
+# Runtime statistics - a Redis hash per report
+
+def _stats_key(report_id: int) -> str:
+    return f"report_stats:{report_id}"
+
+
+def _record(report_id: int, rows: int = None, elapsed_ms: float = None, **counters):
+    key = _stats_key(report_id)
+    try:
+        for field, amount in counters.items():
+            if amount:
+                _client.hincrby(key, field, amount)
+        if elapsed_ms is None:
+            return
+        elapsed_ms = int(round(elapsed_ms))
+        _client.hincrby(key, "total_ms", elapsed_ms)
+        _client.hincrby(key, "total_rows", rows)
+        (max_ms, max_rows) = _client.hmget(key, ["max_ms", "max_rows"])
+        _client.hset(key, mapping={
+            "last_ms": elapsed_ms,
+            "last_rows": rows,
+            "last_run_at": time.time(),
+            "max_ms": max(elapsed_ms, int(max_ms or 0)),
+            "max_rows": max(rows, int(max_rows or 0)),
+        })
+    except redis.RedisError:
+        logger.warning("could not record stats for report %s", report_id)
+
+
+_COUNTERS = ("runs", "cache_hits", "stale_hits", "refreshes", "errors", "timeouts",
+             "total_ms", "total_rows", "max_ms", "max_rows", "last_ms", "last_rows")
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def report_stats(db: Session, order_by: str = "total_ms", limit: int = 50) -> list:
+    """Per-report runtime and row counts, most expensive first"""
+    stats = {}
+    for key in _client.scan_iter(match="report_stats:*"):
+        fields = {_decode(field): _decode(value) for field, value in _client.hgetall(key).items()}
+        entry = {field: int(fields.get(field, 0)) for field in _COUNTERS}
+        entry["avg_ms"] = round(entry["total_ms"] / entry["runs"], 1) if entry["runs"] else None
+        entry["avg_rows"] = round(entry["total_rows"] / entry["runs"], 1) if entry["runs"] else None
+        last_run_at = fields.get("last_run_at")
+        entry["last_run_at"] = datetime.datetime.utcfromtimestamp(float(last_run_at)) if last_run_at else None
+        stats[int(_decode(key).split(":")[1])] = entry
+
+    names = dict(db.query(Report.id, Report.name).filter(Report.id.in_(stats)).all()) if stats else {}
+    rows = [{"report_id": report_id, "name": names.get(report_id), **entry} for report_id, entry in stats.items()]
+    rows.sort(key=lambda row: row[order_by] or 0, reverse=True)
+    return rows[:limit]
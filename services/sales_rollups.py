@@ -0,0 +1,314 @@
+# services/sales_rollups.py
+import datetime
+import math
+from collections import defaultdict
+
+from sqlalchemy import and_, func, literal, literal_column, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models.db_models import Order, SalesRollup
+
+GRAINS = ("hour", "day")
+# dimension -> the orders column it groups by (None = total per status)
+DIMENSIONS = {"all": None, "product": Order.product_id, "customer": Order.customer_id}
+
+_ORDER_COLUMNS = (Order.id, Order.product_id, Order.customer_id, Order.status, Order.sale_price, Order.sold_at)
+
+# Postgres advisory lock: incremental writers share it, a rebuild window takes
+# it exclusively so it never interleaves with a claim or a status move
+_REBUILD_LOCK = 150015
+
+
+def bucket_start(moment: datetime.datetime, grain: str) -> datetime.datetime:
+    if grain == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _deltas(orders, sign: int = 1, status: str = None) -> dict:
+    """(grain, dimension, id, bucket, status) -> [orders, revenue] for a set of order rows"""
+    deltas = defaultdict(lambda: [0, 0.0])
+    for order in orders:
+        for grain in GRAINS:
+            bucket = bucket_start(order.sold_at, grain)
+            for dimension, key in (("all", 0), ("product", order.product_id), ("customer", order.customer_id)):
+                delta = deltas[(grain, dimension, key, bucket, status or order.status)]
+                delta[0] += sign
+                delta[1] += sign * order.sale_price
+    return deltas
+
+
+def _lock(db: Session, exclusive: bool = False):
+    """Held until the transaction ends. Take it before any row lock. SQLite has one writer anyway."""
+    if db.bind.dialect.name == "postgresql":
+        function = "pg_advisory_xact_lock" if exclusive else "pg_advisory_xact_lock_shared"
+        db.execute(text(f"SELECT {function}(:key)"), {"key": _REBUILD_LOCK})
+
+
+def _apply(db: Session, deltas: dict):
+    """Add the deltas with one upsert, keys in primary key order so writers can't deadlock"""
+    rows = [
+        {"grain": grain, "dimension": dimension, "dimension_id": key, "bucket": bucket,
+         "status": status, "order_count": count, "revenue": revenue}
+        for (grain, dimension, key, bucket, status), (count, revenue) in sorted(deltas.items())
+        if count or revenue
+    ]
+    if not rows:
+        return
+    insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    statement = insert(SalesRollup)
+    statement = statement.on_conflict_do_update(
+        index_elements=[column.name for column in SalesRollup.__table__.primary_key],
+        set_={
+            "order_count": SalesRollup.order_count + statement.excluded.order_count,
+            "revenue": SalesRollup.revenue + statement.excluded.revenue,
+        },
+    )
+    db.execute(statement, rows)
+
+
+def _claim(db: Session, condition) -> list:
+    """
+    Flag matching orders as counted and return them. Only orders not yet
+    counted come back, so running this twice (or racing the backfill) can't
+    count an order twice. Rows are locked in id order first on Postgres.
+    """
+    locked = select(Order.id).where(condition, Order.in_rollups.is_(False)).order_by(Order.id).with_for_update()
+    return db.execute(
+        update(Order)
+        .where(Order.id.in_(locked))
+        .values(in_rollups=True)
+        .returning(*_ORDER_COLUMNS),
+        execution_options={"synchronize_session": False},
+    ).all()
+
+
+def add_orders(db: Session, order_ids: list) -> int:
+    """Count new orders in the rollups (called by the order event consumer). The caller commits."""
+    if not order_ids:
+        return 0
+    _lock(db)
+    orders = _claim(db, Order.id.in_(order_ids))
+    _apply(db, _deltas(orders))
+    return len(orders)
+
+
+def change_status(db: Session, order_id: int, status: str):
+    """
+    Set an order's status and move its rollup contribution from the old status
+    to the new one, in the caller's transaction. Returns the old status, or None
+    if the order doesn't exist. The UPDATE only matches if the status and flag
+    are still what was read, so a concurrent change or claim just means a retry.
+    """
+    while True:
+        _lock(db)
+        order = db.execute(select(*_ORDER_COLUMNS, Order.in_rollups).where(Order.id == order_id).with_for_update()).first()
+        if order is None:
+            return None
+        if order.status == status:
+            return order.status
+        changed = db.execute(
+            update(Order)
+            .where(Order.id == order_id, Order.status == order.status, Order.in_rollups == order.in_rollups)
+            .values(status=status),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        if changed:
+            break
+        db.rollback()
+
+    # Not counted yet - the consumer will pick up the new status when it claims the order
+    if order.in_rollups:
+        deltas = _deltas([order], sign=-1)
+        deltas.update(_deltas([order], status=status))
+        _apply(db, deltas)
+    return order.status
+
+
+# Backfill and consistency check - both work in whole-day windows
+
+BACKFILL_WINDOW_DAYS = 7
+CHECK_WINDOW_DAYS = 31
+
+
+def _windows(db: Session, start: datetime.datetime, end: datetime.datetime, days: int) -> list:
+    """[start, end) widened to whole days and split into (from, to) windows"""
+    if start is None or end is None:
+        first, last = db.execute(select(func.min(Order.sold_at), func.max(Order.sold_at))).one()
+        if first is None:
+            return []
+        start = start or first
+        end = end or last + datetime.timedelta(microseconds=1)
+    windows = []
+    window_start = bucket_start(start, "day")
+    while window_start < end:
+        window_end = min(window_start + datetime.timedelta(days=days), bucket_start(end, "day") + datetime.timedelta(days=1))
+        windows.append((window_start, window_end))
+        window_start = window_end
+    return windows
+
+
+def backfill(db: Session, start: datetime.datetime = None, end: datetime.datetime = None,
+             rebuild: bool = False, log=None) -> dict:
+    """
+    Count every order sold in [start, end) (default: all orders) that isn't in
+    the rollups yet. With rebuild, each day's rollup rows are dropped and
+    recounted from scratch first. One transaction per BACKFILL_WINDOW_DAYS.
+    """
+    result = {"days": 0, "orders": 0}
+    for day, next_day in _windows(db, start, end, BACKFILL_WINDOW_DAYS):
+        in_window = and_(Order.sold_at >= day, Order.sold_at < next_day)
+        _lock(db, exclusive=rebuild)
+        if rebuild:
+            db.execute(
+                update(Order).where(in_window, Order.in_rollups.is_(True)).values(in_rollups=False),
+                execution_options={"synchronize_session": False},
+            )
+            db.query(SalesRollup).filter(SalesRollup.bucket >= day, SalesRollup.bucket < next_day).delete(
+                synchronize_session=False
+            )
+        orders = _claim(db, in_window)
+        _apply(db, _deltas(orders))
+        db.commit()
+        result["days"] += (next_day - day).days
+        result["orders"] += len(orders)
+        if log and orders:
+            log(f"{day.date()}: {len(orders)} orders")
+    return result
+
+
+def _bucket_sql(db: Session, grain: str):
+    if db.bind.dialect.name == "postgresql":
+        # Inlined, not bound - the GROUP BY has to repeat the exact expression
+        return func.date_trunc(literal_column(f"'{grain}'"), Order.sold_at)
+    return func.strftime("%Y-%m-%d %H:00:00.000000" if grain == "hour" else "%Y-%m-%d 00:00:00.000000", Order.sold_at)
+
+
+def _as_datetime(value):
+    return datetime.datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def check(db: Session, start: datetime.datetime = None, end: datetime.datetime = None, max_samples: int = 20) -> dict:
+    """
+    Recompute every rollup row in [start, end) straight from orders with
+    GROUP BY and compare. Orders not counted yet (still queued) are reported
+    separately rather than as mismatches. Each window is read in one snapshot.
+    """
+    result = {"days": 0, "rows_checked": 0, "mismatches": 0, "uncounted_orders": 0, "samples": []}
+    windows = _windows(db, start, end, CHECK_WINDOW_DAYS)
+    db.rollback()
+    for window_start, window_end in windows:
+        if db.bind.dialect.name == "postgresql":
+            db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        in_window = and_(Order.sold_at >= window_start, Order.sold_at < window_end)
+
+        expected = {}
+        for grain in GRAINS:
+            bucket = _bucket_sql(db, grain)
+            for dimension, column in DIMENSIONS.items():
+                grouping = [bucket, Order.status] + ([column] if column is not None else [])
+                query = (
+                    select(bucket, column if column is not None else literal(0), Order.status,
+                           func.count(), func.sum(Order.sale_price))
+                    .where(in_window, Order.in_rollups.is_(True))
+                    .group_by(*grouping)
+                )
+                for row_bucket, row_key, status, count, revenue in db.execute(query):
+                    expected[(grain, dimension, row_key, _as_datetime(row_bucket), status)] = (count, revenue or 0.0)
+
+        actual = {
+            (row.grain, row.dimension, row.dimension_id, row.bucket, row.status): (row.order_count, row.revenue)
+            for row in db.query(SalesRollup).filter(SalesRollup.bucket >= window_start, SalesRollup.bucket < window_end)
+        }
+        result["uncounted_orders"] += db.query(func.count(Order.id)).filter(in_window, Order.in_rollups.is_(False)).scalar()
+        db.rollback()
+
+        for key in expected.keys() | actual.keys():
+            want = expected.get(key, (0, 0.0))
+            have = actual.get(key, (0, 0.0))
+            result["rows_checked"] += 1
+            # Revenue is a float sum built up in a different order - allow rounding noise
+            if want[0] != have[0] or not math.isclose(want[1], have[1], rel_tol=1e-9, abs_tol=0.005):
+                result["mismatches"] += 1
+                if len(result["samples"]) < max_samples:
+                    grain, dimension, dimension_id, bucket, status = key
+                    result["samples"].append({
+                        "grain": grain, "dimension": dimension, "dimension_id": dimension_id,
+                        "bucket": bucket, "status": status,
+                        "expected": {"order_count": want[0], "revenue": want[1]},
+                        "actual": {"order_count": have[0], "revenue": have[1]},
+                    })
+        result["days"] += (window_end - window_start).days
+    result["ok"] = result["mismatches"] == 0
+    return result
+
+
+# Reads - /reports/sales
+
+def sales_report(db: Session, grain: str, start: datetime.datetime, end: datetime.datetime,
+                 by: str = "all", dimension_id: int = None, status: str = None, limit: int = 10) -> dict:
+    """Series of per-bucket totals, zero-filled. by=product/customer without an id = top `limit` by revenue."""
+    start = bucket_start(start, grain)
+    window = [SalesRollup.grain == grain, SalesRollup.bucket >= start, SalesRollup.bucket < end]
+    if status:
+        window.append(SalesRollup.status == status)
+
+    if by == "status":
+        dimension, series_key = "all", SalesRollup.status
+    else:
+        dimension, series_key = by, SalesRollup.dimension_id
+    window.append(SalesRollup.dimension == dimension)
+
+    if by in ("product", "customer"):
+        if dimension_id is not None:
+            keys = [dimension_id]
+        else:
+            keys = list(db.scalars(
+                select(SalesRollup.dimension_id)
+                .where(*window)
+                .group_by(SalesRollup.dimension_id)
+                .order_by(func.sum(SalesRollup.revenue).desc(), SalesRollup.dimension_id)
+                .limit(limit)
+            ))
+        window.append(SalesRollup.dimension_id.in_(keys))
+
+    totals = defaultdict(lambda: [0, 0.0])
+    for key, bucket, count, revenue in db.execute(
+        select(series_key, SalesRollup.bucket, func.sum(SalesRollup.order_count), func.sum(SalesRollup.revenue))
+        .where(*window)
+        .group_by(series_key, SalesRollup.bucket)
+    ):
+        totals[(key, bucket)][0] += count
+        totals[(key, bucket)][1] += revenue
+
+    if by in ("product", "customer"):
+        series_keys = keys
+    elif by == "status":
+        series_keys = sorted({key for key, _ in totals})
+    else:
+        series_keys = [0]
+
+    buckets = []
+    step = datetime.timedelta(hours=1) if grain == "hour" else datetime.timedelta(days=1)
+    bucket = start
+    while bucket < end:
+        buckets.append(bucket)
+        bucket += step
+
+    series = []
+    for key in series_keys:
+        points = [_point(bucket, *totals.get((key, bucket), (0, 0.0))) for bucket in buckets]
+        total = _point(None, sum(p["order_count"] for p in points), sum(p["revenue"] for p in points))
+        del total["bucket"]
+        series.append({"key": None if by == "all" else key, **total, "buckets": points})
+    return {"grain": grain, "by": by, "start": start, "end": end, "status": status, "series": series}
+
+
+def _point(bucket, count, revenue) -> dict:
+    return {
+        "bucket": bucket,
+        "order_count": count,
+        "revenue": round(revenue, 2),
+        "avg_price": round(revenue / count, 2) if count else None,
+    }
@@ -0,0 +1,89 @@
+# services/search.py
+import re
+
+from fastapi import HTTPException
+from sqlalchemy import Float, cast, column, func, literal_column, table, tuple_
+from sqlalchemy.orm import Session
+
+from common.pagination import PageParams, decode_cursor, encode_cursor
+from models.db_models import Product, Ticket
+
+# name: (model, title column, description column) - what migration 0009 indexes.
+# Postgres: a GIN index on _document(); SQLite: the <name>_fts FTS5 table, kept
+# in sync by triggers. Both are maintained by the database on every write.
+SEARCHED = {
+    "tickets": (Ticket, "subject", "description"),
+    "products": (Product, "name", "description"),
+}
+ORDERS = ("rank", "newest")
+MAX_TERMS = 16
+# SQLite bm25 column weights - Postgres ranks an A (title) match 2.5x a B one by default
+TITLE_WEIGHT = 2.5
+DESCRIPTION_WEIGHT = 1.0
+
+_WORD = re.compile(r"\w+")
+
+
+def terms(q: str) -> list:
+    """Words of a search, lowercased - anything else (operators, quotes) is dropped"""
+    words = _WORD.findall(q.lower())[:MAX_TERMS]
+    if not words:
+        raise HTTPException(400, "Search needs at least one word")
+    return words
+
+
+def _document(title: str, description: str):
+    """The tsvector expression - text identical to the indexed one, so the planner uses the GIN index"""
+    return literal_column(
+        f"(setweight(to_tsvector('english', coalesce({title}, '')), 'A') || "
+        f"setweight(to_tsvector('english', coalesce({description}, '')), 'B'))"
+    )
+
+
+def _matches(db: Session, name: str, words: list):
+    """(query of (row, rank) for rows containing every word as a prefix, rank expression)"""
+    model, title, description = SEARCHED[name]
+    if db.bind.dialect.name == "postgresql":
+        document = _document(title, description)
+        tsquery = func.to_tsquery(literal_column("'english'"), " & ".join(f"{word}:*" for word in words))
+        rank = cast(func.ts_rank(document, tsquery), Float)
+        return db.query(model, rank.label("rank")).filter(document.op("@@")(tsquery)), rank
+    fts = table(f"{name}_fts", column("rowid"))
+    rank = cast(-func.bm25(literal_column(fts.name), TITLE_WEIGHT, DESCRIPTION_WEIGHT), Float)
+    query = (
+        db.query(model, rank.label("rank"))
+        .join(fts, fts.c.rowid == model.id)
+        .filter(literal_column(fts.name).op("MATCH")(" ".join(f'"{word}"*' for word in words)))
+    )
+    return query, rank
+
+
+def search(db: Session, name: str, q: str, page: PageParams, order: str = "rank", filters=()) -> dict:
+    """
+    Rows matching every word of q (each as a prefix, stemmed), best match or
+    newest first, with keyset pagination over (rank or created_at, id).
+    Returns a dict matching schema.Page, each item carrying its rank.
+    """
+    if order not in ORDERS:
+        raise HTTPException(400, f"Order must be one of: {list(ORDERS)}")
+    model = SEARCHED[name][0]
+    query, rank = _matches(db, name, terms(q))
+    query = query.filter(*filters)
+
+    total = query.order_by(None).count() if page.include_total else None
+    sort = rank if order == "rank" else model.created_at
+    if page.cursor:
+        sort_value, row_id = decode_cursor(page.cursor, sort)
+        query = query.filter(tuple_(sort, model.id) < tuple_(sort_value, row_id))
+    # Fetch one extra row to know whether there is another page
+    rows = query.order_by(sort.desc(), model.id.desc()).limit(page.limit + 1).all()
+    items = [
+        {**{field.name: getattr(row, field.name) for field in model.__table__.columns}, "rank": value}
+        for row, value in rows[:page.limit]
+    ]
+
+    next_cursor = None
+    if len(rows) > page.limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last["rank" if order == "rank" else "created_at"], last["id"])
+    return {"items": items, "next_cursor": next_cursor, "total": total}
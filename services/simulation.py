@@ -0,0 +1,247 @@
+# services/simulation.py
+import datetime
+import json
+import logging
+import os
+import secrets
+import time
+
+import numpy as np
+import redis
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from common.cache import REDIS_URL, InMemoryRedis, make_redis_client
+from common.db import SessionLocal
+from common.processes import map_chunks
+from models.db_models import Inventory, Product, PurchaseOrder, PurchaseOrderLine
+from services import modeling
+
+logger = logging.getLogger(__name__)
+
+SIM_HORIZON_DAYS = int(os.getenv("SIM_HORIZON_DAYS", "30"))
+SIM_SCENARIOS = int(os.getenv("SIM_SCENARIOS", "1000"))
+MAX_HORIZON_DAYS = 365
+MAX_SCENARIOS = 100000
+# Daily demand is resampled from this many days of order history
+SIM_HISTORY_DAYS = int(os.getenv("SIM_HISTORY_DAYS", "90"))
+# An open purchase order arrives 0..this many days after its expected delivery
+SIM_MAX_DELAY_DAYS = int(os.getenv("SIM_MAX_DELAY_DAYS", "3"))
+# products x scenarios per chunk - bounds memory (a few float arrays of this size)
+SIM_CHUNK_CELLS = int(os.getenv("SIM_CHUNK_CELLS", "2000000"))
+# Products per chunk whatever the scenario count - each chunk's loads are IN lists of its ids
+SIM_CHUNK_PRODUCTS = int(os.getenv("SIM_CHUNK_PRODUCTS", "5000"))
+# Products per synchronous request - the whole catalog is a background run (run_catalog)
+SIM_MAX_PRODUCTS = int(os.getenv("SIM_MAX_PRODUCTS", "1000"))
+# How long the last catalog run is kept
+SIM_CATALOG_TTL = int(os.getenv("SIM_CATALOG_TTL", str(7 * 86400)))
+SIM_WORKERS = int(os.getenv("SIM_WORKERS", str(os.cpu_count() or 1)))
+
+OPEN_PO_STATUSES = ("pending", "approved", "shipped")
+
+_CATALOG = "stockout_simulation:catalog"
+
+_client = make_redis_client(REDIS_URL) or InMemoryRedis()
+
+
+def simulate(on_hand, history, deliveries, horizon: int, scenarios: int, seed,
+             max_delay: int = SIM_MAX_DELAY_DAYS) -> dict:
+    """
+    Stock level of every product in every scenario, one day at a time. Each
+    day open purchase orders arrive, then demand is drawn by resampling a
+    random day of the product's history; what can't be served is lost.
+
+    on_hand is (products,), history (products x days), deliveries a
+    (row, day, units) triple of arrays, one entry per purchase order line.
+    Returns per-product arrays. Pure NumPy, so chunks can run in other processes.
+    """
+    rng = np.random.default_rng(seed)
+    products, days = history.shape
+    rows = np.arange(products)[:, None]
+    line_rows, line_days, line_units = deliveries
+    arrival = line_days[:, None] + rng.integers(0, max_delay + 1, (len(line_days), scenarios))
+
+    stock = np.repeat(on_hand.astype(float)[:, None], scenarios, axis=1)
+    first_out = np.full((products, scenarios), horizon)  # horizon = never
+    lost = np.zeros((products, scenarios))
+    demanded = np.zeros((products, scenarios))
+    for day in range(horizon):
+        line, scenario = np.nonzero(arrival == day)
+        if len(line):
+            np.add.at(stock, (line_rows[line], scenario), line_units[line])
+        demand = history[rows, rng.integers(0, days, (products, scenarios), dtype=np.int32)]
+        short = demand - stock
+        first_out[(short > 0) & (first_out == horizon)] = day
+        lost += np.maximum(short, 0)
+        demanded += demand
+        stock = np.maximum(stock - demand, 0)
+
+    total_demand = demanded.sum(1)
+    median_day = np.quantile(first_out, 0.5, axis=1, method="lower")
+    return {
+        "stockout_probability": np.mean(first_out < horizon, axis=1),
+        "stockout_day_p50": np.where(median_day < horizon, median_day, -1),
+        "fill_rate": np.where(total_demand > 0, 1 - lost.sum(1) / np.maximum(total_demand, 1e-12), 1.0),
+        "expected_demand": demanded.mean(1),
+        "expected_lost_units": lost.mean(1),
+    }
+
+
+# Loading
+
+def _on_hand(db: Session, ids: np.ndarray) -> np.ndarray:
+    """Units in stock per product, every location"""
+    rows = db.execute(
+        select(Inventory.product_id, func.sum(Inventory.quantity))
+        .where(Inventory.product_id.in_(ids.tolist()))
+        .group_by(Inventory.product_id)
+    ).all()
+    stock = np.zeros(len(ids))
+    if rows:
+        product_ids, units = np.asarray(rows, dtype=float).T
+        stock[np.searchsorted(ids, product_ids)] = units
+    return np.maximum(stock, 0)
+
+
+def _deliveries(db: Session, ids: np.ndarray, start: datetime.date, horizon: int):
+    """(row, day, units) of open purchase order lines due before the horizon ends - overdue ones on day 0"""
+    remaining = PurchaseOrderLine.quantity_ordered - func.coalesce(PurchaseOrderLine.quantity_received, 0)
+    rows = db.execute(
+        select(PurchaseOrderLine.product_id, PurchaseOrder.expected_delivery, remaining)
+        .join(PurchaseOrder, PurchaseOrder.id == PurchaseOrderLine.po_id)
+        .where(
+            PurchaseOrderLine.product_id.in_(ids.tolist()),
+            PurchaseOrder.status.in_(OPEN_PO_STATUSES),
+            PurchaseOrder.expected_delivery < start + datetime.timedelta(days=horizon),
+            remaining > 0,
+        )
+    ).all()
+    return (
+        np.searchsorted(ids, np.array([row[0] for row in rows], dtype=np.int64)),
+        np.array([max((row[1] - start).days, 0) if row[1] else 0 for row in rows], dtype=np.int64),
+        np.array([row[2] for row in rows], dtype=float),
+    )
+
+
+def stockout_risk(product_ids: list = None, horizon: int = SIM_HORIZON_DAYS, scenarios: int = SIM_SCENARIOS,
+                  seed: int = None, min_probability: float = 0.0, limit: int = 100,
+                  workers: int = SIM_WORKERS) -> dict:
+    """
+    Stock-out probability, median day of the first stock-out and fill rate per
+    product over the next `horizon` days (every product when none are given),
+    riskiest first, at most `limit` of them (None: all). The same seed,
+    products and scenario count give the same result.
+    """
+    started = time.perf_counter()
+    seed = secrets.randbits(32) if seed is None else seed
+    start = datetime.datetime.utcnow().date()
+    db = SessionLocal()
+    try:
+        query = select(Product.id).order_by(Product.id)
+        if product_ids:
+            query = query.where(Product.id.in_(product_ids))
+        ids = np.asarray(list(db.scalars(query)), dtype=np.int64)
+        if product_ids and not len(ids):
+            raise HTTPException(404, "Product not found")
+        end = modeling.history_end(db, "orders")
+        history_start = None if end is None else (
+            datetime.datetime.combine(end, datetime.time()) - datetime.timedelta(days=SIM_HISTORY_DAYS - 1))
+
+        size = max(1, min(SIM_CHUNK_CELLS // scenarios, SIM_CHUNK_PRODUCTS))
+        chunks = [ids[i:i + size] for i in range(0, len(ids), size)]
+        inputs = []
+
+        def jobs():
+            # Chunk i always draws from seed (seed, i), whatever the worker count
+            for index, chunk in enumerate(chunks):
+                on_hand = _on_hand(db, chunk)
+                history = (np.zeros((len(chunk), 1)) if history_start is None else
+                           modeling.demand_matrix(db, "orders", chunk, history_start, SIM_HISTORY_DAYS))
+                deliveries = _deliveries(db, chunk, start, horizon)
+                incoming = np.bincount(deliveries[0], weights=deliveries[2], minlength=len(chunk))
+                inputs.append({"on_hand": on_hand, "incoming": incoming, "daily_demand": history.mean(1)})
+                yield on_hand, history, deliveries, horizon, scenarios, (seed, index)
+
+        outcomes = [
+            {**inputs[index], **outcome}
+            for index, outcome in enumerate(map_chunks(simulate, jobs(), workers if len(chunks) > 1 else 1))
+        ]
+    finally:
+        db.close()
+
+    columns = {
+        name: np.concatenate([outcome[name] for outcome in outcomes]) if outcomes else np.zeros(0)
+        for name in ("on_hand", "incoming", "daily_demand", *_RESULTS)
+    }
+    probability = columns["stockout_probability"]
+    matching = np.flatnonzero(probability >= min_probability)
+    # Riskiest first, then product id
+    matching = matching[np.lexsort((ids[matching], -probability[matching]))][:limit]
+    return {
+        "seed": seed,
+        "scenarios": scenarios,
+        "horizon_days": horizon,
+        "start": start,
+        "history_start": history_start.date() if history_start else None,
+        "history_end": end,
+        "products_simulated": len(ids),
+        "matching": int(np.count_nonzero(probability >= min_probability)),
+        "seconds": round(time.perf_counter() - started, 3),
+        "products": [_risk(int(ids[i]), {name: values[i] for name, values in columns.items()}) for i in matching],
+    }
+
+
+def simulate_products(product_ids: list, horizon: int = SIM_HORIZON_DAYS, scenarios: int = SIM_SCENARIOS,
+                      seed: int = None, min_probability: float = 0.0, limit: int = 100) -> dict:
+    """stockout_risk for a request: one chunk, run in process - no pool to start"""
+    products = len(set(product_ids))
+    if products > SIM_MAX_PRODUCTS:
+        raise HTTPException(400, f"At most {SIM_MAX_PRODUCTS} products per request")
+    if products * scenarios > SIM_CHUNK_CELLS:
+        raise HTTPException(400, f"products x scenarios must be at most {SIM_CHUNK_CELLS} per request - "
+                                 f"use fewer scenarios, or the catalog run")
+    return stockout_risk(product_ids, horizon=horizon, scenarios=scenarios, seed=seed,
+                         min_probability=min_probability, limit=limit, workers=1)
+
+
+# Catalog runs - every product, in a Celery task (nightly, or POST
+# /internal/simulations/stockouts). The last one is kept in Redis and read
+# by GET /simulations/stockouts/catalog.
+
+def run_catalog(horizon: int = SIM_HORIZON_DAYS, scenarios: int = SIM_SCENARIOS, seed: int = None) -> dict:
+    """Simulate every product and keep the result, riskiest first. Returns the run without its products."""
+    result = stockout_risk(horizon=horizon, scenarios=scenarios, seed=seed, limit=None)
+    result["computed_at"] = datetime.datetime.utcnow().isoformat()
+    try:
+        _client.set(_CATALOG, json.dumps(result, default=str), ex=SIM_CATALOG_TTL)
+    except redis.RedisError:
+        logger.warning("could not store the catalog stock-out simulation")
+    logger.info("catalog stock-out simulation: %s products in %ss", result["products_simulated"], result["seconds"])
+    return {name: value for name, value in result.items() if name != "products"}
+
+
+def catalog_risk(min_probability: float = 0.0, limit: int = 100) -> dict:
+    """The last catalog run, products at or above min_probability"""
+    try:
+        raw = _client.get(_CATALOG)
+    except redis.RedisError:
+        raw = None
+    if raw is None:
+        raise HTTPException(404, "No catalog simulation yet - POST /internal/simulations/stockouts")
+    result = json.loads(raw)
+    # Stored riskiest first
+    matching = [risk for risk in result["products"] if risk["stockout_probability"] >= min_probability]
+    return {**result, "matching": len(matching), "products": matching[:limit]}
+
+
+_RESULTS = ("stockout_probability", "stockout_day_p50", "fill_rate", "expected_demand", "expected_lost_units")
+
+
+def _risk(product_id: int, values: dict) -> dict:
+    day = int(values.pop("stockout_day_p50"))
+    return {
+        "product_id": product_id,
+        **{name: round(float(value), 4) for name, value in values.items()},
+        "stockout_day_p50": day if day >= 0 else None,
+    }
@@ -0,0 +1,266 @@
+# services/transaction_totals.py
+import datetime
+import json
+import logging
+from collections import defaultdict
+from itertools import chain
+
+import redis
+from fastapi import HTTPException
+from sqlalchemy import Date, DateTime, and_, cast, event, false, func, inspect, literal_column, or_, select
+from sqlalchemy.orm import Session
+
+from common.cache import REDIS_URL, InMemoryRedis, make_redis_client
+from models.db_models import Transaction
+
+logger = logging.getLogger(__name__)
+
+GRAINS = ("day", "week", "month")  # weeks start on Monday, like Postgres date_trunc
+BY = ("all", "user")
+# Longest window per grain, so one response stays a sane size
+MAX_BUCKETS = {"day": 366 * 5, "week": 53 * 10, "month": 12 * 50}
+
+# Closed buckets - over before today (UTC) - are cached in two Redis hashes per
+# grain: the per-user totals of each bucket, and a generation per bucket that
+# committed writes to a transaction dated in it bump. An entry is only served
+# at the generation it was computed at, so a back-dated posting, a delete or a
+# date change shows up on the next read. Writes that bypass the ORM (COPY, raw
+# SQL) must call forget().
+_ENTRIES = "transaction_totals:{grain}"
+_GENERATIONS = "transaction_totals:{grain}:generations"
+
+_client = make_redis_client(REDIS_URL) or InMemoryRedis()
+
+
+def bucket_start(day: datetime.date, grain: str) -> datetime.date:
+    if grain == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    if grain == "month":
+        return day.replace(day=1)
+    return day
+
+
+def bucket_end(bucket: datetime.date, grain: str) -> datetime.date:
+    """First day of the next bucket"""
+    if grain == "week":
+        return bucket + datetime.timedelta(days=7)
+    if grain == "month":
+        return (bucket + datetime.timedelta(days=32)).replace(day=1)
+    return bucket + datetime.timedelta(days=1)
+
+
+def _bucket_sql(db: Session, grain: str):
+    if db.bind.dialect.name == "postgresql":
+        # Inlined, not bound - the GROUP BY has to repeat the exact expression
+        return cast(func.date_trunc(literal_column(f"'{grain}'"), cast(Transaction.date, DateTime)), Date)
+    if grain == "week":
+        return func.date(Transaction.date, "weekday 0", "-6 days")
+    if grain == "month":
+        return func.date(Transaction.date, "start of month")
+    return func.date(Transaction.date)
+
+
+def _as_date(value):
+    return datetime.date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _runs(buckets: list, grain: str) -> list:
+    """[start, end) ranges covering the buckets, adjacent ones merged"""
+    runs = []
+    for bucket in buckets:
+        end = bucket_end(bucket, grain)
+        if runs and runs[-1][1] == bucket:
+            runs[-1][1] = end
+        else:
+            runs.append([bucket, end])
+    return runs
+
+
+def _in(runs: list):
+    return or_(false(), *[and_(Transaction.date >= start, Transaction.date < end) for start, end in runs])
+
+
+# Cache
+
+def _field(bucket: datetime.date) -> str:
+    return bucket.isoformat()
+
+
+def _load(grain: str, buckets: list) -> tuple:
+    """({bucket: rows} served at their current generation, {bucket: generation} for the rest)"""
+    if not buckets:
+        return {}, {}
+    fields = [_field(bucket) for bucket in buckets]
+    try:
+        generations = _client.hmget(_GENERATIONS.format(grain=grain), fields)
+        entries = _client.hmget(_ENTRIES.format(grain=grain), fields)
+    except redis.RedisError:
+        logger.warning("transaction totals cache unavailable")
+        return {}, {}
+    hits, misses = {}, {}
+    for bucket, generation, raw in zip(buckets, generations, entries):
+        generation = int(generation or 0)
+        entry = json.loads(raw) if raw is not None else None
+        if entry is not None and entry["generation"] == generation:
+            hits[bucket] = entry["rows"]
+        else:
+            misses[bucket] = generation
+    return hits, misses
+
+
+def _store(grain: str, computed: dict, generations: dict):
+    """computed: {bucket: rows}, each stamped with the generation read before the query ran"""
+    if not computed:
+        return
+    mapping = {
+        _field(bucket): json.dumps({"generation": generations[bucket], "rows": rows})
+        for bucket, rows in computed.items()
+    }
+    try:
+        _client.hset(_ENTRIES.format(grain=grain), mapping=mapping)
+    except redis.RedisError:
+        logger.warning("could not cache transaction totals")
+
+
+def forget(days):
+    """Invalidate the cached buckets holding these dates"""
+    fields = defaultdict(set)
+    for day in days:
+        for grain in GRAINS:
+            fields[grain].add(_field(bucket_start(day, grain)))
+    try:
+        for grain in GRAINS:
+            for field in sorted(fields[grain]):
+                _client.hincrby(_GENERATIONS.format(grain=grain), field, 1)
+    except redis.RedisError:
+        logger.error("could not invalidate transaction totals for %s", sorted(fields["day"]))
+
+
+def forget_all():
+    """After a bulk load"""
+    try:
+        _client.delete(*chain.from_iterable(
+            (_ENTRIES.format(grain=grain), _GENERATIONS.format(grain=grain)) for grain in GRAINS
+        ))
+    except redis.RedisError:
+        logger.error("could not drop cached transaction totals")
+
+
+# Invalidation - dates are collected per session and forgotten only once the
+# transaction commits, like common.cache's stale keys
+
+_TRACKED = ("date", "total_amount", "created_by")
+
+
+def _dates(transaction: Transaction, changed_only: bool) -> list:
+    state = inspect(transaction)
+    histories = [state.attrs[name].history for name in _TRACKED]
+    if changed_only and not any(history.has_changes() for history in histories):
+        return []
+    date = state.attrs.date.history
+    return [_as_date(value) for value in chain(date.added, date.unchanged, date.deleted) if value is not None]
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_dates(session, flush_context):
+    dates = [
+        day
+        for objects, changed_only in ((session.new, False), (session.dirty, True), (session.deleted, False))
+        for obj in objects if isinstance(obj, Transaction)
+        for day in _dates(obj, changed_only)
+    ]
+    if dates:
+        session.info.setdefault("stale_transaction_dates", set()).update(
+            day.date() if isinstance(day, datetime.datetime) else day for day in dates
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_on_commit(session):
+    dates = session.info.pop("stale_transaction_dates", None)
+    if dates:
+        forget(dates)
+
+
+@event.listens_for(Session, "after_rollback")
+def _keep_on_rollback(session):
+    session.info.pop("stale_transaction_dates", None)
+
+
+# Reads - /transactions/by-date-range/totals
+
+def totals(db: Session, start: datetime.date, end: datetime.date, grain: str = "month",
+           by: str = "all", created_by: int = None) -> dict:
+    """
+    Transaction count and amount per day/week/month bucket over [start, end]
+    (inclusive), overall or per creating user, optionally for one user.
+    Closed buckets wholly inside the range come from the cache, the rest
+    from one GROUP BY over the uncached dates.
+    """
+    if grain not in GRAINS:
+        raise HTTPException(400, f"Grain must be one of: {list(GRAINS)}")
+    if by not in BY:
+        raise HTTPException(400, f"by must be one of: {list(BY)}")
+    if start > end:
+        raise HTTPException(400, "start_date must not be after end_date")
+
+    buckets = []
+    bucket = bucket_start(start, grain)
+    while bucket <= end:
+        buckets.append(bucket)
+        bucket = bucket_end(bucket, grain)
+    if len(buckets) > MAX_BUCKETS[grain]:
+        raise HTTPException(400, f"At most {MAX_BUCKETS[grain]} {grain} buckets per request")
+
+    # Only whole buckets that are over can be cached - the edges of the range and today's are read live
+    today = datetime.datetime.utcnow().date()
+    stop = end + datetime.timedelta(days=1)
+    closed = [b for b in buckets if b >= start and bucket_end(b, grain) <= min(stop, today)]
+    cached, generations = _load(grain, closed)
+    fill = sorted(generations)
+    live = [b for b in buckets if b not in cached and b not in generations]
+
+    rows = defaultdict(list)  # bucket -> [[created_by, count, amount]]
+    if fill or live:
+        # Cached buckets keep every user's totals; live ones only need the requested user's
+        clipped = [[max(s, start), min(e, stop)] for s, e in _runs(live, grain)]
+        wanted = _in(clipped)
+        if created_by is not None:
+            wanted = and_(wanted, Transaction.created_by == created_by)
+        bucket_sql = _bucket_sql(db, grain)
+        query = (
+            select(bucket_sql, Transaction.created_by, func.count(), func.sum(Transaction.total_amount))
+            .where(or_(_in(_runs(fill, grain)), wanted))
+            .group_by(bucket_sql, Transaction.created_by)
+        )
+        for row_bucket, user_id, count, amount in db.execute(query):
+            rows[_as_date(row_bucket)].append([user_id, count, amount or 0.0])
+        _store(grain, {bucket: sorted(rows[bucket], key=lambda row: (row[0] is None, row[0] or 0))
+                       for bucket in fill}, generations)
+
+    points = []
+    for bucket in buckets:
+        per_user = cached.get(bucket, rows.get(bucket, []))
+        if created_by is not None:
+            per_user = [row for row in per_user if row[0] == created_by]
+        if by == "user":
+            points.extend(_point(bucket, user_id, count, amount) for user_id, count, amount in sorted(
+                per_user, key=lambda row: (row[0] is None, row[0] or 0)))
+        else:
+            points.append(_point(bucket, None, sum(row[1] for row in per_user), sum(row[2] for row in per_user)))
+
+    return {
+        "grain": grain,
+        "by": by,
+        "start_date": start,
+        "end_date": end,
+        "created_by": created_by,
+        "transaction_count": sum(point["transaction_count"] for point in points),
+        "total_amount": round(sum(point["total_amount"] for point in points), 2),
+        "cached_buckets": len(cached),
+        "buckets": points,
+    }
+
+
+def _point(bucket, user_id, count, amount) -> dict:
+    return {"bucket": bucket, "created_by": user_id, "transaction_count": count, "total_amount": round(amount, 2)}
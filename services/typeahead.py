@@ -0,0 +1,424 @@
+# services/typeahead.py
+import bisect
+import datetime
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import event, func, inspect, literal, or_, select, text
+from sqlalchemy.orm import Session
+
+from common.cache import data_version
+from common.db import SessionLocal
+from models.db_models import Customer, Product, User
+
+logger = logging.getLogger(__name__)
+
+# Keys are kept lowercased in fixed-width byte arrays - longer values are matched on this many bytes
+TYPEAHEAD_KEY_BYTES = int(os.getenv("TYPEAHEAD_KEY_BYTES", "32"))
+# Keys of changed rows held in a small sorted list before they are merged into the arrays -
+# lookups score that list in Python, so it bounds their worst case
+TYPEAHEAD_DELTA_MAX = int(os.getenv("TYPEAHEAD_DELTA_MAX", "5000"))
+# How often (seconds) lookups check for writes by other processes and catch up in the background
+TYPEAHEAD_SYNC_SECONDS = float(os.getenv("TYPEAHEAD_SYNC_SECONDS", "1"))
+# Full rebuild - the only way customer edits made by other processes reach the index
+TYPEAHEAD_REBUILD_SECONDS = int(os.getenv("TYPEAHEAD_REBUILD_SECONDS", "3600"))
+# Catch-up re-reads rows updated this long (seconds) before the newest seen - updated_at is set before commit
+TYPEAHEAD_SYNC_SLACK = int(os.getenv("TYPEAHEAD_SYNC_SLACK", "60"))
+# Build the index when the app starts - lookups go to the database until it is ready
+TYPEAHEAD_WARM = os.getenv("TYPEAHEAD_WARM", "1") == "1"
+# Trigram word similarity a fuzzy match needs (Postgres)
+TYPEAHEAD_MIN_SIMILARITY = float(os.getenv("TYPEAHEAD_MIN_SIMILARITY", "0.4"))
+
+MAX_K = 50
+# Trigram indexes can't serve shorter queries
+MIN_DATABASE_LENGTH = 3
+# Names are also found by their later words ("smi" -> "John Smith"), at 90% of the score
+WORD_WEIGHT = 0.9
+MAX_WORDS = 4
+
+# field: (model, column, also index later words) - must match migration 0010
+FIELDS = {
+    "customer_name": (Customer, "name", True),
+    "customer_email": (Customer, "email", False),
+    "username": (User, "username", False),
+    "sku": (Product, "sku", False),
+}
+# model: (kind, label column)
+KINDS = {
+    Customer: ("customer", "name"),
+    User: ("user", "username"),
+    Product: ("product", "name"),
+}
+# Only products and users have updated_at - new customers are caught up by id alone
+WATERMARKED = (Product, User)
+TABLES = sorted(model.__tablename__ for model in KINDS)
+
+_indexes = {}
+_state = {"built": None, "checked": 0.0, "versions": None, "watermarks": {}, "pending": False}
+_state_lock = threading.Lock()
+_syncer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="typeahead-sync")
+
+
+def normalize(value) -> bytes:
+    """Lowercased, whitespace collapsed, UTF-8, cut to TYPEAHEAD_KEY_BYTES"""
+    return " ".join(str(value or "").casefold().split()).encode()[:TYPEAHEAD_KEY_BYTES]
+
+
+def keys(value, words: bool) -> list:
+    """[(key, weight)] a value is found by - the whole value, and its later words for names"""
+    key = normalize(value)
+    if not key:
+        return []
+    entries = [(key, 1.0)]
+    if words:
+        entries += [(word, WORD_WEIGHT) for word in dict.fromkeys(key.split(b" ")[1:MAX_WORDS]) if word != key]
+    return entries
+
+
+def prefix_score(typed: int, length, weight):
+    """0.5-1: the share of the key typed - a prefix match always outranks a fuzzy one"""
+    return 0.5 + 0.5 * weight * typed / np.maximum(length, typed)
+
+
+class PrefixIndex:
+    """
+    Lowercased keys of one field -> row ids, for prefix lookups.
+
+    Most entries live in sorted NumPy arrays (binary search for the matching
+    range, vectorized scoring). A changed row's entries there are masked out
+    and its current ones go to a small sorted list, merged into new arrays
+    once it outgrows TYPEAHEAD_DELTA_MAX.
+    """
+
+    def __init__(self, keys, ids, weights):
+        order = np.argsort(keys, kind="stable")
+        self.keys, self.ids, self.weights = keys[order], ids[order], weights[order]
+        self.lengths = np.char.str_len(self.keys)
+        self.live = np.ones(len(self.keys), dtype=bool)
+        self.by_id = np.argsort(self.ids, kind="stable")
+        self.sorted_ids = self.ids[self.by_id]
+        self.recent = []  # sorted (key, id, weight)
+        self.changed = {}  # id -> its entries in recent ([] once deleted)
+        self.lock = threading.Lock()
+        self.replacement = None
+
+    def __len__(self):
+        return int(self.live.sum()) + len(self.recent)
+
+    def _current(self, row_id) -> list:
+        if row_id in self.changed:
+            return self.changed[row_id]
+        lo, hi = np.searchsorted(self.sorted_ids, [row_id, row_id + 1])
+        positions = self.by_id[lo:hi]
+        return [(self.keys[p], row_id, float(self.weights[p])) for p in positions if self.live[p]]
+
+    def update(self, row_id: int, entries: list) -> bool:
+        """Replace a row's (key, weight) entries - [] once it's deleted. True when a merge is due"""
+        with self.lock:
+            if self.replacement is not None:
+                return self.replacement.update(row_id, entries)
+            entries = sorted((key, row_id, weight) for key, weight in entries)
+            current = self._current(row_id)
+            if [key for key, _, _ in sorted(current)] == [key for key, _, _ in entries]:
+                return False
+            lo, hi = np.searchsorted(self.sorted_ids, [row_id, row_id + 1])
+            self.live[self.by_id[lo:hi]] = False
+            for entry in self.changed.get(row_id, ()):
+                del self.recent[bisect.bisect_left(self.recent, entry)]
+            for entry in entries:
+                bisect.insort(self.recent, entry)
+            self.changed[row_id] = entries
+            return len(self.recent) > TYPEAHEAD_DELTA_MAX
+
+    def merged(self) -> "PrefixIndex":
+        """A new index with the recent changes folded into the arrays; updates made meanwhile are carried over"""
+        with self.lock:
+            live, recent, changed = self.live.copy(), list(self.recent), dict(self.changed)
+        index = PrefixIndex(*(
+            np.concatenate(columns)
+            for columns in zip((self.keys[live], self.ids[live], self.weights[live]), _arrays(recent))
+        ))
+        with self.lock:
+            for row_id, entries in self.changed.items():
+                if changed.get(row_id) is not entries:
+                    index.update(row_id, [(key, weight) for key, _, weight in entries])
+            self.replacement = index
+        return index
+
+    def search(self, prefix: bytes, k: int) -> list:
+        """Up to k (score, id) of rows with a key starting with prefix, best first"""
+        typed = len(prefix)
+        lo, hi = np.searchsorted(self.keys, [prefix, prefix + b"\xff"])
+        found = lo + np.flatnonzero(self.live[lo:hi])
+        scores = prefix_score(typed, self.lengths[found], self.weights[found])
+        # A row can match on several of its keys - keep enough candidates for k distinct rows
+        if len(found) > k * MAX_WORDS:
+            best = np.argpartition(-scores, k * MAX_WORDS - 1)[:k * MAX_WORDS]
+            found, scores = found[best], scores[best]
+        hits = list(zip(scores.tolist(), self.ids[found].tolist()))
+
+        with self.lock:
+            start = bisect.bisect_left(self.recent, (prefix,))
+            stop = bisect.bisect_left(self.recent, (prefix + b"\xff",))
+            hits += [(float(prefix_score(typed, len(key), weight)), row_id)
+                     for key, row_id, weight in self.recent[start:stop]]
+
+        best = {}
+        for score, row_id in sorted(hits, key=lambda hit: (-hit[0], hit[1])):
+            best.setdefault(row_id, score)
+            if len(best) == k:
+                break
+        return [(score, row_id) for row_id, score in best.items()]
+
+
+# Building and syncing - one index per field, per process
+
+def _arrays(entries: list) -> tuple:
+    """(keys, ids, weights) arrays of (key, id, weight) tuples"""
+    return (
+        np.array([key for key, _, _ in entries], dtype=f"S{TYPEAHEAD_KEY_BYTES}"),
+        np.array([row_id for _, row_id, _ in entries], dtype=np.int64),
+        np.array([weight for _, _, weight in entries], dtype=np.float32),
+    )
+
+
+def _read(db: Session, field: str) -> PrefixIndex:
+    """An index of one field's column, converted to arrays a batch of rows at a time"""
+    model, column, words = FIELDS[field]
+    rows = db.execute(select(model.id, getattr(model, column)).execution_options(yield_per=50_000))
+    parts = [_arrays([]), *(
+        _arrays([(key, row_id, weight) for row_id, value in batch for key, weight in keys(value, words)])
+        for batch in rows.partitions()
+    )]
+    return PrefixIndex(*(np.concatenate(columns) for columns in zip(*parts)))
+
+def _watermark(db: Session, model) -> tuple:
+    """(highest id, newest updated_at) - where the next catch-up starts"""
+    if model in WATERMARKED:
+        return tuple(db.execute(select(func.max(model.id), func.max(model.updated_at))).one())
+    return db.execute(select(func.max(model.id))).scalar(), None
+
+
+def rebuild():
+    """Read every looked-up column and swap in fresh indexes"""
+    started = time.monotonic()
+    # Read before the rows, so anything written during the build is caught up afterwards
+    versions = data_version(TABLES)
+    db = SessionLocal()
+    try:
+        watermarks = {model: _watermark(db, model) for model in KINDS}
+        indexes = {field: _read(db, field) for field in FIELDS}
+    finally:
+        db.close()
+    _indexes.update(indexes)
+    _state.update(built=started, versions=versions, watermarks=watermarks)
+    logger.info("Typeahead index built: %s in %.1fs",
+                ", ".join(f"{field} {len(index):,}" for field, index in indexes.items()), time.monotonic() - started)
+
+
+def catch_up():
+    """Apply rows other processes inserted (and, for products and users, updated) since the last sync"""
+    versions = data_version(TABLES)
+    if versions is not None and versions == _state["versions"]:
+        return
+    db = SessionLocal()
+    try:
+        for model, (max_id, updated) in _state["watermarks"].items():
+            # Read first - rows written while the changes are applied are simply read again next time
+            watermark = _watermark(db, model)
+            columns = sorted({column for field_model, column, _ in FIELDS.values() if field_model is model})
+            query = select(model.id, *(getattr(model, column) for column in columns))
+            changed = model.id > (max_id or 0)
+            if updated is not None:
+                changed = or_(changed, model.updated_at >= updated - datetime.timedelta(seconds=TYPEAHEAD_SYNC_SLACK))
+            for row in db.execute(query.where(changed)).mappings():
+                apply_change(model, row["id"], row)
+            _state["watermarks"][model] = watermark
+    finally:
+        db.close()
+    _state["versions"] = versions
+
+
+def apply_change(model, row_id: int, values):
+    """Update a row's entries in every index of its model - values None once it's deleted"""
+    merge = False
+    for field, (field_model, column, words) in FIELDS.items():
+        index = _indexes.get(field)
+        if field_model is model and index is not None:
+            merge |= index.update(row_id, keys(values[column], words) if values is not None else [])
+    if merge:
+        schedule_sync()
+
+
+def _sync():
+    try:
+        built = _state["built"]
+        if built is None or time.monotonic() - built > TYPEAHEAD_REBUILD_SECONDS:
+            rebuild()
+        else:
+            catch_up()
+        for field, index in list(_indexes.items()):
+            if len(index.recent) > TYPEAHEAD_DELTA_MAX:
+                _indexes[field] = index.merged()
+    except Exception:
+        logger.exception("Typeahead sync failed")
+    finally:
+        with _state_lock:
+            _state["pending"] = False
+
+
+def schedule_sync():
+    """Build, catch up or merge in the background - at most one sync queued at a time"""
+    with _state_lock:
+        if _state["pending"]:
+            return
+        _state["pending"] = True
+        _state["checked"] = time.monotonic()
+    _syncer.submit(_sync)
+
+
+def ready() -> bool:
+    return len(_indexes) == len(FIELDS)
+
+
+# This process's own writes reach the index as soon as they commit - values
+# are captured at flush time, so nothing has to be reloaded after commit.
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    if not _indexes:
+        return
+    changes = session.info.setdefault("typeahead_changes", {})
+    for obj in chain(session.new, session.dirty):
+        if type(obj) in KINDS:
+            columns = [column for model, column, _ in FIELDS.values() if model is type(obj)]
+            # Most updates (order counts, stock, logins) don't touch a looked-up column
+            if obj in session.new or any(inspect(obj).attrs[column].history.has_changes() for column in columns):
+                changes[type(obj), obj.id] = {column: getattr(obj, column) for column in columns}
+    for obj in session.deleted:
+        if type(obj) in KINDS:
+            changes[type(obj), obj.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_on_commit(session):
+    changes = session.info.pop("typeahead_changes", None)
+    for (model, row_id), values in (changes or {}).items():
+        apply_change(model, row_id, values)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session):
+    session.info.pop("typeahead_changes", None)
+
+
+# Lookups
+
+def _like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _database_prefix(db: Session, field: str, typed: str, k: int) -> list:
+    """(score, id) of prefix matches from the database - used until the index is built"""
+    model, column, words = FIELDS[field]
+    value = func.lower(getattr(model, column))
+    matches = value.like(f"{_like(typed)}%", escape="\\")
+    if words:
+        matches = or_(matches, value.like(f"% {_like(typed)}%", escape="\\"))
+    rows = db.execute(
+        select(model.id, getattr(model, column)).where(matches).order_by(func.length(value), model.id).limit(k * MAX_WORDS)
+    ).all()
+    prefix = typed.encode()[:TYPEAHEAD_KEY_BYTES]
+    hits = []
+    for row_id, found in rows:
+        scores = [prefix_score(len(prefix), len(key), weight) for key, weight in keys(found, words) if key.startswith(prefix)]
+        if scores:
+            hits.append((float(max(scores)), row_id))
+    return hits
+
+
+def _database_fuzzy(db: Session, field: str, typed: str, k: int) -> list:
+    """
+    (score, id) of rows close to what was typed, 0-0.5 - trigram word similarity
+    on Postgres (typos, letters swapped), a substring anywhere on SQLite.
+    """
+    model, column, _ = FIELDS[field]
+    value = func.lower(getattr(model, column))
+    if db.bind.dialect.name == "postgresql":
+        db.execute(text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+                   {"threshold": str(TYPEAHEAD_MIN_SIMILARITY)})
+        similarity = func.word_similarity(literal(typed), value)
+        query = select(model.id, similarity).where(literal(typed).op("<%")(value)).order_by(similarity.desc(), model.id)
+    else:
+        similarity = func.length(literal(typed)) * 1.0 / func.length(value)
+        query = select(model.id, similarity).where(func.instr(value, typed) > 0).order_by(func.length(value), model.id)
+    return [(0.5 * float(score), row_id) for row_id, score in db.execute(query.limit(k)).all()]
+
+
+def lookup(db: Session, q: str, fields=None, k: int = 10, fuzzy: bool = True) -> dict:
+    """
+    The k best rows whose looked-up fields start with q - from the in-process
+    index once it's built, the database before - topped up with fuzzy matches
+    when there are fewer than k. Labels come from the database, so rows deleted
+    or renamed since the index last saw them are dropped.
+    """
+    fields = list(dict.fromkeys(fields or FIELDS))
+    unknown = [field for field in fields if field not in FIELDS]
+    if unknown:
+        raise HTTPException(400, f"Fields must be among: {list(FIELDS)}")
+    prefix = normalize(q)
+    if not prefix:
+        raise HTTPException(400, "Lookup needs at least one character")
+    typed = prefix.decode(errors="ignore")
+
+    if not ready() or time.monotonic() - _state["checked"] > TYPEAHEAD_SYNC_SECONDS:
+        schedule_sync()
+    source = "memory" if ready() else "database"
+
+    hits = {}
+    for field in fields:
+        if source == "memory":
+            found = _indexes[field].search(prefix, k)
+        else:
+            found = _database_prefix(db, field, typed, k) if len(typed) >= MIN_DATABASE_LENGTH else []
+        for score, row_id in found:
+            _keep(hits, FIELDS[field][0], row_id, score, field, "prefix")
+    if fuzzy and len(typed) >= MIN_DATABASE_LENGTH and len(hits) < k:
+        for field in fields:
+            for score, row_id in _database_fuzzy(db, field, typed, k):
+                _keep(hits, FIELDS[field][0], row_id, score, field, "fuzzy")
+
+    best = sorted(hits.items(), key=lambda item: (-item[1][0], KINDS[item[0][0]][0], item[0][1]))[:k]
+    return {"query": q, "source": source, "results": _labelled(db, best, prefix)}
+
+
+def _keep(hits: dict, model, row_id: int, score: float, field: str, match: str):
+    if score > hits.get((model, row_id), (-1.0,))[0]:
+        hits[model, row_id] = (score, field, match)
+
+
+def _labelled(db: Session, best: list, prefix: bytes) -> list:
+    rows = {}
+    for model, (_, label) in KINDS.items():
+        ids = [row_id for (hit_model, row_id), _ in best if hit_model is model]
+        if ids:
+            rows.update(((model, row.id), row) for row in db.query(model).filter(model.id.in_(ids)))
+
+    results = []
+    for (model, row_id), (score, field, match) in best:
+        row = rows.get((model, row_id))
+        if row is None:
+            continue
+        value = getattr(row, FIELDS[field][1])
+        if match == "prefix" and not any(key.startswith(prefix) for key, _ in keys(value, FIELDS[field][2])):
+            continue
+        kind, label = KINDS[model]
+        results.append({"kind": kind, "id": row_id, "label": getattr(row, label), "field": field,
+                        "value": value, "score": round(score, 4), "match": match})
+    return results
@@ -0,0 +1,63 @@
+# tasks/celery_app.py
+import os
+
+from celery import Celery
+
+from common.cache import REDIS_URL
+
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/1")
+# Eager = tasks run inline in the caller, no broker or worker needed (tests, local
+# runs). The in-process "memory://" event queue can only be drained in-process.
+CELERY_TASK_ALWAYS_EAGER = os.getenv(
+    "CELERY_TASK_ALWAYS_EAGER", "true" if REDIS_URL.startswith("memory://") else "false"
+).lower() in ("1", "true", "yes")
+# Safety net for a lost flush task - normally each queued order schedules one
+ORDER_EVENTS_FLUSH_INTERVAL = float(os.getenv("ORDER_EVENTS_FLUSH_INTERVAL", "5"))
+# Tasks that spread chunks over a process pool (common/processes.py). A prefork
+# child is daemonic and can't start one, so they go to their own queue, served by
+# a --pool solo worker that runs each task in its main process.
+COMPUTE_QUEUE = "compute"
+COMPUTE_TASKS = ["tasks.tasks.refit_forecasts", "tasks.tasks.simulate_stockouts",
+                 "tasks.tasks.refresh_price_elasticity"]
+
+celery_app = Celery("monolith", broker=CELERY_BROKER_URL, include=["tasks.tasks"])
+celery_app.conf.update(
+    task_always_eager=CELERY_TASK_ALWAYS_EAGER,
+    task_eager_propagates=True,
+    task_ignore_result=True,
+    # Redeliver if a worker dies mid-task - every task is safe to run twice
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    task_routes={name: {"queue": COMPUTE_QUEUE} for name in COMPUTE_TASKS},
+    beat_schedule={
+        "flush-order-events": {
+            "task": "tasks.tasks.flush_order_events",
+            "schedule": ORDER_EVENTS_FLUSH_INTERVAL,
+        },
+        "prune-processed-events": {
+            "task": "tasks.tasks.prune_processed_events",
+            "schedule": 3600.0,
+        },
+        # Yesterday and today: catches a missed status move or a dropped event
+        "check-sales-rollups": {
+            "task": "tasks.tasks.check_sales_rollups",
+            "schedule": 86400.0,
+            "kwargs": {"recent_days": 2},
+        },
+        # Nightly: only products that sold since the last run
+        "refit-forecasts": {
+            "task": "tasks.tasks.refit_forecasts",
+            "schedule": 86400.0,
+        },
+        "simulate-stockouts": {
+            "task": "tasks.tasks.simulate_stockouts",
+            "schedule": 86400.0,
+        },
+        # Yesterday's closing balances - as-of queries only read lines dated after a snapshot
+        "snapshot-account-balances": {
+            "task": "tasks.tasks.snapshot_account_balances",
+            "schedule": 86400.0,
+        },
+    },
+)
@@ -0,0 +1,100 @@
+# tasks/tasks.py
+import datetime
+import logging
+
+from common.db import SessionLocal
+from services import causal, ledger, modeling, order_events, reports, sales_rollups, simulation
+from tasks.celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(autoretry_for=(Exception,), retry_backoff=True, max_retries=10)
+def flush_order_events():
+    """Write queued order side effects in batches - safe to run concurrently or twice"""
+    result = order_events.flush(SessionLocal)
+    # Events that arrived after the last batch was read get their own flush.
+    # A skipped run leaves them to the flush that holds the lock.
+    if "skipped" not in result and order_events.backlog().get("backlog"):
+        order_events.schedule_flush()
+    return result
+
+
+@celery_app.task
+def prune_processed_events():
+    """Drop old idempotency keys"""
+    db = SessionLocal()
+    try:
+        return order_events.prune_processed(db)
+    finally:
+        db.close()
+
+
+@celery_app.task
+def backfill_sales_rollups(start: str = None, end: str = None, rebuild: bool = False):
+    """Count orders missing from sales_rollups (or recount them with rebuild) - ISO dates, whole days"""
+    db = SessionLocal()
+    try:
+        return sales_rollups.backfill(db, _parse(start), _parse(end), rebuild=rebuild)
+    finally:
+        db.close()
+
+
+@celery_app.task
+def check_sales_rollups(start: str = None, end: str = None, recent_days: int = None):
+    """Compare sales_rollups with a GROUP BY over orders and log any mismatch"""
+    start, end = _parse(start), _parse(end)
+    if recent_days:
+        end = datetime.datetime.utcnow()
+        start = end - datetime.timedelta(days=recent_days - 1)
+    db = SessionLocal()
+    try:
+        result = sales_rollups.check(db, start, end)
+    finally:
+        db.close()
+    if not result["ok"]:
+        logger.error("sales rollups out of sync: %s", result)
+    return result
+
+
+@celery_app.task
+def refresh_report(report_id: int, params: dict):
+    """Recompute a saved report's cached result after its data changed"""
+    return reports.refresh_result(report_id, params)
+
+
+@celery_app.task
+def refit_forecasts(full: bool = False):
+    """Refit demand models - only products with new sales unless full"""
+    db = SessionLocal()
+    try:
+        return modeling.refit(db, full=full)
+    finally:
+        db.close()
+
+
+@celery_app.task
+def simulate_stockouts(horizon: int = simulation.SIM_HORIZON_DAYS, scenarios: int = simulation.SIM_SCENARIOS,
+                       seed: int = None):
+    """Stock-out risk of every product, kept for GET /simulations/stockouts/catalog"""
+    return simulation.run_catalog(horizon=horizon, scenarios=scenarios, seed=seed)
+
+
+@celery_app.task
+def refresh_price_elasticity(replicates: int = causal.CAUSAL_BOOTSTRAP, seed: int = causal.CAUSAL_SEED):
+    """Re-estimate price elasticity after orders or products changed"""
+    return causal.refresh_result(replicates, seed)
+
+
+@celery_app.task
+def snapshot_account_balances(as_of: str = None):
+    """Write end-of-day account balances (default: yesterday) - a day that has them already is skipped"""
+    db = SessionLocal()
+    try:
+        return ledger.snapshot(db, _parse(as_of).date() if as_of else None)
+    finally:
+        db.close()
+
+
+def _parse(value):
+    return datetime.datetime.fromisoformat(value) if value else None